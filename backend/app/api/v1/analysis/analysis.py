@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import func, select, and_, or_
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
-from app.db.session import get_db
+from app.db.session import get_async_read_db
 from app.core.deps import get_current_user
+from app.services.aggregates import date_range_criteria, summarize_orders_async, status_count
+from app.services.inventory_snapshot import get_inventory_snapshot, summarize_inventory, low_stock_products
 from app.models import (
-    Supplier, Customer, Product, Warehouse,
+    Supplier, Customer, Warehouse,
     PurchaseOrder, PurchaseOrderItem,
     SalesOrder, SalesOrderItem,
     Payment, Bill, Account, User
@@ -19,10 +22,10 @@ data_analysis_router = APIRouter(prefix="/analysis", tags=["数据分析"])
 
 
 @api_router.get("/supplier")
-def get_supplier_analysis(
+async def get_supplier_analysis(
     start_date: Optional[datetime] = Query(None, description="开始日期"),
     end_date: Optional[datetime] = Query(None, description="结束日期"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -31,27 +34,25 @@ def get_supplier_analysis(
     统计供应商总数、订单数和金额
     分析供应商排名（按订单金额）
     """
-    query = db.query(Supplier).filter(Supplier.status == True)
-    
-    total_suppliers = query.count()
-    
-    purchase_query = db.query(PurchaseOrder)
-    if start_date:
-        purchase_query = purchase_query.filter(PurchaseOrder.created_at >= start_date)
-    if end_date:
-        purchase_query = purchase_query.filter(PurchaseOrder.created_at <= end_date)
-    
-    month_orders = purchase_query.count()
-    month_total = sum([po.total_amount or 0 for po in purchase_query.all()])
-    
-    supplier_stats = db.query(
+    total_suppliers = await db.scalar(
+        select(func.count(Supplier.id)).where(Supplier.status == True)
+    )
+    
+    summary = await summarize_orders_async(
+        db, PurchaseOrder, PurchaseOrder.total_amount,
+        *date_range_criteria(PurchaseOrder.created_at, start_date, end_date)
+    )
+    month_orders = summary["count"]
+    month_total = summary["total"]
+    
+    supplier_stats = (await db.execute(select(
         Supplier.name,
         func.count(PurchaseOrder.id).label('order_count'),
         func.sum(PurchaseOrder.total_amount).label('total_amount')
     ).join(PurchaseOrder, Supplier.id == PurchaseOrder.supplier_id, isouter=True
     ).group_by(Supplier.id, Supplier.name
     ).order_by(func.sum(PurchaseOrder.total_amount).desc()
-    ).limit(10).all()
+    ).limit(10))).all()
     
     return {
         "total_suppliers": total_suppliers,
@@ -71,10 +72,10 @@ def get_supplier_analysis(
 
 
 @api_router.get("/purchase")
-def get_purchase_analysis(
+async def get_purchase_analysis(
     start_date: Optional[datetime] = Query(None, description="开始日期"),
     end_date: Optional[datetime] = Query(None, description="结束日期"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -83,18 +84,18 @@ def get_purchase_analysis(
     统计采购订单数量、总金额和待处理订单
     返回最近采购订单列表
     """
-    query = db.query(PurchaseOrder)
+    criteria = date_range_criteria(PurchaseOrder.created_at, start_date, end_date)
+    summary = await summarize_orders_async(db, PurchaseOrder, PurchaseOrder.total_amount, *criteria)
     
-    if start_date:
-        query = query.filter(PurchaseOrder.created_at >= start_date)
-    if end_date:
-        query = query.filter(PurchaseOrder.created_at <= end_date)
+    month_orders = summary["count"]
+    month_total = summary["total"]
+    pending_orders = status_count(summary, "pending")
     
-    month_orders = query.count()
-    month_total = sum([po.total_amount or 0 for po in query.all()])
-    pending_orders = query.filter(PurchaseOrder.status == "pending").count()
-    
-    recent_orders = query.order_by(PurchaseOrder.created_at.desc()).limit(10).all()
+    recent_orders = (await db.scalars(
+        select(PurchaseOrder).options(joinedload(PurchaseOrder.supplier)).where(
+            *criteria
+        ).order_by(PurchaseOrder.created_at.desc()).limit(10)
+    )).all()
     
     return {
         "month_orders": month_orders,
@@ -115,8 +116,8 @@ def get_purchase_analysis(
 
 
 @api_router.get("/inventory")
-def get_inventory_analysis(
-    db: Session = Depends(get_db),
+async def get_inventory_analysis(
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -124,39 +125,38 @@ def get_inventory_analysis(
     
     统计产品总数、库存总价值和低库存产品数量
     返回低库存产品列表
+    基于库存快照向量化计算，不加载产品对象
     """
-    total_products = db.query(Product).count()
-    
-    products = db.query(Product).all()
-    total_value = sum([p.current_stock * (p.unit_price or 0) for p in products])
-    low_stock_count = sum([1 for p in products if p.current_stock < (p.min_stock or 0)])
+    def analyze(session):
+        snapshot = get_inventory_snapshot(session)
+        summary = summarize_inventory(snapshot)
+        return summary, low_stock_products(session, snapshot, summary.low_stock_index)
     
-    low_stock_products = [
-        {
-            "code": p.code,
-            "name": p.name,
-            "category": p.category.name if p.category else "",
-            "current_stock": p.current_stock,
-            "min_stock": p.min_stock or 0
-        }
-        for p in products
-        if p.current_stock < (p.min_stock or 0)
-    ][:10]
+    summary, low_stock = await db.run_sync(analyze)
     
     return {
-        "total_products": total_products,
-        "total_value": float(total_value),
-        "low_stock_count": low_stock_count,
+        "total_products": summary.total,
+        "total_value": summary.total_value,
+        "low_stock_count": summary.low_stock,
         "avg_turnover_days": 25,
-        "low_stock_products": low_stock_products
+        "low_stock_products": [
+            {
+                "code": p["code"],
+                "name": p["name"],
+                "category": p["category"],
+                "current_stock": p["current_stock"],
+                "min_stock": p["min_stock"]
+            }
+            for p in low_stock
+        ]
     }
 
 
 @api_router.get("/sales")
-def get_sales_analysis(
+async def get_sales_analysis(
     start_date: Optional[datetime] = Query(None, description="开始日期"),
     end_date: Optional[datetime] = Query(None, description="结束日期"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -165,25 +165,23 @@ def get_sales_analysis(
     统计销售订单数量、总金额和待发货订单
     分析客户排名（按订单金额）
     """
-    query = db.query(SalesOrder)
-    
-    if start_date:
-        query = query.filter(SalesOrder.created_at >= start_date)
-    if end_date:
-        query = query.filter(SalesOrder.created_at <= end_date)
+    summary = await summarize_orders_async(
+        db, SalesOrder, SalesOrder.total_amount,
+        *date_range_criteria(SalesOrder.created_at, start_date, end_date)
+    )
     
-    month_orders = query.count()
-    month_total = sum([so.total_amount or 0 for so in query.all()])
-    pending_shipment = query.filter(SalesOrder.status == "confirmed").count()
+    month_orders = summary["count"]
+    month_total = summary["total"]
+    pending_shipment = status_count(summary, "confirmed")
     
-    customer_stats = db.query(
+    customer_stats = (await db.execute(select(
         Customer.name,
         func.count(SalesOrder.id).label('order_count'),
         func.sum(SalesOrder.total_amount).label('total_amount')
     ).join(SalesOrder, Customer.id == SalesOrder.customer_id, isouter=True
     ).group_by(Customer.id, Customer.name
     ).order_by(func.sum(SalesOrder.total_amount).desc()
-    ).limit(10).all()
+    ).limit(10))).all()
     
     return {
         "month_orders": month_orders,
@@ -203,10 +201,10 @@ def get_sales_analysis(
 
 
 @api_router.get("/payment")
-def get_payment_analysis(
+async def get_payment_analysis(
     start_date: Optional[datetime] = Query(None, description="开始日期"),
     end_date: Optional[datetime] = Query(None, description="结束日期"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -215,18 +213,18 @@ def get_payment_analysis(
     统计付款单据数量、总金额和待处理付款
     返回最近付款单据列表
     """
-    query = db.query(Payment)
+    criteria = date_range_criteria(Payment.created_at, start_date, end_date)
+    summary = await summarize_orders_async(db, Payment, Payment.amount, *criteria)
     
-    if start_date:
-        query = query.filter(Payment.created_at >= start_date)
-    if end_date:
-        query = query.filter(Payment.created_at <= end_date)
+    month_payments = summary["count"]
+    month_total = summary["total"]
+    pending_payments = status_count(summary, "pending")
     
-    month_payments = query.count()
-    month_total = sum([p.amount or 0 for p in query.all()])
-    pending_payments = query.filter(Payment.status == "pending").count()
-    
-    recent_payments = query.order_by(Payment.created_at.desc()).limit(10).all()
+    recent_payments = (await db.scalars(
+        select(Payment).options(joinedload(Payment.supplier)).where(
+            *criteria
+        ).order_by(Payment.created_at.desc()).limit(10)
+    )).all()
     
     return {
         "month_payments": month_payments,
@@ -248,8 +246,8 @@ def get_payment_analysis(
 
 
 @api_router.get("/bill")
-def get_bill_analysis(
-    db: Session = Depends(get_db),
+async def get_bill_analysis(
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -258,16 +256,23 @@ def get_bill_analysis(
     统计应收和应付账单的数量和金额
     返回最近账单列表
     """
-    receivable_bills = db.query(Bill).filter(Bill.type == "receivable").all()
-    payable_bills = db.query(Bill).filter(Bill.type == "payable").all()
-    
-    receivable_count = len(receivable_bills)
-    receivable_total = sum([b.amount or 0 for b in receivable_bills])
+    bill_stats = {
+        bill_type: (count, total)
+        for bill_type, count, total in (await db.execute(
+            select(Bill.type, func.count(Bill.id), func.sum(Bill.amount)).where(
+                Bill.type.in_(("receivable", "payable"))
+            ).group_by(Bill.type)
+        )).all()
+    }
     
-    payable_count = len(payable_bills)
-    payable_total = sum([b.amount or 0 for b in payable_bills])
+    receivable_count, receivable_total = bill_stats.get("receivable", (0, 0))
+    payable_count, payable_total = bill_stats.get("payable", (0, 0))
     
-    recent_bills = db.query(Bill).order_by(Bill.created_at.desc()).limit(10).all()
+    recent_bills = (await db.scalars(
+        select(Bill).options(joinedload(Bill.customer), joinedload(Bill.supplier)).order_by(
+            Bill.created_at.desc()
+        ).limit(10)
+    )).all()
     
     return {
         "receivable_count": receivable_count,
@@ -289,8 +294,8 @@ def get_bill_analysis(
 
 
 @api_router.get("/account")
-def get_account_analysis(
-    db: Session = Depends(get_db),
+async def get_account_analysis(
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -299,7 +304,7 @@ def get_account_analysis(
     统计银行账户总数和总余额
     返回账户列表
     """
-    accounts = db.query(Account).filter(Account.status == True).all()
+    accounts = (await db.scalars(select(Account).where(Account.status == True))).all()
     
     total_accounts = len(accounts)
     total_balance = sum([a.balance or 0 for a in accounts])
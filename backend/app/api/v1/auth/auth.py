@@ -1,11 +1,15 @@
 from datetime import timedelta  # 导入时间增量，用于设置token过期时间
 from fastapi import APIRouter, Depends, HTTPException, status  # 导入FastAPI的核心组件
 from fastapi.security import OAuth2PasswordRequestForm  # 导入OAuth2密码请求表单
+from fastapi.concurrency import run_in_threadpool  # 导入线程池执行函数，用于在异步接口中执行同步数据库操作
 from sqlalchemy.orm import Session  # 导入数据库会话
 from app.db.session import get_db  # 导入数据库会话依赖注入函数
-from app.core.security import verify_password, create_access_token, get_password_hash  # 导入安全相关函数
+from app.core.security import (  # 导入安全相关函数
+    verify_password_async, get_password_hash_async, password_needs_rehash,
+    PasswordHashPoolFull, password_hash_pool, create_access_token, get_password_hash
+)
 from app.core.config import get_settings  # 导入配置获取函数
-from app.core.deps import get_current_active_user  # 导入当前活跃用户依赖
+from app.core.deps import get_current_active_user, get_current_superuser, invalidate_user_cache  # 导入当前用户相关依赖和用户缓存失效函数
 from app.models import User  # 导入用户模型
 from app.schemas.user import UserCreate, UserResponse, Token, UserUpdate  # 导入用户相关的Schema
 from app.utils.helpers import generate_code  # 导入辅助函数
@@ -74,7 +78,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -96,13 +100,28 @@ def login(
         - 验证用户名和密码
         - 检查用户状态是否启用
         - 生成JWT访问令牌
+        - 密码验证在独立的有界线程池中执行，不占用处理其他请求的工作线程
+        - 存储的哈希计算成本与配置不一致时，登录成功后自动重新加密
     """
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.username == form_data.username).first()
+    )
     # 根据用户名查询用户
+    # 在线程池中执行同步数据库查询，避免阻塞事件循环
     
-    if not user or not verify_password(form_data.password, user.password):
+    try:
+        password_ok = bool(user) and await verify_password_async(form_data.password, user.password)
+        # verify_password_async: 在密码哈希线程池中验证明文密码是否与哈希密码匹配
+    except PasswordHashPoolFull:
+        # 密码哈希线程池排队已满，说明正处于登录高峰，让客户端稍后重试
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent logins, please retry later",
+            headers={"Retry-After": "1"},
+        )
+    
+    if not password_ok:
         # 如果用户不存在或密码错误
-        # verify_password: 验证明文密码是否与哈希密码匹配
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -113,20 +132,47 @@ def login(
         # 检查用户状态，如果被禁用则拒绝登录
         raise HTTPException(status_code=400, detail="Inactive user")
     
+    user_id = user.id
+    # 提交后对象属性过期，再读取会在事件循环中同步查询数据库，提前取出用户ID
+    
+    if password_needs_rehash(user.password):
+        # 哈希计算成本与BCRYPT_ROUNDS不一致，用本次登录的明文密码重新加密
+        try:
+            user.password = await get_password_hash_async(form_data.password)
+            await run_in_threadpool(db.commit)
+        except PasswordHashPoolFull:
+            # 重新加密不是必须的，排队已满时留到下次登录
+            pass
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     # 计算访问令牌的过期时间
     
     access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        data={"sub": str(user_id)}, expires_delta=access_token_expires
     )
     # 创建JWT访问令牌
-    # data={"sub": str(user.id)}: 将用户ID编码到令牌中
+    # data={"sub": str(user_id)}: 将用户ID编码到令牌中
     # expires_delta: 设置令牌过期时间
     
     return {"access_token": access_token, "token_type": "bearer"}
     # 返回访问令牌和令牌类型
 
 
+@router.get("/hash-pool-stats")
+def get_hash_pool_stats(current_user: User = Depends(get_current_superuser)):
+    """
+    密码哈希线程池统计接口
+    
+    返回:
+        dict: 线程数、排队上限、正在执行数、排队数、完成数、拒绝数和平均耗时
+    
+    说明:
+        - 用于观察登录高峰时密码验证的排队情况
+        - 仅超级管理员可访问
+    """
+    return password_hash_pool.stats()
+
+
 @router.get("/me", response_model=UserResponse)
 def read_users_me(current_user: User = Depends(get_current_active_user)):
     """
@@ -168,16 +214,22 @@ def update_user_me(
         - 只更新传入的字段，其他字段保持不变
         - 用户名和密码不能通过此接口修改
     """
+    db_user = db.query(User).filter(User.id == current_user.id).first()
+    # current_user是缓存的用户快照，修改前需要查询对应的数据库对象
+    
     for field, value in user_update.model_dump(exclude_unset=True).items():
         # 遍历所有要更新的字段
         # exclude_unset=True: 只包含实际设置了值的字段
-        setattr(current_user, field, value)
+        setattr(db_user, field, value)
         # 动态设置对象的属性值
     
     db.commit()
     # 提交事务，保存更改
     
-    db.refresh(current_user)
+    invalidate_user_cache(db_user.id)
+    # 删除用户快照缓存，下次请求重新加载
+    
+    db.refresh(db_user)
     # 刷新对象，获取更新后的数据
     
-    return current_user
+    return db_user
@@ -1,47 +1,65 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db, get_async_read_db
+from app.core.config import get_settings
 from app.core.deps import PermissionChecker
+from app.core.responses import fast_list_response
+from app.utils.helpers import paginate_async
 from app.models import User
 from app.schemas.finance import PaymentCreate, PaymentResponse, PaymentUpdate, PaymentListResponse, PaymentApprove, BillCreate, BillResponse, BillUpdate, BillListResponse, AccountCreate, AccountResponse, AccountUpdate, CostCenterCreate, CostCenterResponse, CostCenterUpdate
 
 router = APIRouter()
 
+settings = get_settings()
+
 
 @router.get("/payments/", response_model=PaymentListResponse)
-def get_payments(
+async def get_payments(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = Query(None, description="上一页返回的next_cursor，传入后忽略skip"),
+    with_total: bool = Query(True, description="是否统计总数，翻页时可传false省去COUNT查询"),
     type: str = Query(None),
     status: str = Query(None),
     current_user: User = Depends(PermissionChecker("payment:read")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     获取付款单据列表
     
     支持分页查询，可按类型和状态筛选
+    支持游标分页：传入上一页返回的next_cursor继续读取，深度翻页不会变慢
     返回付款单据列表及总数
     """
     from app.models import Payment
     
-    query = db.query(Payment)
+    query = select(Payment)
     if type:
-        query = query.filter(Payment.type == type)
+        query = query.where(Payment.type == type)
     if status:
-        query = query.filter(Payment.status == status)
+        query = query.where(Payment.status == status)
+    
+    if settings.FAST_JSON_RESPONSES:
+        return await fast_list_response(
+            db, query, PaymentResponse, skip, limit,
+            cursor_model=Payment, cursor=cursor, with_total=with_total
+        )
     
-    total = query.count()
-    payments = query.order_by(Payment.created_at.desc()).offset(skip).limit(limit).all()
-    return PaymentListResponse(total=total, items=payments)
+    page = await paginate_async(
+        db, query, skip, limit,
+        cursor_model=Payment, cursor=cursor, with_total=with_total
+    )
+    return PaymentListResponse(total=page.total, items=page.items, next_cursor=page.next_cursor)
 
 
 @router.get("/payments/{payment_id}", response_model=PaymentResponse)
 def get_payment(
     payment_id: int,
     current_user: User = Depends(PermissionChecker("payment:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取单个付款单据详情
@@ -69,6 +87,7 @@ def create_payment(
     自动记录操作人员ID
     """
     from app.models import Payment
+    from app.services.rollups import track_rollup
     
     existing = db.query(Payment).filter(Payment.code == payment.code).first()
     if existing:
@@ -79,6 +98,8 @@ def create_payment(
         **payment.model_dump()
     )
     db.add(db_payment)
+    db.flush()
+    track_rollup(db, db_payment)
     db.commit()
     db.refresh(db_payment)
     return db_payment
@@ -98,13 +119,16 @@ def update_payment(
     只更新提供的字段
     """
     from app.models import Payment
+    from app.services.rollups import track_rollup
     
     db_payment = db.query(Payment).filter(Payment.id == payment_id).first()
     if not db_payment:
         raise HTTPException(status_code=404, detail="Payment not found")
     
+    track_rollup(db, db_payment, -1)
     for field, value in payment_update.model_dump(exclude_unset=True).items():
         setattr(db_payment, field, value)
+    track_rollup(db, db_payment)
     
     db.commit()
     db.refresh(db_payment)
@@ -125,6 +149,7 @@ def approve_payment(
     只有待审批的单据才能审批
     """
     from app.models import Payment
+    from app.services.rollups import track_rollup
     from datetime import datetime
     
     db_payment = db.query(Payment).filter(Payment.id == payment_id).first()
@@ -138,48 +163,61 @@ def approve_payment(
     db_payment.approved_by = current_user.id
     db_payment.approved_at = datetime.utcnow()
     
+    track_rollup(db, db_payment, -1)
     if approve.approval_status == "approved":
         db_payment.status = "completed"
     else:
         db_payment.status = "cancelled"
+    track_rollup(db, db_payment)
     
     db.commit()
     return {"message": f"Payment {approve.approval_status} successfully"}
 
 
 @router.get("/bills/", response_model=BillListResponse)
-def get_bills(
+async def get_bills(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = Query(None, description="上一页返回的next_cursor，传入后忽略skip"),
+    with_total: bool = Query(True, description="是否统计总数，翻页时可传false省去COUNT查询"),
     type: str = Query(None),
     status: str = Query(None),
     current_user: User = Depends(PermissionChecker("bill:read")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     获取账单列表
     
     支持分页查询，可按类型和状态筛选
+    支持游标分页：传入上一页返回的next_cursor继续读取，深度翻页不会变慢
     返回账单列表及总数
     """
     from app.models import Bill
     
-    query = db.query(Bill)
+    query = select(Bill)
     if type:
-        query = query.filter(Bill.type == type)
+        query = query.where(Bill.type == type)
     if status:
-        query = query.filter(Bill.status == status)
+        query = query.where(Bill.status == status)
     
-    total = query.count()
-    bills = query.order_by(Bill.created_at.desc()).offset(skip).limit(limit).all()
-    return BillListResponse(total=total, items=bills)
+    if settings.FAST_JSON_RESPONSES:
+        return await fast_list_response(
+            db, query, BillResponse, skip, limit,
+            cursor_model=Bill, cursor=cursor, with_total=with_total
+        )
+    
+    page = await paginate_async(
+        db, query, skip, limit,
+        cursor_model=Bill, cursor=cursor, with_total=with_total
+    )
+    return BillListResponse(total=page.total, items=page.items, next_cursor=page.next_cursor)
 
 
 @router.get("/bills/{bill_id}", response_model=BillResponse)
 def get_bill(
     bill_id: int,
     current_user: User = Depends(PermissionChecker("bill:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取单个账单详情
@@ -261,7 +299,7 @@ def update_bill(
 @router.get("/accounts/", response_model=List[AccountResponse])
 def get_accounts(
     current_user: User = Depends(PermissionChecker("account:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取银行账户列表
@@ -327,7 +365,7 @@ def update_account(
 @router.get("/cost-centers/", response_model=List[CostCenterResponse])
 def get_cost_centers(
     current_user: User = Depends(PermissionChecker("costcenter:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取成本中心列表
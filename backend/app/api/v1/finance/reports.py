@@ -1,42 +1,55 @@
 from typing import List
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from app.db.session import get_db
-from app.core.deps import PermissionChecker, get_current_active_user
+from sqlalchemy import func, and_, select
+from app.db.session import get_read_db, replica_set
+from app.core.cache import get_cache, data_versions, cache_stats
+from app.core.config import get_settings
+from app.core.deps import PermissionChecker, get_current_active_user, get_current_superuser
 from app.models import User
 
 router = APIRouter()
 
+settings = get_settings()
+
+# 仪表板统计依赖的数据表，任意一张表发生变化都会使缓存失效
+DASHBOARD_TABLES = ("products", "suppliers", "customers", "purchase_orders", "sales_orders", "bills")
+
 
 @router.get("/purchase-summary")
 def get_purchase_summary(
     start_date: str = Query(None),
     end_date: str = Query(None),
+    supplier_id: int = Query(None),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     采购汇总报表
     
     按日期统计采购订单数量和总金额
-    支持按日期范围筛选
+    支持按日期范围和供应商筛选
+    数据来自采购日汇总表，不扫描订单表
     """
-    from app.models import PurchaseOrder
+    from app.models import PurchaseDailyRollup
     from datetime import datetime
     
     query = db.query(
-        func.date(PurchaseOrder.created_at).label("date"),
-        func.count(PurchaseOrder.id).label("count"),
-        func.sum(PurchaseOrder.total_amount).label("total_amount")
+        PurchaseDailyRollup.day.label("date"),
+        func.sum(PurchaseDailyRollup.order_count).label("count"),
+        func.sum(PurchaseDailyRollup.total_amount).label("total_amount")
     )
     
     if start_date:
-        query = query.filter(PurchaseOrder.created_at >= datetime.fromisoformat(start_date))
+        query = query.filter(PurchaseDailyRollup.day >= datetime.fromisoformat(start_date).date())
     if end_date:
-        query = query.filter(PurchaseOrder.created_at <= datetime.fromisoformat(end_date))
+        query = query.filter(PurchaseDailyRollup.day <= datetime.fromisoformat(end_date).date())
+    if supplier_id:
+        query = query.filter(PurchaseDailyRollup.supplier_id == supplier_id)
     
-    result = query.group_by(func.date(PurchaseOrder.created_at)).all()
+    result = query.group_by(PurchaseDailyRollup.day).having(
+        func.sum(PurchaseDailyRollup.order_count) > 0
+    ).order_by(PurchaseDailyRollup.day).all()
     
     return {
         "data": [
@@ -54,30 +67,36 @@ def get_purchase_summary(
 def get_sales_summary(
     start_date: str = Query(None),
     end_date: str = Query(None),
+    customer_id: int = Query(None),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     销售汇总报表
     
     按日期统计销售订单数量和总金额
-    支持按日期范围筛选
+    支持按日期范围和客户筛选
+    数据来自销售日汇总表，不扫描订单表
     """
-    from app.models import SalesOrder
+    from app.models import SalesDailyRollup
     from datetime import datetime
     
     query = db.query(
-        func.date(SalesOrder.created_at).label("date"),
-        func.count(SalesOrder.id).label("count"),
-        func.sum(SalesOrder.total_amount).label("total_amount")
+        SalesDailyRollup.day.label("date"),
+        func.sum(SalesDailyRollup.order_count).label("count"),
+        func.sum(SalesDailyRollup.total_amount).label("total_amount")
     )
     
     if start_date:
-        query = query.filter(SalesOrder.created_at >= datetime.fromisoformat(start_date))
+        query = query.filter(SalesDailyRollup.day >= datetime.fromisoformat(start_date).date())
     if end_date:
-        query = query.filter(SalesOrder.created_at <= datetime.fromisoformat(end_date))
+        query = query.filter(SalesDailyRollup.day <= datetime.fromisoformat(end_date).date())
+    if customer_id:
+        query = query.filter(SalesDailyRollup.customer_id == customer_id)
     
-    result = query.group_by(func.date(SalesOrder.created_at)).all()
+    result = query.group_by(SalesDailyRollup.day).having(
+        func.sum(SalesDailyRollup.order_count) > 0
+    ).order_by(SalesDailyRollup.day).all()
     
     return {
         "data": [
@@ -94,35 +113,36 @@ def get_sales_summary(
 @router.get("/inventory-status")
 def get_inventory_status(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     库存状态报表
     
     统计正常、低库存和超库存产品数量
     返回低库存产品列表
+    基于库存快照向量化计算，不加载产品对象
     """
-    from app.models import Product, ProductCategory
+    from app.services.inventory_snapshot import get_inventory_snapshot, summarize_inventory, low_stock_products
     
-    products = db.query(Product).all()
-    
-    normal_products = [p for p in products if p.min_stock <= p.current_stock <= p.max_stock]
-    low_stock_products = [p for p in products if p.current_stock < p.min_stock]
-    overstock_products = [p for p in products if p.current_stock > p.max_stock]
+    snapshot = get_inventory_snapshot(db)
+    summary = summarize_inventory(snapshot)
     
     return {
-        "total": len(products),
-        "normal": len(normal_products),
-        "low_stock": len(low_stock_products),
-        "overstock": len(overstock_products),
-        "low_stock_products": [{"id": p.id, "name": p.name, "code": p.code, "current_stock": p.current_stock, "min_stock": p.min_stock} for p in low_stock_products[:10]]
+        "total": summary.total,
+        "normal": summary.normal,
+        "low_stock": summary.low_stock,
+        "overstock": summary.overstock,
+        "low_stock_products": [
+            {"id": p["id"], "name": p["name"], "code": p["code"], "current_stock": p["current_stock"], "min_stock": p["min_stock"]}
+            for p in low_stock_products(db, snapshot, summary.low_stock_index)
+        ]
     }
 
 
 @router.get("/supplier-performance")
 def get_supplier_performance(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     供应商绩效报表
@@ -161,7 +181,7 @@ def get_supplier_performance(
 @router.get("/customer-analysis")
 def get_customer_analysis(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     客户分析报表
@@ -202,7 +222,7 @@ def get_financial_summary(
     start_date: str = Query(None),
     end_date: str = Query(None),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     财务汇总报表
@@ -211,7 +231,7 @@ def get_financial_summary(
     统计应收和应付账单总金额
     支持按日期范围筛选
     """
-    from app.models import Payment, Bill
+    from app.models import Payment, Bill, PaymentDailyRollup
     from datetime import datetime
     
     payment_query = db.query(Payment)
@@ -226,8 +246,8 @@ def get_financial_summary(
         payment_query = payment_query.filter(Payment.payment_date <= end)
         bill_query = bill_query.filter(Bill.bill_date <= end)
     
-    total_in = db.query(func.sum(Payment.amount)).filter(Payment.type == "receive").scalar() or 0
-    total_out = db.query(func.sum(Payment.amount)).filter(Payment.type == "pay").scalar() or 0
+    total_in = db.query(func.sum(PaymentDailyRollup.total_amount)).filter(PaymentDailyRollup.type == "receive").scalar() or 0
+    total_out = db.query(func.sum(PaymentDailyRollup.total_amount)).filter(PaymentDailyRollup.type == "pay").scalar() or 0
     
     total_receivable = db.query(func.sum(Bill.amount)).filter(Bill.type == "receivable").scalar() or 0
     total_payable = db.query(func.sum(Bill.amount)).filter(Bill.type == "payable").scalar() or 0
@@ -244,7 +264,7 @@ def get_financial_summary(
 @router.get("/dashboard")
 def get_dashboard_stats(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     仪表板统计数据
@@ -252,36 +272,114 @@ def get_dashboard_stats(
     统计产品、供应商、客户数量
     统计待处理订单数量
     统计未收未付金额
+    
+    所有统计项通过一条SQL（标量子查询）完成
+    结果按相关数据表的版本号缓存，数据变化后自动失效
     """
     from app.models import Product, Supplier, Customer, PurchaseOrder, SalesOrder, Bill
     
-    total_products = db.query(func.count(Product.id)).scalar() or 0
-    low_stock_count = db.query(func.count(Product.id)).filter(Product.current_stock < Product.min_stock).scalar() or 0
-    
-    total_suppliers = db.query(func.count(Supplier.id)).scalar() or 0
-    total_customers = db.query(func.count(Customer.id)).scalar() or 0
-    
-    pending_orders = db.query(func.count(PurchaseOrder.id)).filter(PurchaseOrder.status == "pending").scalar() or 0
-    pending_sales = db.query(func.count(SalesOrder.id)).filter(SalesOrder.status == "pending").scalar() or 0
-    
-    unpaid_receivable = db.query(func.sum(Bill.amount)).filter(Bill.type == "receivable", Bill.status != "paid").scalar() or 0
-    unpaid_payable = db.query(func.sum(Bill.amount)).filter(Bill.type == "payable", Bill.status != "paid").scalar() or 0
-    
-    return {
+    cache = get_cache("dashboard", settings.DASHBOARD_CACHE_TTL, maxsize=16)
+    cache_key = data_versions.get(*DASHBOARD_TABLES)
+    if settings.DASHBOARD_CACHE_TTL > 0:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    def scalar(column, *criteria):
+        return select(column).where(*criteria).scalar_subquery()
+    
+    row = db.execute(select(
+        scalar(func.count(Product.id)).label("total_products"),
+        scalar(func.count(Product.id), Product.current_stock < Product.min_stock).label("low_stock_count"),
+        scalar(func.count(Supplier.id)).label("total_suppliers"),
+        scalar(func.count(Customer.id)).label("total_customers"),
+        scalar(func.count(PurchaseOrder.id), PurchaseOrder.status == "pending").label("pending_orders"),
+        scalar(func.count(SalesOrder.id), SalesOrder.status == "pending").label("pending_sales"),
+        scalar(func.sum(Bill.amount), Bill.type == "receivable", Bill.status != "paid").label("unpaid_receivable"),
+        scalar(func.sum(Bill.amount), Bill.type == "payable", Bill.status != "paid").label("unpaid_payable"),
+    )).one()
+    
+    result = {
         "products": {
-            "total": total_products,
-            "low_stock": low_stock_count
+            "total": row.total_products or 0,
+            "low_stock": row.low_stock_count or 0
         },
         "partners": {
-            "suppliers": total_suppliers,
-            "customers": total_customers
+            "suppliers": row.total_suppliers or 0,
+            "customers": row.total_customers or 0
         },
         "orders": {
-            "pending_purchase": pending_orders,
-            "pending_sales": pending_sales
+            "pending_purchase": row.pending_orders or 0,
+            "pending_sales": row.pending_sales or 0
         },
         "finance": {
-            "unpaid_receivable": float(unpaid_receivable),
-            "unpaid_payable": float(unpaid_payable)
+            "unpaid_receivable": float(row.unpaid_receivable or 0),
+            "unpaid_payable": float(row.unpaid_payable or 0)
         }
     }
+    
+    if settings.DASHBOARD_CACHE_TTL > 0:
+        cache.set(cache_key, result)
+    return result
+
+
+@router.get("/cache-stats")
+def get_cache_stats(
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    缓存统计信息
+    
+    返回所有进程内缓存（包括产品目录缓存）的容量、命中和未命中次数
+    仅超级管理员可访问
+    """
+    from app.services.catalog import product_catalog
+    return {"data": [*cache_stats(), product_catalog.stats()]}
+
+
+@router.get("/replica-stats")
+def get_replica_stats(
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    只读副本状态
+    
+    返回每个只读副本的健康状态和最近一次错误
+    仅超级管理员可访问
+    """
+    return {"data": replica_set.stats()}
+
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    慢查询记录
+    
+    返回本进程最近执行时间超过阈值的SQL语句，最新的在前
+    包括语句文本、参数形态、耗时、发起请求的路由，开启SLOW_QUERY_EXPLAIN时包括执行计划
+    仅超级管理员可访问
+    """
+    from app.core.slow_queries import slow_query_log
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "total": slow_query_log.total,
+        "data": slow_query_log.entries(limit)
+    }
+
+
+@router.delete("/slow-queries")
+def clear_slow_queries(
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    清空慢查询记录
+    
+    只清空本进程保留的记录，不影响累计总数
+    仅超级管理员可访问
+    """
+    from app.core.slow_queries import slow_query_log
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
@@ -1,52 +1,83 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db, get_async_read_db
+from app.core.config import get_settings
 from app.core.deps import PermissionChecker
+from app.core.responses import fast_list_response
+from app.utils.helpers import paginate_async
+from app.services.catalog import product_catalog
 from app.models import User
-from app.schemas.inventory import ProductCreate, ProductResponse, ProductUpdate, ProductListResponse, WarehouseCreate, WarehouseResponse, WarehouseUpdate, StockRecordCreate, StockRecordResponse, StockRecordListResponse, StockCheckCreate, StockCheckResponse, StockCheckUpdate, StockCheckDetailResponse
+from app.schemas.inventory import ProductCreate, ProductResponse, ProductUpdate, ProductListResponse, ProductCatalogItem, WarehouseCreate, WarehouseResponse, WarehouseUpdate, StockRecordCreate, StockRecordResponse, StockRecordListResponse, StockRecordBatchCreate, StockRecordBatchResponse, ProductStockResponse, StockCheckCreate, StockCheckResponse, StockCheckUpdate, StockCheckDetailResponse
 
 router = APIRouter()
 
+settings = get_settings()
+
 
 @router.get("/products/", response_model=ProductListResponse)
-def get_products(
+async def get_products(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     keyword: str = Query(None),
     category_id: int = Query(None),
     current_user: User = Depends(PermissionChecker("product:read")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     获取产品列表
     
     支持分页查询和关键词搜索
-    关键词可以搜索产品名称或编码
+    关键词可以搜索产品编码、名称或规格，使用搜索索引，按相关度排序
     可按分类ID筛选
     返回产品列表及总数
     """
     from app.models import Product
+    from app.services.search import search
     
-    query = db.query(Product)
+    query = select(Product)
     if keyword:
-        query = query.filter(
-            (Product.name.contains(keyword)) |
-            (Product.code.contains(keyword))
-        )
+        query = search(query, Product, keyword)
     if category_id:
-        query = query.filter(Product.category_id == category_id)
+        query = query.where(Product.category_id == category_id)
+    
+    if settings.FAST_JSON_RESPONSES:
+        return await fast_list_response(db, query, ProductResponse, skip, limit)
+    
+    page = await paginate_async(db, query, skip, limit)
+    return ProductListResponse(total=page.total, items=page.items)
+
+
+@router.get("/products/lookup", response_model=List[ProductCatalogItem])
+def lookup_products(
+    ids: List[int] = Query([], max_length=500),
+    codes: List[str] = Query([], max_length=500),
+    current_user: User = Depends(PermissionChecker("product:read")),
+    db: Session = Depends(get_read_db)
+):
+    """
+    按ID和编码批量查询产品基本信息
     
-    total = query.count()
-    products = query.offset(skip).limit(limit).all()
-    return ProductListResponse(total=total, items=products)
+    录入订单、库存单据时按编码带出名称、单位、规格和价格
+    从产品目录缓存读取，未命中的产品用一次查询从数据库加载
+    不存在的ID和编码不出现在结果中，结果按请求顺序排列并去重
+    """
+    found = product_catalog.get_many(db, ids=ids, codes=codes)
+    items = {}
+    for key in (*ids, *codes):
+        info = found.get(key)
+        if info is not None:
+            items.setdefault(info.id, info._asdict())
+    return list(items.values())
 
 
 @router.get("/products/{product_id}", response_model=ProductResponse)
 def get_product(
     product_id: int,
     current_user: User = Depends(PermissionChecker("product:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取单个产品详情
@@ -61,6 +92,46 @@ def get_product(
     return product
 
 
+@router.get("/products/{product_id}/stock", response_model=ProductStockResponse)
+def get_product_stock(
+    product_id: int,
+    current_user: User = Depends(PermissionChecker("stock:read")),
+    db: Session = Depends(get_db)
+):
+    """
+    获取产品的分仓库存
+    
+    返回产品总库存、已预留库存、可用库存和每个仓库的库存余额
+    按warehouse_stock表的(product_id, warehouse_id)唯一索引读取，不扫描库存台账
+    已预留库存直接读取products.reserved_stock，不汇总未完成的销售订单
+    库存用于出库决策，读取主库以保证是最新数据
+    如果产品不存在，返回404错误
+    """
+    from app.models import Product, Warehouse, WarehouseStock
+    
+    product = db.query(Product.current_stock, Product.reserved_stock).filter(Product.id == product_id).first()
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    current_stock, reserved_stock = product
+    
+    rows = db.query(
+        WarehouseStock.warehouse_id, Warehouse.code, Warehouse.name, WarehouseStock.quantity
+    ).join(Warehouse, Warehouse.id == WarehouseStock.warehouse_id).filter(
+        WarehouseStock.product_id == product_id
+    ).order_by(WarehouseStock.warehouse_id).all()
+    
+    return {
+        "product_id": product_id,
+        "current_stock": current_stock,
+        "reserved_stock": reserved_stock,
+        "available_stock": current_stock - reserved_stock,
+        "warehouses": [
+            {"warehouse_id": warehouse_id, "warehouse_code": code, "warehouse_name": name, "quantity": quantity}
+            for warehouse_id, code, name, quantity in rows
+        ]
+    }
+
+
 @router.post("/products/", response_model=ProductResponse)
 def create_product(
     product: ProductCreate,
@@ -72,6 +143,7 @@ def create_product(
     
     接收产品数据，检查编码是否已存在
     如果编码不存在，创建新产品并返回
+    提交后通知产品目录缓存，该产品在所有工作进程中按需从数据库加载
     """
     from app.models import Product
     
@@ -83,6 +155,7 @@ def create_product(
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    product_catalog.invalidate(db_product.id)
     return db_product
 
 
@@ -97,7 +170,7 @@ def update_product(
     更新产品信息
     
     根据产品ID更新数据
-    只更新提供的字段
+    只更新提供的字段，提交后使产品目录缓存中的该产品失效
     """
     from app.models import Product
     
@@ -110,6 +183,7 @@ def update_product(
     
     db.commit()
     db.refresh(db_product)
+    product_catalog.invalidate(db_product.id)
     return db_product
 
 
@@ -122,7 +196,7 @@ def delete_product(
     """
     删除产品
     
-    根据产品ID删除产品
+    根据产品ID删除产品，提交后使产品目录缓存中的该产品失效
     """
     from app.models import Product
     db_product = db.query(Product).filter(Product.id == product_id).first()
@@ -131,13 +205,14 @@ def delete_product(
     
     db.delete(db_product)
     db.commit()
+    product_catalog.invalidate(product_id)
     return {"message": "Product deleted successfully"}
 
 
 @router.get("/warehouses/", response_model=List[WarehouseResponse])
 def get_warehouses(
     current_user: User = Depends(PermissionChecker("warehouse:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取仓库列表
@@ -222,31 +297,42 @@ def delete_warehouse(
 
 
 @router.get("/stock-records/", response_model=StockRecordListResponse)
-def get_stock_records(
+async def get_stock_records(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = Query(None, description="上一页返回的next_cursor，传入后忽略skip"),
+    with_total: bool = Query(True, description="是否统计总数，翻页时可传false省去COUNT查询"),
     warehouse_id: int = Query(None),
     type: str = Query(None),
     current_user: User = Depends(PermissionChecker("stock:read")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     获取库存记录列表
     
     支持分页查询，可按仓库ID和类型筛选
+    支持游标分页：传入上一页返回的next_cursor继续读取，深度翻页不会变慢
     返回库存记录列表及总数
     """
     from app.models import StockRecord
     
-    query = db.query(StockRecord)
+    query = select(StockRecord)
     if warehouse_id:
-        query = query.filter(StockRecord.warehouse_id == warehouse_id)
+        query = query.where(StockRecord.warehouse_id == warehouse_id)
     if type:
-        query = query.filter(StockRecord.type == type)
+        query = query.where(StockRecord.type == type)
     
-    total = query.count()
-    records = query.order_by(StockRecord.created_at.desc()).offset(skip).limit(limit).all()
-    return StockRecordListResponse(total=total, items=records)
+    if settings.FAST_JSON_RESPONSES:
+        return await fast_list_response(
+            db, query, StockRecordResponse, skip, limit,
+            cursor_model=StockRecord, cursor=cursor, with_total=with_total
+        )
+    
+    page = await paginate_async(
+        db, query, skip, limit,
+        cursor_model=StockRecord, cursor=cursor, with_total=with_total
+    )
+    return StockRecordListResponse(total=page.total, items=page.items, next_cursor=page.next_cursor)
 
 
 @router.post("/stock-records/", response_model=StockRecordResponse)
@@ -260,17 +346,31 @@ def create_stock_record(
     
     自动生成记录编码
     计算金额（数量×单价）
-    根据类型更新产品库存：入库增加，出库减少
-    出库时检查库存是否充足
+    根据类型更新产品库存和仓库库存余额：入库增加，出库减少
+    库存检查和扣减由带条件的UPDATE原子完成，出库时可用库存（扣除已预留）或该仓库库存不足返回400
+    销售发货出库（reference_type为sale，reference_code为销售单号）消耗该订单对该产品的预留
     """
     from app.models import StockRecord, Product
     from app.utils.helpers import generate_code
+    from app.services.stock import adjust_stock, consume_reservation, ProductNotFound, InsufficientStock
     
-    product = db.query(Product).filter(Product.id == record.product_id).first()
-    if not product:
+    code = generate_code("SR")
+    # 先分配编码再修改库存，库存行锁只在本事务剩余的很短时间内持有
+    
+    delta = {"in": record.quantity, "out": -record.quantity}.get(record.type)
+    if delta is not None:
+        reserved = 0
+        if record.type == "out" and record.reference_type == "sale":
+            reserved = consume_reservation(db, record.reference_code, record.product_id, record.quantity)
+        try:
+            adjust_stock(db, record.product_id, delta, warehouse_id=record.warehouse_id, reserved=reserved)
+        except ProductNotFound:
+            raise HTTPException(status_code=404, detail="Product not found")
+        except InsufficientStock:
+            raise HTTPException(status_code=400, detail="Insufficient stock")
+    elif not db.query(Product.id).filter(Product.id == record.product_id).first():
         raise HTTPException(status_code=404, detail="Product not found")
     
-    code = generate_code("SR")
     amount = record.quantity * record.unit_price
     
     db_record = StockRecord(
@@ -281,22 +381,45 @@ def create_stock_record(
     )
     db.add(db_record)
     
-    if record.type == "in":
-        product.current_stock += record.quantity
-    elif record.type == "out":
-        if product.current_stock < record.quantity:
-            raise HTTPException(status_code=400, detail="Insufficient stock")
-        product.current_stock -= record.quantity
-    
     db.commit()
     db.refresh(db_record)
     return db_record
 
 
+@router.post("/stock-records/batch", response_model=StockRecordBatchResponse)
+def create_stock_records_batch(
+    batch: StockRecordBatchCreate,
+    current_user: User = Depends(PermissionChecker("stock:create")),
+    db: Session = Depends(get_db)
+):
+    """
+    批量创建库存记录
+    
+    一次加载涉及的产品和仓库库存，按产品和仓库汇总净变化量更新库存，批量插入记录，只提交一次
+    逐条校验：产品或仓库不存在、出库时库存不足的记录不会写入，在errors中按下标返回原因
+    校验之后库存被其他请求并发修改导致不足时，整批回滚并返回409
+    """
+    from app.services.stock import create_stock_records_batch as create_batch, InsufficientStock
+    
+    try:
+        result = create_batch(db, batch.records, operator_id=current_user.id)
+    except InsufficientStock:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Stock changed concurrently, please retry")
+    
+    db.commit()
+    return StockRecordBatchResponse(
+        total=result.total,
+        created=result.created,
+        failed=len(result.errors),
+        errors=result.errors
+    )
+
+
 @router.get("/stock-checks/", response_model=List[StockCheckResponse])
 def get_stock_checks(
     current_user: User = Depends(PermissionChecker("stock:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取库存盘点列表
@@ -319,10 +442,12 @@ def create_stock_check(
     
     自动生成盘点编码
     为每个产品计算盘点差异（实际数量-账面数量）
-    账面数量默认使用当前库存
+    账面数量默认使用该产品在盘点仓库的库存余额
+    明细按块用一次IN查询加载产品和库存余额，批量插入
     """
-    from app.models import StockCheck, StockCheckItem, Product
+    from app.models import StockCheck
     from app.utils.helpers import generate_code
+    from app.services.stock import insert_stock_check_items
     
     code = generate_code("SC")
     
@@ -334,17 +459,42 @@ def create_stock_check(
     db.add(db_check)
     db.flush()
     
-    for item in check.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            diff = (item.actual_quantity or 0) - (item.book_quantity or 0)
-            db_item = StockCheckItem(
-                stock_check_id=db_check.id,
-                **item.model_dump(),
-                diff_quantity=diff,
-                book_quantity=item.book_quantity or product.current_stock
-            )
-            db.add(db_item)
+    insert_stock_check_items(db, db_check.id, check.warehouse_id, (item.model_dump() for item in check.items))
+    
+    db.commit()
+    db.refresh(db_check)
+    return db_check
+
+
+@router.post("/stock-checks/upload", response_model=StockCheckResponse)
+def upload_stock_check(
+    warehouse_id: int = Form(...),
+    remark: str = Form(None),
+    file: UploadFile = File(..., description="CSV盘点表，列：product_id或product_code、actual_quantity，可选book_quantity、remark"),
+    current_user: User = Depends(PermissionChecker("stock:create")),
+    db: Session = Depends(get_db)
+):
+    """
+    上传盘点表创建库存盘点
+    
+    逐行解析上传的CSV文件并按块写入明细，不会把整张盘点表转换成一个请求模型，适合整仓盘点的数万行明细
+    盘点表格式错误时返回400，不创建盘点
+    """
+    from app.models import StockCheck
+    from app.utils.helpers import generate_code
+    from app.services.stock import insert_stock_check_items, read_count_sheet
+    
+    code = generate_code("SC")
+    
+    db_check = StockCheck(code=code, warehouse_id=warehouse_id, operator_id=current_user.id, remark=remark)
+    db.add(db_check)
+    db.flush()
+    
+    try:
+        insert_stock_check_items(db, db_check.id, warehouse_id, read_count_sheet(file.file))
+    except (ValueError, UnicodeDecodeError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     
     db.commit()
     db.refresh(db_check)
@@ -361,9 +511,12 @@ def complete_stock_check(
     完成库存盘点
     
     更新盘点状态为已完成
-    根据盘点差异调整产品库存
+    根据盘点差异调整产品库存和盘点仓库的库存余额
+    差异按产品汇总后用UPDATE ... FROM一次调整，明细数量不影响语句条数
+    盘亏数量超过该仓库当前库存时返回400，整个盘点不做任何调整
     """
-    from app.models import StockCheck, StockCheckItem, Product
+    from app.models import StockCheck
+    from app.services.stock import apply_stock_check, InsufficientStock
     
     db_check = db.query(StockCheck).filter(StockCheck.id == check_id).first()
     if not db_check:
@@ -374,10 +527,13 @@ def complete_stock_check(
     
     db_check.status = "completed"
     
-    for item in db_check.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product and item.diff_quantity:
-            product.current_stock += item.diff_quantity
+    try:
+        apply_stock_check(db, db_check.id, db_check.warehouse_id)
+    except InsufficientStock as e:
+        db.rollback()
+        if e.product_id is None:
+            raise HTTPException(status_code=409, detail="Stock changed concurrently, please retry")
+        raise HTTPException(status_code=400, detail=f"Insufficient stock for product {e.product_id}")
     
     db.commit()
     return {"message": "Stock check completed successfully"}
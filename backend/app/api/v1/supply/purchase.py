@@ -1,47 +1,65 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db, get_async_read_db
+from app.core.config import get_settings
 from app.core.deps import PermissionChecker
+from app.core.responses import fast_list_response
+from app.utils.helpers import paginate_async
 from app.models import User
 from app.schemas.purchase import PurchaseOrderCreate, PurchaseOrderResponse, PurchaseOrderUpdate, PurchaseOrderListResponse, PurchaseOrderDetailResponse, PurchaseOrderApprove
 
 router = APIRouter()
 
+settings = get_settings()
+
 
 @router.get("/", response_model=PurchaseOrderListResponse)
-def get_purchase_orders(
+async def get_purchase_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = Query(None, description="上一页返回的next_cursor，传入后忽略skip"),
+    with_total: bool = Query(True, description="是否统计总数，翻页时可传false省去COUNT查询"),
     status: str = Query(None),
     supplier_id: int = Query(None),
     current_user: User = Depends(PermissionChecker("purchase:read")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     获取采购订单列表
     
     支持分页查询，可按状态和供应商ID筛选
+    支持游标分页：传入上一页返回的next_cursor继续读取，深度翻页不会变慢
     返回采购订单列表及总数
     """
     from app.models import PurchaseOrder
     
-    query = db.query(PurchaseOrder)
+    query = select(PurchaseOrder)
     if status:
-        query = query.filter(PurchaseOrder.status == status)
+        query = query.where(PurchaseOrder.status == status)
     if supplier_id:
-        query = query.filter(PurchaseOrder.supplier_id == supplier_id)
+        query = query.where(PurchaseOrder.supplier_id == supplier_id)
+    
+    if settings.FAST_JSON_RESPONSES:
+        return await fast_list_response(
+            db, query, PurchaseOrderResponse, skip, limit,
+            cursor_model=PurchaseOrder, cursor=cursor, with_total=with_total
+        )
     
-    total = query.count()
-    orders = query.order_by(PurchaseOrder.created_at.desc()).offset(skip).limit(limit).all()
-    return PurchaseOrderListResponse(total=total, items=orders)
+    page = await paginate_async(
+        db, query, skip, limit,
+        cursor_model=PurchaseOrder, cursor=cursor, with_total=with_total
+    )
+    return PurchaseOrderListResponse(total=page.total, items=page.items, next_cursor=page.next_cursor)
 
 
 @router.get("/{order_id}", response_model=PurchaseOrderDetailResponse)
 def get_purchase_order(
     order_id: int,
     current_user: User = Depends(PermissionChecker("purchase:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取采购订单详情
@@ -68,10 +86,11 @@ def create_purchase_order(
     
     自动生成订单编码（PO前缀）
     计算订单总金额（所有明细金额之和）
-    创建订单和订单明细
+    创建订单和订单明细，明细批量插入
     """
     from app.models import PurchaseOrder, PurchaseOrderItem
     from app.utils.helpers import generate_code
+    from app.services.rollups import track_rollup
     
     code = generate_code("PO")
     
@@ -88,13 +107,14 @@ def create_purchase_order(
     db.add(db_order)
     db.flush()
     
-    for item in order.items:
-        db_item = PurchaseOrderItem(
-            purchase_order_id=db_order.id,
-            **item.model_dump(),
-            amount=item.quantity * item.unit_price
-        )
-        db.add(db_item)
+    if order.items:
+        db.execute(insert(PurchaseOrderItem), [
+            dict(item.model_dump(), purchase_order_id=db_order.id, amount=item.quantity * item.unit_price)
+            for item in order.items
+        ])
+        # 明细一次批量插入
+    
+    track_rollup(db, db_order)
     
     db.commit()
     db.refresh(db_order)
@@ -115,6 +135,7 @@ def update_purchase_order(
     只更新提供的字段
     """
     from app.models import PurchaseOrder
+    from app.services.rollups import track_rollup
     
     db_order = db.query(PurchaseOrder).filter(PurchaseOrder.id == order_id).first()
     if not db_order:
@@ -123,8 +144,10 @@ def update_purchase_order(
     if db_order.status != "pending":
         raise HTTPException(status_code=400, detail="Can only update pending orders")
     
+    track_rollup(db, db_order, -1)
     for field, value in order_update.model_dump(exclude_unset=True).items():
         setattr(db_order, field, value)
+    track_rollup(db, db_order)
     
     db.commit()
     db.refresh(db_order)
@@ -146,6 +169,7 @@ def approve_purchase_order(
     审批通过后订单状态变为已审批，拒绝则变为已取消
     """
     from app.models import PurchaseOrder
+    from app.services.rollups import track_rollup
     from datetime import datetime
     
     db_order = db.query(PurchaseOrder).filter(PurchaseOrder.id == order_id).first()
@@ -159,10 +183,12 @@ def approve_purchase_order(
     db_order.approved_by = current_user.id
     db_order.approved_at = datetime.utcnow()
     
+    track_rollup(db, db_order, -1)
     if approve.approval_status == "approved":
         db_order.status = "approved"
     else:
         db_order.status = "cancelled"
+    track_rollup(db, db_order)
     
     db.commit()
     return {"message": f"Order {approve.approval_status} successfully"}
@@ -181,6 +207,7 @@ def delete_purchase_order(
     已处理的订单不能删除
     """
     from app.models import PurchaseOrder
+    from app.services.rollups import track_rollup
     
     db_order = db.query(PurchaseOrder).filter(PurchaseOrder.id == order_id).first()
     if not db_order:
@@ -189,6 +216,7 @@ def delete_purchase_order(
     if db_order.status not in ["pending", "cancelled"]:
         raise HTTPException(status_code=400, detail="Cannot delete processed orders")
     
+    track_rollup(db, db_order, -1)
     db.delete(db_order)
     db.commit()
     return {"message": "Purchase order deleted successfully"}
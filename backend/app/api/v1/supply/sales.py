@@ -1,48 +1,55 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db, get_async_read_db
+from app.core.config import get_settings
 from app.core.deps import PermissionChecker
+from app.core.responses import fast_list_response
+from app.utils.helpers import paginate_async
 from app.models import User
 from app.schemas.sales import CustomerCreate, CustomerResponse, CustomerUpdate, CustomerListResponse, SalesOrderCreate, SalesOrderResponse, SalesOrderUpdate, SalesOrderListResponse, SalesOrderDetailResponse, SalesOrderApprove
 
 router = APIRouter()
 
+settings = get_settings()
+
 
 @router.get("/customers/", response_model=CustomerListResponse)
-def get_customers(
+async def get_customers(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     keyword: str = Query(None),
     current_user: User = Depends(PermissionChecker("customer:read")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     获取客户列表
     
     支持分页查询和关键词搜索
-    关键词可以搜索客户名称或编码
+    关键词可以搜索客户编码、名称或联系人，使用搜索索引，按相关度排序
     返回客户列表及总数
     """
     from app.models import Customer
+    from app.services.search import search
     
-    query = db.query(Customer)
+    query = select(Customer)
     if keyword:
-        query = query.filter(
-            (Customer.name.contains(keyword)) |
-            (Customer.code.contains(keyword))
-        )
+        query = search(query, Customer, keyword)
+    
+    if settings.FAST_JSON_RESPONSES:
+        return await fast_list_response(db, query, CustomerResponse, skip, limit)
     
-    total = query.count()
-    customers = query.offset(skip).limit(limit).all()
-    return CustomerListResponse(total=total, items=customers)
+    page = await paginate_async(db, query, skip, limit)
+    return CustomerListResponse(total=page.total, items=page.items)
 
 
 @router.get("/customers/{customer_id}", response_model=CustomerResponse)
 def get_customer(
     customer_id: int,
     current_user: User = Depends(PermissionChecker("customer:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取单个客户详情
@@ -131,38 +138,49 @@ def delete_customer(
 
 
 @router.get("/sales-orders/", response_model=SalesOrderListResponse)
-def get_sales_orders(
+async def get_sales_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = Query(None, description="上一页返回的next_cursor，传入后忽略skip"),
+    with_total: bool = Query(True, description="是否统计总数，翻页时可传false省去COUNT查询"),
     status: str = Query(None),
     customer_id: int = Query(None),
     current_user: User = Depends(PermissionChecker("sales:read")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     获取销售订单列表
     
     支持分页查询，可按状态和客户ID筛选
+    支持游标分页：传入上一页返回的next_cursor继续读取，深度翻页不会变慢
     返回销售订单列表及总数
     """
     from app.models import SalesOrder
     
-    query = db.query(SalesOrder)
+    query = select(SalesOrder)
     if status:
-        query = query.filter(SalesOrder.status == status)
+        query = query.where(SalesOrder.status == status)
     if customer_id:
-        query = query.filter(SalesOrder.customer_id == customer_id)
+        query = query.where(SalesOrder.customer_id == customer_id)
+    
+    if settings.FAST_JSON_RESPONSES:
+        return await fast_list_response(
+            db, query, SalesOrderResponse, skip, limit,
+            cursor_model=SalesOrder, cursor=cursor, with_total=with_total
+        )
     
-    total = query.count()
-    orders = query.order_by(SalesOrder.created_at.desc()).offset(skip).limit(limit).all()
-    return SalesOrderListResponse(total=total, items=orders)
+    page = await paginate_async(
+        db, query, skip, limit,
+        cursor_model=SalesOrder, cursor=cursor, with_total=with_total
+    )
+    return SalesOrderListResponse(total=page.total, items=page.items, next_cursor=page.next_cursor)
 
 
 @router.get("/sales-orders/{order_id}", response_model=SalesOrderDetailResponse)
 def get_sales_order(
     order_id: int,
     current_user: User = Depends(PermissionChecker("sales:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取销售订单详情
@@ -189,19 +207,24 @@ def create_sales_order(
     
     自动生成订单编码（SO前缀）
     计算订单总金额（所有明细金额之和）
-    检查产品库存是否充足
-    创建订单和订单明细
+    检查产品可用库存是否充足（不占用库存，审批通过时才预留）
+    创建订单和订单明细，明细产品用一次IN查询加载，明细批量插入
     """
     from app.models import SalesOrder, SalesOrderItem, Product
+    from app.services.stock import available_stock
     from app.utils.helpers import generate_code
+    from app.services.rollups import track_rollup
     
     code = generate_code("SO")
     
     total_amount = sum(item.quantity * item.unit_price for item in order.items)
     
+    codes = {item.product_code for item in order.items if item.product_code}
+    stocks = dict(db.query(Product.code, available_stock()).filter(Product.code.in_(codes)).all()) if codes else {}
+    # 一次IN查询取出所有明细产品的可用库存（当前库存 - 已预留），避免每行明细查询一次
     for item in order.items:
-        product = db.query(Product).filter(Product.code == item.product_code).first()
-        if product and product.current_stock < item.quantity:
+        stock = stocks.get(item.product_code)
+        if stock is not None and stock < item.quantity:
             raise HTTPException(status_code=400, detail=f"Insufficient stock for {item.product_name}")
     
     db_order = SalesOrder(
@@ -215,13 +238,14 @@ def create_sales_order(
     db.add(db_order)
     db.flush()
     
-    for item in order.items:
-        db_item = SalesOrderItem(
-            sales_order_id=db_order.id,
-            **item.model_dump(),
-            amount=item.quantity * item.unit_price
-        )
-        db.add(db_item)
+    if order.items:
+        db.execute(insert(SalesOrderItem), [
+            dict(item.model_dump(), sales_order_id=db_order.id, amount=item.quantity * item.unit_price)
+            for item in order.items
+        ])
+        # 明细一次批量插入
+    
+    track_rollup(db, db_order)
     
     db.commit()
     db.refresh(db_order)
@@ -242,6 +266,7 @@ def update_sales_order(
     只更新提供的字段
     """
     from app.models import SalesOrder
+    from app.services.rollups import track_rollup
     
     db_order = db.query(SalesOrder).filter(SalesOrder.id == order_id).first()
     if not db_order:
@@ -250,8 +275,10 @@ def update_sales_order(
     if db_order.status != "pending":
         raise HTTPException(status_code=400, detail="Can only update pending orders")
     
+    track_rollup(db, db_order, -1)
     for field, value in order_update.model_dump(exclude_unset=True).items():
         setattr(db_order, field, value)
+    track_rollup(db, db_order)
     
     db.commit()
     db.refresh(db_order)
@@ -270,9 +297,12 @@ def approve_sales_order(
     
     接收审批结果，更新订单状态和审批信息
     只有待审批的订单才能审批
-    审批通过后订单状态变为已审批，拒绝则变为已取消
+    审批通过后订单状态变为已审批，并按明细预留库存；可用库存不足时审批失败，返回400
+    拒绝则变为已取消
     """
     from app.models import SalesOrder
+    from app.services.rollups import track_rollup
+    from app.services.stock import reserve_sales_order, InsufficientStock
     from datetime import datetime
     
     db_order = db.query(SalesOrder).filter(SalesOrder.id == order_id).first()
@@ -286,15 +316,54 @@ def approve_sales_order(
     db_order.approved_by = current_user.id
     db_order.approved_at = datetime.utcnow()
     
+    track_rollup(db, db_order, -1)
     if approve.approval_status == "approved":
         db_order.status = "approved"
+        try:
+            reserve_sales_order(db, db_order.id)
+        except InsufficientStock as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"Insufficient stock to reserve product {e.product_id}")
     else:
         db_order.status = "cancelled"
+    track_rollup(db, db_order)
     
     db.commit()
     return {"message": f"Order {approve.approval_status} successfully"}
 
 
+@router.post("/sales-orders/{order_id}/cancel")
+def cancel_sales_order(
+    order_id: int,
+    current_user: User = Depends(PermissionChecker("sales:update")),
+    db: Session = Depends(get_db)
+):
+    """
+    取消销售订单
+    
+    只能取消待处理或已审批的订单
+    已审批订单预留的库存在同一事务中释放
+    """
+    from app.models import SalesOrder
+    from app.services.rollups import track_rollup
+    from app.services.stock import release_sales_order
+    
+    db_order = db.query(SalesOrder).filter(SalesOrder.id == order_id).first()
+    if not db_order:
+        raise HTTPException(status_code=404, detail="Sales order not found")
+    
+    if db_order.status not in ["pending", "approved"]:
+        raise HTTPException(status_code=400, detail="Can only cancel pending or approved orders")
+    
+    track_rollup(db, db_order, -1)
+    db_order.status = "cancelled"
+    track_rollup(db, db_order)
+    release_sales_order(db, db_order.id)
+    
+    db.commit()
+    return {"message": "Order cancelled successfully"}
+
+
 @router.delete("/sales-orders/{order_id}")
 def delete_sales_order(
     order_id: int,
@@ -308,6 +377,7 @@ def delete_sales_order(
     已处理的订单不能删除
     """
     from app.models import SalesOrder
+    from app.services.rollups import track_rollup
     
     db_order = db.query(SalesOrder).filter(SalesOrder.id == order_id).first()
     if not db_order:
@@ -316,6 +386,7 @@ def delete_sales_order(
     if db_order.status not in ["pending", "cancelled"]:
         raise HTTPException(status_code=400, detail="Cannot delete processed orders")
     
+    track_rollup(db, db_order, -1)
     db.delete(db_order)
     db.commit()
     return {"message": "Sales order deleted successfully"}
@@ -1,48 +1,55 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db, get_async_read_db
+from app.core.config import get_settings
 from app.core.deps import PermissionChecker
+from app.core.responses import fast_list_response
+from app.utils.helpers import paginate_async
 from app.models import User
 from app.schemas.supplier import SupplierCreate, SupplierResponse, SupplierUpdate, SupplierListResponse
 
 router = APIRouter()
 
+settings = get_settings()
+
 
 @router.get("/", response_model=SupplierListResponse)
-def get_suppliers(
+async def get_suppliers(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     keyword: str = Query(None),
     current_user: User = Depends(PermissionChecker("supplier:read")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     获取供应商列表
     
     支持分页查询和关键词搜索
-    关键词可以搜索供应商名称或编码
+    关键词可以搜索供应商编码、名称或联系人，使用搜索索引，按相关度排序
     返回供应商列表及总数
     """
     from app.models import Supplier
+    from app.services.search import search
     
-    query = db.query(Supplier)
+    query = select(Supplier)
     if keyword:
-        query = query.filter(
-            (Supplier.name.contains(keyword)) |
-            (Supplier.code.contains(keyword))
-        )
+        query = search(query, Supplier, keyword)
     
-    total = query.count()
-    suppliers = query.offset(skip).limit(limit).all()
-    return SupplierListResponse(total=total, items=suppliers)
+    if settings.FAST_JSON_RESPONSES:
+        return await fast_list_response(db, query, SupplierResponse, skip, limit)
+    
+    page = await paginate_async(db, query, skip, limit)
+    return SupplierListResponse(total=page.total, items=page.items)
 
 
 @router.get("/{supplier_id}", response_model=SupplierResponse)
 def get_supplier(
     supplier_id: int,
     current_user: User = Depends(PermissionChecker("supplier:read")),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     获取单个供应商详情
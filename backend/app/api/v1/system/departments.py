@@ -1,7 +1,10 @@
 from typing import List  # 导入List类型，用于类型提示
 from fastapi import APIRouter, Depends, HTTPException, Query  # 导入FastAPI的核心组件
+from sqlalchemy import func  # 导入SQL函数，用于分组统计
 from sqlalchemy.orm import Session  # 导入数据库会话
 from app.db.session import get_db  # 导入数据库会话依赖注入函数
+from app.core.cache import get_cache, data_versions, publish_table_changes  # 导入缓存、数据版本号和跨进程失效通知
+from app.core.config import get_settings  # 导入配置获取函数
 from app.core.deps import PermissionChecker  # 导入权限检查依赖
 from app.models import User  # 导入用户模型
 from app.schemas.department import DepartmentCreate, DepartmentResponse, DepartmentUpdate, DepartmentTree  # 导入部门相关的Schema
@@ -10,6 +13,13 @@ router = APIRouter()
 # 创建API路由器实例
 # 用于定义所有的部门相关路由
 
+settings = get_settings()
+# 获取应用配置
+
+DEPARTMENT_TREE_TABLES = ("departments", "users")
+# 部门树依赖的数据表，任一表提交修改后本进程的部门树缓存失效
+# 部门和用户接口提交后调用publish_table_changes通知其他工作进程
+
 
 @router.get("/", response_model=List[DepartmentResponse])
 def get_departments(
@@ -66,73 +76,67 @@ def get_department_tree(
         - 返回完整的部门树形结构
         - 每个部门包含其用户数量
         - 需要department:read权限
+        - 结果缓存到部门或用户数据发生变化为止，其他工作进程通过失效通知通道得知变化
+        - 失效通知通道为local且多进程部署时，其他进程最多延迟DEPARTMENT_TREE_CACHE_TTL秒
     """
     from app.models import Department
     # 导入部门模型
     
+    cache = get_cache("department_tree", settings.DEPARTMENT_TREE_CACHE_TTL, maxsize=4)
+    cache_key = data_versions.get(*DEPARTMENT_TREE_TABLES)
+    # 以部门表和用户表的版本号作为缓存键
+    # 新增、修改、删除部门或修改用户所属部门后版本号变化，旧的缓存自然失效
+    # 其他工作进程中的修改由publish_table_changes通知，更新本进程的版本号
+    
+    tree = cache.get(cache_key)
+    if tree is not None:
+        return tree
+    
     departments = db.query(Department).all()
     # 查询所有部门
     
-    user_counts = {}
-    # 创建字典，存储每个部门的用户数量
+    user_counts = dict(
+        db.query(User.department_id, func.count(User.id))
+        .filter(User.department_id.isnot(None))
+        .group_by(User.department_id)
+        .all()
+    )
+    # 一次分组查询统计所有部门的用户数量
     # 键：部门ID，值：用户数量
     
+    nodes = {
+        dept.id: {
+            **dept.to_dict(),
+            # 将部门对象转换为字典
+            
+            "children": [],
+            # 子部门列表，下面按parent_id填充
+            
+            "user_count": user_counts.get(dept.id, 0)
+            # 添加用户数量，没有用户的部门为0
+        }
+        for dept in departments
+    }
+    # 为每个部门创建树节点，按部门ID索引
+    
+    tree = []
+    # 顶级部门列表
+    
     for dept in departments:
-        # 遍历所有部门
-        user_count = db.query(User).filter(User.department_id == dept.id).count()
-        # 查询该部门的用户数量
-        # filter(User.department_id == dept.id): 筛选该部门的用户
-        # count(): 统计符合条件的记录数
-        
-        user_counts[dept.id] = user_count
-        # 将用户数量存入字典
-    
-    def build_tree(parent_id=None):
-        """
-        递归构建部门树形结构
-        
-        参数:
-            parent_id: 父部门ID，None表示顶级部门
-        
-        返回:
-            list: 包含所有子部门的列表
-        
-        说明:
-            使用递归算法构建树形结构
-            先找到所有顶级部门，然后递归查找每个部门的子部门
-        """
-        result = []
-        # 存储当前层级的部门列表
-        
-        for dept in departments:
-            # 遍历所有部门
-            if dept.parent_id == parent_id:
-                # 如果部门的parent_id等于当前parent_id，说明它是子部门
-                dept_dict = {
-                    **dept.to_dict(),
-                    # 将部门对象转换为字典
-                    # **展开字典，将所有字段添加到新字典中
-                    
-                    "children": build_tree(dept.id),
-                    # 递归调用，构建子部门树
-                    # 传入当前部门的ID作为parent_id
-                    # 返回该部门的所有子部门
-                    
-                    "user_count": user_counts.get(dept.id, 0)
-                    # 添加用户数量
-                    # get(dept.id, 0): 从字典中获取，如果不存在则返回0
-                }
-                # 构建部门字典，包含部门信息和子部门
-                
-                result.append(dept_dict)
-                # 将部门添加到结果列表
-        
-        return result
-        # 返回当前层级的部门列表
-    
-    return build_tree()
-    # 调用build_tree函数，从顶级部门开始构建树
-    # 不传parent_id参数，默认为None，查找所有顶级部门
+        # 遍历一次部门列表，把每个节点挂到父节点下
+        # 总体复杂度为O(n)，同级部门保持查询返回的顺序
+        if dept.parent_id is None:
+            tree.append(nodes[dept.id])
+            # parent_id为空，说明是顶级部门
+        elif dept.parent_id in nodes:
+            nodes[dept.parent_id]["children"].append(nodes[dept.id])
+            # 挂到父部门的children下
+        # 父部门不存在的部门不会出现在树中
+    
+    cache.set(cache_key, tree)
+    # 缓存构建好的部门树
+    
+    return tree
 
 
 @router.get("/{dept_id}", response_model=DepartmentResponse)
@@ -209,6 +213,9 @@ def create_department(
     db.commit()
     # 提交事务
     
+    publish_table_changes("departments")
+    # 通知所有工作进程部门树已变化
+    
     db.refresh(db_dept)
     # 刷新对象，获取生成的id等字段
     
@@ -261,6 +268,9 @@ def update_department(
     db.commit()
     # 提交事务
     
+    publish_table_changes("departments")
+    # 通知所有工作进程部门树已变化
+    
     db.refresh(db_dept)
     # 刷新对象
     
@@ -308,4 +318,7 @@ def delete_department(
     db.commit()
     # 提交事务
     
+    publish_table_changes("departments")
+    # 通知所有工作进程部门树已变化
+    
     return {"message": "Department deleted successfully"}
@@ -2,7 +2,8 @@ from typing import List  # 导入List类型，用于类型提示
 from fastapi import APIRouter, Depends, HTTPException, Query  # 导入FastAPI的核心组件
 from sqlalchemy.orm import Session  # 导入数据库会话
 from app.db.session import get_db  # 导入数据库会话依赖注入函数
-from app.core.deps import get_current_active_user, get_current_superuser, PermissionChecker  # 导入用户和权限相关的依赖
+from app.core.cache import publish_table_changes  # 导入跨进程数据变化通知函数
+from app.core.deps import get_current_active_user, get_current_superuser, PermissionChecker, invalidate_permission_cache, invalidate_user_cache  # 导入用户和权限相关的依赖
 from app.models import User  # 导入用户模型
 from app.schemas.user import UserCreate, UserResponse, UserUpdate, UserRoleCreate, RoleCreate, RoleResponse, RoleUpdate, PermissionCreate, PermissionResponse, RolePermissionCreate  # 导入所有用户相关的Schema
 
@@ -49,12 +50,10 @@ def get_users(
     
     if keyword:
         # 如果指定了搜索关键词，添加搜索条件
-        # 使用contains方法进行模糊匹配
-        # | 表示或逻辑，匹配用户名或真实姓名
-        query = query.filter(
-            User.username.contains(keyword) | 
-            User.real_name.contains(keyword)
-        )
+        # 通过搜索索引匹配用户名或真实姓名，不使用LIKE '%关键词%'全表扫描
+        # 结果按相关度排序，完整匹配用户名的排在前面
+        from app.services.search import search
+        query = search(query, User, keyword)
     
     users = query.offset(skip).limit(limit).all()
     # 执行查询
@@ -154,6 +153,9 @@ def create_user(
     db.commit()
     # 提交事务
     
+    publish_table_changes("users")
+    # 通知所有工作进程用户数据已变化（部门树中的用户数量）
+    
     db.refresh(db_user)
     # 刷新对象，获取生成的id等字段
     
@@ -203,6 +205,12 @@ def update_user(
     db.commit()
     # 提交事务
     
+    invalidate_user_cache(user_id)
+    # 用户状态、部门等信息变化后删除用户快照缓存
+    
+    publish_table_changes("users")
+    # 通知所有工作进程用户数据已变化（部门树中的用户数量）
+    
     db.refresh(db_user)
     # 刷新对象
     
@@ -247,6 +255,12 @@ def delete_user(
     db.commit()
     # 提交事务
     
+    invalidate_user_cache(user_id)
+    # 删除用户快照缓存，已签发的令牌立即失效
+    
+    publish_table_changes("users")
+    # 通知所有工作进程用户数据已变化（部门树中的用户数量）
+    
     return {"message": "User deleted successfully"}
 
 
@@ -304,6 +318,9 @@ def assign_roles(
     db.commit()
     # 提交事务
     
+    invalidate_permission_cache()
+    # 角色变化后使权限缓存失效
+    
     return {"message": "Roles assigned successfully"}
 
 
@@ -466,6 +483,9 @@ def delete_role(
     db.commit()
     # 提交事务
     
+    invalidate_permission_cache()
+    # 角色删除后拥有该角色的用户失去相应权限，使权限缓存失效
+    
     return {"message": "Role deleted successfully"}
 
 
@@ -497,8 +517,8 @@ def assign_permissions(
         - 支持批量分配多个权限
         - 需要role:update权限
     """
-    from app.models import RolePermission, Permission
-    # 导入角色权限和权限模型
+    from app.models import RolePermission, Permission, Role
+    # 导入角色权限、权限和角色模型
     
     role = db.query(Role).filter(Role.id == role_id).first()
     # 查询角色
@@ -523,6 +543,9 @@ def assign_permissions(
     db.commit()
     # 提交事务
     
+    invalidate_permission_cache()
+    # 权限变化后使权限缓存失效
+    
     return {"message": "Permissions assigned successfully"}
 
 
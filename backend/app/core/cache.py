@@ -0,0 +1,282 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    进程内TTL缓存
+
+    线程安全，超过ttl秒的条目视为过期
+    记录命中和未命中次数，供监控接口展示
+    """
+    def __init__(self, name: str, ttl: float, maxsize: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，不存在或已过期时返回default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """写入缓存，超过容量时先清理过期条目，仍然超出则清空"""
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                now = time.monotonic()
+                self._data = {k: v for k, v in self._data.items() if v[0] > now}
+                if len(self._data) >= self.maxsize:
+                    self._data.clear()
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def invalidate(self, key: Hashable = _MISSING):
+        """删除指定条目，不传key时清空全部"""
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class DataVersions:
+    """
+    数据版本登记表
+
+    为每张数据表维护一个单调递增的版本号
+    事务提交后，被修改过的表版本号加一
+    缓存以相关表的版本号作为键的一部分，数据变化后旧缓存自然失效
+    其他工作进程的修改通过publish_table_changes通知，无法确定漏掉哪些通知时用bump_all整体失效
+    """
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def bump(self, *tables: str):
+        """把指定表的版本号加一"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def bump_all(self):
+        """使所有表的版本号变化，包括从未修改过的表"""
+        with self._lock:
+            self._epoch += 1
+
+    def get(self, *tables: str) -> Tuple[int, ...]:
+        """返回指定表的当前版本号元组，第一个元素为整体失效次数"""
+        return (self._epoch, *(self._versions.get(table, 0) for table in tables))
+
+
+data_versions = DataVersions()
+
+_caches: Dict[str, TTLCache] = {}
+
+
+def get_cache(name: str, ttl: float, maxsize: int = 1024) -> TTLCache:
+    """按名称获取（不存在则创建）一个已登记的TTL缓存"""
+    cache = _caches.get(name)
+    if cache is None:
+        cache = _caches.setdefault(name, TTLCache(name, ttl, maxsize))
+    return cache
+
+
+def cache_stats() -> list:
+    """返回所有已登记缓存的统计信息"""
+    return [cache.stats() for cache in _caches.values()]
+
+
+def _pending_tables(session: Session) -> set:
+    return session.info.setdefault("changed_tables", set())
+
+
+def track_data_versions(session_factory):
+    """
+    在会话工厂上注册事件，自动维护data_versions
+
+    - flush时记录新增、修改、删除对象所在的表
+    - insert/update/delete语句记录目标表，包括直接使用表对象（X.__table__）的Core语句
+    - 提交成功后统一加版本号
+    回滚的修改不单独剔除，多加一次版本号只会导致一次缓存未命中
+    """
+    @event.listens_for(session_factory, "after_flush")
+    def _after_flush(session, flush_context):
+        tables = _pending_tables(session)
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            table = getattr(obj, "__tablename__", None)
+            if table:
+                tables.add(table)
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _on_orm_execute(orm_execute_state):
+        if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+            mapper = orm_execute_state.bind_mapper
+            if mapper is not None:
+                table = mapper.local_table.name
+            else:
+                # Core语句没有映射类，从语句的目标表取表名
+                table = getattr(orm_execute_state.statement.table, "name", None)
+            if table:
+                _pending_tables(orm_execute_state.session).add(table)
+
+    @event.listens_for(session_factory, "after_commit")
+    def _after_commit(session):
+        tables = session.info.pop("changed_tables", None)
+        if tables:
+            data_versions.bump(*tables)
+
+
+class LocalChannel:
+    """
+    进程内失效通知通道
+
+    单进程部署、开发和测试环境使用，发布的消息只投递给本进程的订阅者
+    多进程部署时其他进程收不到通知，应改用RedisChannel
+    """
+    name = "local"
+
+    def __init__(self):
+        self._subscribers: List[Callable[[str], None]] = []
+        self.last_error: Optional[str] = None
+
+    def publish(self, message: str):
+        for callback in list(self._subscribers):
+            callback(message)
+
+    def subscribe(self, callback: Callable[[str], None], on_reconnect: Optional[Callable[[], None]] = None):
+        self._subscribers.append(callback)
+
+
+class RedisChannel:
+    """
+    基于Redis发布订阅的失效通知通道
+
+    每个工作进程用一个后台线程订阅频道，发布者自己也会收到消息，重复失效没有影响
+    订阅连接断开期间可能漏掉消息，重新订阅成功后调用on_reconnect（缓存整体失效）
+    需要安装redis包，只在配置为redis时导入
+    """
+    name = "redis"
+
+    def __init__(self, url: str, channel: str, retry_interval: float = 5):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self.last_error: Optional[str] = None
+
+    def publish(self, message: str):
+        try:
+            self._client.publish(self.channel, message)
+        except Exception as exc:
+            self.last_error = str(exc) or type(exc).__name__
+
+    def subscribe(self, callback: Callable[[str], None], on_reconnect: Optional[Callable[[], None]] = None):
+        def listen():
+            connected_before = False
+            while True:
+                try:
+                    pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(self.channel)
+                    if connected_before and on_reconnect:
+                        on_reconnect()
+                    connected_before = True
+                    self.last_error = None
+                    for message in pubsub.listen():
+                        data = message.get("data")
+                        callback(data.decode() if isinstance(data, bytes) else str(data))
+                except Exception as exc:
+                    self.last_error = str(exc) or type(exc).__name__
+                    time.sleep(self.retry_interval)
+
+        threading.Thread(target=listen, name=f"{self.channel}-listener", daemon=True).start()
+
+
+def create_channel(backend: str, redis_url: str, channel: str):
+    """按配置创建失效通知通道，channel为Redis频道名，不同用途的通道使用不同的频道"""
+    if backend == "redis":
+        return RedisChannel(redis_url, channel)
+    return LocalChannel()
+
+
+class InvalidationBus:
+    """
+    跨工作进程的缓存失效通知
+
+    消息格式为"主题:内容"，各缓存按主题注册处理函数
+    通道为local时只通知本进程；为redis时通过REDIS_URL广播给所有工作进程，
+    发布的进程先在本进程内处理，自己再收到一次消息时重复失效没有影响
+    订阅断开重连后调用各主题的reset，断开期间可能漏掉的失效由整体失效补上
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self._handlers: Dict[str, Tuple[Callable[[str], None], Callable[[], None]]] = {}
+        channel.subscribe(self._on_message, on_reconnect=self._reset)
+
+    def register(self, topic: str, handler: Callable[[str], None], reset: Callable[[], None]):
+        """注册主题的处理函数，handler接收消息内容，reset使该主题的缓存整体失效"""
+        self._handlers[topic] = (handler, reset)
+
+    def publish(self, topic: str, payload: str = ""):
+        """在本进程内立即处理并通知其他工作进程"""
+        message = f"{topic}:{payload}"
+        if not isinstance(self.channel, LocalChannel):
+            self._on_message(message)
+        self.channel.publish(message)
+
+    def _on_message(self, message: str):
+        topic, _, payload = message.partition(":")
+        entry = self._handlers.get(topic)
+        if entry is not None:
+            entry[0](payload)
+
+    def _reset(self):
+        for _, reset in list(self._handlers.values()):
+            reset()
+
+
+def _create_invalidation_bus() -> InvalidationBus:
+    from app.core.config import get_settings
+    settings = get_settings()
+    return InvalidationBus(create_channel(settings.CACHE_INVALIDATION_CHANNEL, settings.REDIS_URL, "scm:cache_invalidation"))
+
+
+invalidation_bus = _create_invalidation_bus()
+invalidation_bus.register("tables", lambda payload: data_versions.bump(*payload.split(",")), data_versions.bump_all)
+
+
+def publish_table_changes(*tables: str):
+    """
+    通知所有工作进程指定表的数据已修改，以这些表的版本号为键的缓存随之失效
+
+    本进程的版本号在事务提交时已经更新，在修改数据的事务提交之后调用
+    """
+    invalidation_bus.publish("tables", ",".join(tables))
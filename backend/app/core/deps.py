@@ -1,23 +1,147 @@
-from typing import Optional
+from typing import FrozenSet, Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.db.session import get_db
+from app.core.cache import get_cache, data_versions, invalidation_bus, publish_table_changes
+from app.core.config import get_settings
 from app.core.security import decode_access_token
-from app.models import User
+from app.models import User, UserRole, RolePermission, Permission
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+settings = get_settings()
+
+# 权限集合依赖的数据表，版本号变化后所有用户的权限缓存失效
+PERMISSION_TABLES = ("user_roles", "role_permissions", "roles", "permissions")
+
+
+class CurrentUser:
+    """
+    当前用户快照
+
+    缓存在进程内，包含鉴权和UserResponse所需的全部字段
+    以及用户的权限编码集合，避免每个请求都查询数据库
+    需要修改用户数据时，应根据id重新查询ORM对象
+    """
+    __slots__ = (
+        "id", "username", "real_name", "email", "phone", "avatar",
+        "status", "department_id", "is_superuser", "created_at", "updated_at",
+        "permissions", "permission_version",
+    )
+
+    def __init__(self, user: User, permissions: FrozenSet[str], permission_version: tuple):
+        self.id = user.id
+        self.username = user.username
+        self.real_name = user.real_name
+        self.email = user.email
+        self.phone = user.phone
+        self.avatar = user.avatar
+        self.status = user.status
+        self.department_id = user.department_id
+        self.is_superuser = user.is_superuser
+        self.created_at = user.created_at
+        self.updated_at = user.updated_at
+        self.permissions = permissions
+        self.permission_version = permission_version
+
+    def with_permissions(self, permissions: FrozenSet[str], permission_version: tuple) -> "CurrentUser":
+        """返回替换了权限集合的新快照，缓存中的快照不做原地修改"""
+        snapshot = object.__new__(CurrentUser)
+        for field in self.__slots__:
+            setattr(snapshot, field, getattr(self, field))
+        snapshot.permissions = permissions
+        snapshot.permission_version = permission_version
+        return snapshot
+
+
+def _user_cache():
+    return get_cache("users", settings.USER_CACHE_TTL, maxsize=10000)
+
+
+invalidation_bus.register("user", lambda payload: _user_cache().invalidate(int(payload)), _user_cache().invalidate)
+
+
+def invalidate_user_cache(user_id: int):
+    """
+    删除用户快照缓存
+
+    修改用户状态、部门、超级管理员标志或删除用户后调用
+    通过失效通知通道同时删除其他工作进程中的快照
+    通道为local且多进程部署时，其他进程中的快照在USER_CACHE_TTL秒后过期
+    """
+    invalidation_bus.publish("user", str(user_id))
+
+
+def invalidate_permission_cache():
+    """
+    使所有用户的权限缓存失效
+
+    分配角色、分配权限后调用
+    通过数据版本号失效，不需要逐个删除缓存条目
+    本进程的数据版本号在事务提交时已经更新，其他工作进程通过失效通知通道更新
+    通道为local且多进程部署时，其他进程中的权限缓存在PERMISSION_CACHE_TTL秒后过期
+    """
+    publish_table_changes(*PERMISSION_TABLES)
+
+
+def get_user_permissions(db: Session, user_id: int) -> FrozenSet[str]:
+    """
+    获取用户的权限编码集合
+
+    以（用户ID, 权限相关表版本号）为键缓存frozenset
+    缓存未命中时用一条联表查询取出用户所有角色的权限编码
+    """
+    cache = get_cache("permissions", settings.PERMISSION_CACHE_TTL, maxsize=10000)
+    cache_key = (user_id, data_versions.get(*PERMISSION_TABLES))
+    permissions = cache.get(cache_key)
+    if permissions is None:
+        rows = db.query(Permission.code).join(
+            RolePermission, RolePermission.permission_id == Permission.id
+        ).join(
+            UserRole, UserRole.role_id == RolePermission.role_id
+        ).filter(UserRole.user_id == user_id).distinct().all()
+        permissions = frozenset(code for (code,) in rows)
+        cache.set(cache_key, permissions)
+    return permissions
+
+
+def load_current_user(db: Session, user_id: int, snapshot: Optional[CurrentUser] = None) -> Optional[CurrentUser]:
+    """
+    按用户ID获取用户快照
+
+    snapshot为调用方已经从缓存读到的快照（未命中时为None），这里不再重复读取缓存，
+    避免一次请求被统计为两次未命中；权限版本未变化时直接返回，不访问数据库
+    用户不存在时返回None
+    """
+    cache = _user_cache()
+    permission_version = data_versions.get(*PERMISSION_TABLES)
+    
+    if snapshot is None:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+        snapshot = CurrentUser(user, get_user_permissions(db, user_id), permission_version)
+        cache.set(user_id, snapshot)
+    elif snapshot.permission_version != permission_version:
+        snapshot = snapshot.with_permissions(get_user_permissions(db, user_id), permission_version)
+        cache.set(user_id, snapshot)
+    
+    return snapshot
+
 
 async def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme)
-) -> User:
+) -> CurrentUser:
     """
     获取当前用户
     
     从JWT令牌中解析用户信息
-    验证令牌有效性并返回用户对象
+    验证令牌有效性并返回用户快照
+    常见情况下用户快照来自缓存，不访问数据库
+    缓存未命中时在线程池中查询，不阻塞事件循环
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -29,11 +153,14 @@ async def get_current_user(
     if payload is None:
         raise credentials_exception
     
-    user_id: int = payload.get("sub")
-    if user_id is None:
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = _user_cache().get(user_id)
+    if user is None or user.permission_version != data_versions.get(*PERMISSION_TABLES):
+        user = await run_in_threadpool(load_current_user, db, user_id, user)
     if user is None:
         raise credentials_exception
     
@@ -44,8 +171,8 @@ async def get_current_user(
 
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     """
     获取当前活跃用户
     
@@ -58,8 +185,8 @@ async def get_current_active_user(
 
 
 async def get_current_superuser(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     """
     获取当前超级用户
     
@@ -83,23 +210,19 @@ class PermissionChecker:
     def __init__(self, required_permission: str):
         self.required_permission = required_permission
     
-    def __call__(self, current_user: User = Depends(get_current_user)) -> User:
+    def __call__(self, current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
         """
         检查用户权限
         
         超级用户拥有所有权限
         普通用户需要通过角色获得权限
+        权限集合来自用户快照，检查时不产生数据库查询
         如果没有所需权限，返回权限不足错误
         """
         if current_user.is_superuser:
             return current_user
         
-        user_permissions = []
-        for role in current_user.roles:
-            for perm in role.role.permissions:
-                user_permissions.append(perm.permission.code)
-        
-        if self.required_permission not in user_permissions:
+        if self.required_permission not in current_user.permissions:
             raise HTTPException(
                 status_code=403, 
                 detail=f"Permission denied: {self.required_permission} required"
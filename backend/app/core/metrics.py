@@ -0,0 +1,196 @@
+"""
+请求和SQL指标
+
+MetricsMiddleware按路由记录请求耗时分布、每个请求的SQL语句数分布和数据库总耗时
+track_query_metrics在引擎上注册事件，把执行的语句计入当前请求（不在请求内的语句不计入）
+/metrics以Prometheus文本格式导出，响应头Server-Timing给出本次请求的耗时分解
+指标保存在进程内，多个工作进程时需要分别抓取各进程
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 请求耗时分布的桶上限，单位为秒
+
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+# 每个请求SQL语句数分布的桶上限，语句数随数据量增长的接口（N+1查询）会落在高位桶
+
+
+class RequestMetrics:
+    """单个请求的SQL统计，存放在上下文变量中，同步接口的线程池和异步接口共用"""
+    __slots__ = ("scope", "statements", "db_seconds")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current_route() -> Tuple[Optional[str], Optional[str]]:
+    """返回当前请求的(方法, 路由路径模板)，不在请求内时为(None, None)"""
+    request = _current.get()
+    if request is None or request.scope is None:
+        return None, None
+    return request.scope.get("method"), getattr(request.scope.get("route"), "path", None)
+
+
+class Histogram:
+    """固定桶的直方图，counts[i]为落在第i个桶（最后一个为+Inf）的次数"""
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    """一个(方法, 路由, 状态码)的累计指标"""
+    __slots__ = ("duration", "statements", "db_seconds")
+
+    def __init__(self):
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds = 0.0
+
+
+class MetricsRegistry:
+    """进程内的路由指标登记表"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str, str], RouteMetrics] = {}
+
+    def observe(self, method: str, route: str, status: str, seconds: float, request: RequestMetrics):
+        with self._lock:
+            metrics = self._routes.get((method, route, status))
+            if metrics is None:
+                metrics = self._routes[(method, route, status)] = RouteMetrics()
+            metrics.duration.observe(seconds)
+            metrics.statements.observe(request.statements)
+            metrics.db_seconds += request.db_seconds
+
+    def render(self) -> str:
+        """按Prometheus文本格式（0.0.4）导出全部指标"""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines: List[str] = []
+            for name, help_text, attr in (
+                ("http_request_duration_seconds", "请求耗时（秒）", "duration"),
+                ("http_request_db_statements", "每个请求执行的SQL语句数", "statements"),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, metrics in routes:
+                    histogram = getattr(metrics, attr)
+                    labels = _labels(key)
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+            lines.append("# HELP http_request_db_seconds_total 请求内SQL语句执行总耗时（秒）")
+            lines.append("# TYPE http_request_db_seconds_total counter")
+            for key, metrics in routes:
+                lines.append(f"http_request_db_seconds_total{{{_labels(key)}}} {metrics.db_seconds}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: Tuple[str, str, str]) -> str:
+    method, route, status = key
+    return f'method="{_escape(method)}",route="{_escape(route)}",status="{status}"'
+
+
+metrics_registry = MetricsRegistry()
+
+
+def track_query_metrics(engine):
+    """
+    在引擎上注册事件，把每条SQL语句的次数和耗时计入当前请求
+
+    异步引擎传入其sync_engine；返回传入的引擎，便于在创建时直接包装
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        request = _current.get()
+        starts = conn.info.get("query_start")
+        if request is not None and starts:
+            request.statements += 1
+            request.db_seconds += time.perf_counter() - starts.pop()
+
+    return engine
+
+
+def server_timing(total_seconds: float, request: RequestMetrics) -> str:
+    """生成Server-Timing响应头，单位为毫秒"""
+    return (
+        f"app;dur={total_seconds * 1000:.2f}, "
+        f'db;dur={request.db_seconds * 1000:.2f};desc="{request.statements} queries"'
+    )
+
+
+class MetricsMiddleware:
+    """
+    请求指标中间件（ASGI）
+
+    路由按匹配到的路径模板统计（如/api/v1/inventory/products/{product_id}），
+    没有匹配到路由的请求统一计为unmatched，避免标签数量随URL无限增长
+    Server-Timing在响应头发出时生成，流式响应不包含之后的耗时
+    """
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry, server_timing: bool = True):
+        self.app = app
+        self.registry = registry
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope)
+        token = _current.set(request)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", server_timing(time.perf_counter() - start, request)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.registry.observe(scope["method"], route, str(status), time.perf_counter() - start, request)
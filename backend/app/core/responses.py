@@ -0,0 +1,80 @@
+"""
+快速JSON响应
+
+FastJSONResponse用orjson序列化（未安装时退回标准库json），日期时间输出为ISO 8601格式，与Pydantic的输出一致
+fast_list_response供列表接口使用：只查询响应模型需要的列，用查询行直接构建字典，
+跳过ORM对象的构建和响应模型的校验，由FAST_JSON_RESPONSES开启
+"""
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.utils.helpers import paginate_async
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """orjson和json不能直接序列化的值（Decimal、Enum等）交给FastAPI的编码器处理"""
+    return jsonable_encoder(value)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return _default(value)
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为UTF-8编码的紧凑JSON，非字符串的字典键转为字符串"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """用orjson序列化的JSON响应，内容与JSONResponse相同"""
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def schema_columns(model, schema) -> Tuple:
+    """
+    返回响应模型各字段对应的表列，顺序与响应模型的字段一致
+
+    响应模型中有表里不存在的字段时抛出ValueError，这类接口不能使用快速路径
+    """
+    table = model.__table__
+    missing = [name for name in schema.model_fields if name not in table.c]
+    if missing:
+        raise ValueError(f"{schema.__name__}的字段{missing}在{table.name}表中不存在")
+    return tuple(table.c[name] for name in schema.model_fields)
+
+
+def rows_to_dicts(rows, keys: Tuple[str, ...]) -> list:
+    return [dict(zip(keys, row)) for row in rows]
+
+
+async def fast_list_response(db, query, schema, skip: int = 0, limit: int = 100, cursor_model=None,
+                             cursor: Optional[str] = None, with_total: bool = True) -> FastJSONResponse:
+    """
+    列表接口的快速路径，参数与paginate_async相同，schema为列表项的响应模型
+
+    返回内容与XxxListResponse相同：{"total", "items"}，指定cursor_model时再加next_cursor
+    数据库中为NULL而响应模型要求非空的字段原样输出为null，不做校验
+    """
+    model = query.column_descriptions[0]["entity"]
+    columns = schema_columns(model, schema)
+    page = await paginate_async(db, query, skip, limit, cursor_model, cursor, with_total, columns=columns)
+    content = {"total": page.total, "items": rows_to_dicts(page.items, tuple(schema.model_fields))}
+    if cursor_model is not None:
+        content["next_cursor"] = page.next_cursor
+    return FastJSONResponse(content)
@@ -1,3 +1,7 @@
+import asyncio  # 导入异步IO模块，用于在事件循环中等待线程池结果
+import threading  # 导入线程模块，用于保护计数器
+import time  # 导入时间模块，用于统计耗时
+from concurrent.futures import ThreadPoolExecutor  # 导入线程池执行器
 from datetime import datetime, timedelta  # 导入日期时间相关模块
 from typing import Optional  # 导入Optional类型提示
 from jose import JWTError, jwt  # 导入JWT相关的错误和编码解码函数
@@ -40,12 +44,132 @@ def get_password_hash(password: str) -> str:
     说明:
         bcrypt会自动生成随机盐值(salt)，增加密码破解难度
         相同的密码每次生成的哈希值都不同
+        计算成本由配置项BCRYPT_ROUNDS决定
     """
-    salt = bcrypt.gensalt()  # 生成随机盐值
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)  # 按配置的计算成本生成随机盐值
     # 对密码进行哈希加密，并转换为字符串返回
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    判断哈希密码是否需要按当前配置重新加密
+    
+    参数:
+        hashed_password: 数据库中存储的哈希密码
+    
+    返回:
+        bool: 哈希中的计算成本与BCRYPT_ROUNDS不一致时返回True
+    
+    说明:
+        bcrypt哈希格式为 $2b$<cost>$<salt+hash>，计算成本保存在第二段
+    """
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return True
+
+
+class PasswordHashPoolFull(Exception):
+    """密码哈希线程池排队已满"""
+
+
+class PasswordHashPool:
+    """
+    密码哈希专用线程池
+    
+    bcrypt计算是CPU密集型操作，单次耗时数百毫秒
+    放在独立的有界线程池中执行，避免占满处理其他请求的工作线程
+    排队数量超过上限时立即拒绝，而不是无限堆积
+    """
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hash"
+                    )
+        return self._executor
+    
+    def _timed(self, func, *args):
+        with self._lock:
+            self._running += 1
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self.total_ms += elapsed
+    
+    async def run(self, func, *args):
+        """
+        在线程池中执行func，并在事件循环中等待结果
+        
+        正在执行和排队的任务总数超过 workers + max_queue 时抛出PasswordHashPoolFull
+        任务结束（完成、出错或排队时被取消）后才从计数中扣除，
+        等待结果的请求被取消时，仍在执行的任务继续占用名额
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHashPoolFull()
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(self._timed, func, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+    
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+    
+    def stats(self) -> dict:
+        """返回线程池统计信息"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": max(self._pending - self._running, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(self.total_ms / self.completed, 2) if self.completed else 0.0,
+            }
+
+
+password_hash_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在密码哈希线程池中验证密码"""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """在密码哈希线程池中加密密码"""
+    return await password_hash_pool.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     创建JWT访问令牌
@@ -0,0 +1,137 @@
+"""
+慢查询记录
+
+track_slow_queries在引擎上注册事件，执行时间超过阈值的语句写入固定容量的环形缓冲区
+记录语句文本、参数形态（只记录参数名和类型，不记录参数值）、耗时和发起请求的路由
+可选在慢语句执行后立即获取执行计划（SLOW_QUERY_EXPLAIN），未超过阈值的语句只多一次计时
+路由来自请求指标中间件，关闭METRICS_ENABLED或不在请求内执行的语句路由为空
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, List, Optional
+
+from sqlalchemy import event
+
+from app.core.metrics import current_route
+
+MAX_STATEMENT_LENGTH = 4000
+# 记录的语句文本最大长度，超出部分截断
+
+_EXPLAINABLE = ("select", "update", "delete", "with")
+# 可以获取执行计划的语句类型，INSERT ... VALUES的执行计划没有意义
+
+
+def parameters_shape(parameters: Any, executemany: bool = False) -> Any:
+    """返回参数的形态：字典参数为{参数名: 类型}，位置参数为类型列表，executemany附带行数"""
+    if executemany:
+        rows = list(parameters or ())
+        return {"rows": len(rows), "row": parameters_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__ if parameters is not None else None
+
+
+class SlowQueryLog:
+    """
+    慢查询环形缓冲区
+
+    只保留最近maxsize条记录，total为进程启动以来记录的慢查询总数
+    threshold_ms小于等于0时不记录
+    """
+    def __init__(self, threshold_ms: float, maxsize: int = 200, explain: bool = False):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.total = 0
+        self._entries: deque = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def record(self, entry: dict):
+        with self._lock:
+            self.total += 1
+            self._entries.append(entry)
+
+    def entries(self, limit: Optional[int] = None) -> List[dict]:
+        """返回最近的慢查询记录，最新的在前"""
+        with self._lock:
+            items = list(reversed(self._entries))
+        return items[:limit] if limit else items
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _explain(conn, statement: str, parameters) -> List[str]:
+    """
+    用独立的DBAPI游标获取执行计划，不影响原语句游标中未读取的结果
+
+    SQLite使用EXPLAIN QUERY PLAN，其他数据库使用EXPLAIN；每行执行计划转为以制表符分隔的文本
+    """
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return ["\t".join("" if value is None else str(value) for value in row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def track_slow_queries(engine, log: Optional[SlowQueryLog] = None):
+    """
+    在引擎上注册事件，把超过阈值的语句写入慢查询记录（默认为slow_query_log）
+
+    异步引擎传入其sync_engine；返回传入的引擎，便于在创建时直接包装
+    """
+    log = log or slow_query_log
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_slow_query_start", None)
+        if start is None or not log.enabled:
+            return
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms < log.threshold_ms:
+            return
+
+        method, route = current_route()
+        entry = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms": round(duration_ms, 2),
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "parameters": parameters_shape(parameters, executemany),
+            "method": method,
+            "route": route,
+            "database": conn.engine.url.render_as_string(hide_password=True),
+            "explain": None,
+            "explain_error": None,
+        }
+        if log.explain and not executemany and statement.lstrip().lower().startswith(_EXPLAINABLE):
+            try:
+                entry["explain"] = _explain(conn, statement, parameters)
+            except Exception as exc:
+                entry["explain_error"] = str(exc) or type(exc).__name__
+        log.record(entry)
+
+    return engine
+
+
+def _create_log() -> SlowQueryLog:
+    from app.core.config import get_settings
+    settings = get_settings()
+    return SlowQueryLog(settings.SLOW_QUERY_THRESHOLD_MS, settings.SLOW_QUERY_LOG_SIZE, settings.SLOW_QUERY_EXPLAIN)
+
+
+slow_query_log = _create_log()
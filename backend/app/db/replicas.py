@@ -0,0 +1,167 @@
+import itertools
+import threading
+import time
+from typing import Callable, List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+
+class Replica:
+    """
+    单个只读副本
+
+    同步引擎始终创建，用于同步会话和健康检查
+    异步引擎在首次使用时创建
+    第一次健康检查通过之前不分配读请求
+    """
+    def __init__(self, url: str, sync_engine: Engine, async_engine_factory: Callable):
+        self.url = url
+        self.sync_engine = sync_engine
+        self._async_engine_factory = async_engine_factory
+        self._async_engine = None
+        self.healthy = False
+        self.last_error: Optional[str] = None
+
+    @property
+    def async_engine(self):
+        if self._async_engine is None:
+            self._async_engine = self._async_engine_factory(self.url)
+            _watch_errors(self, self._async_engine.sync_engine)
+        return self._async_engine
+
+    def check(self):
+        """执行SELECT 1检查副本是否可用"""
+        try:
+            with self.sync_engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as exc:
+            self.mark_down(exc)
+        else:
+            self.healthy = True
+            self.last_error = None
+
+    def mark_down(self, exc: BaseException):
+        self.healthy = False
+        self.last_error = str(exc).splitlines()[0] if str(exc) else type(exc).__name__
+
+
+def _watch_errors(replica: Replica, sync_engine: Engine):
+    """连接失败或连接断开时立即把副本标记为不可用，等待下一次健康检查恢复"""
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(context):
+        if context.is_disconnect or context.connection is None:
+            replica.mark_down(context.original_exception)
+
+
+class ReplicaSet:
+    """
+    只读副本集合
+
+    - 在健康的副本之间轮询分配读请求
+    - 首次使用时启动后台线程，立即检查一次全部副本，之后每隔check_interval秒检查一次
+    - 查询过程中出现连接错误的副本立即摘除，健康检查通过后恢复
+    - 没有可用副本时返回None，由调用方回退到主库
+    """
+    def __init__(self, urls: List[str], sync_engine_factory: Callable, async_engine_factory: Callable, check_interval: float = 10):
+        self.replicas = []
+        for url in urls:
+            replica = Replica(url, sync_engine_factory(url), async_engine_factory)
+            _watch_errors(replica, replica.sync_engine)
+            self.replicas.append(replica)
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[Replica]:
+        """按轮询顺序返回下一个健康的副本，全部不可用时返回None"""
+        if not self.replicas:
+            return None
+        self._ensure_monitor()
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[next(self._cycle)]
+                if replica.healthy:
+                    return replica
+        return None
+
+    def check_all(self):
+        """立即检查全部副本"""
+        for replica in self.replicas:
+            replica.check()
+
+    def stats(self) -> list:
+        """返回各副本的健康状态，URL中的密码会被隐藏"""
+        return [
+            {
+                "url": replica.sync_engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "last_error": replica.last_error,
+            }
+            for replica in self.replicas
+        ]
+
+    def _ensure_monitor(self):
+        if self._monitor is not None:
+            return
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._run_checks, name="replica-health-check", daemon=True)
+                self._monitor.start()
+
+    def _run_checks(self):
+        while True:
+            self.check_all()
+            time.sleep(self.check_interval)
+
+
+class RoutingSession(Session):
+    """
+    读写分离会话
+
+    - 查询发往副本，同一个会话固定使用同一个副本
+    - flush和INSERT/UPDATE/DELETE语句发往主库
+    - 会话一旦写过数据，后续查询也使用主库，保证读到自己刚写入的数据
+    - 没有配置副本或副本全部不可用时全部使用主库
+
+    通过routing_session_class()生成绑定了具体引擎的子类
+    """
+    primary_bind = None
+    replica_set: Optional[ReplicaSet] = None
+    use_async_engines = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["use_primary"] = True
+        if self.info.get("use_primary") or not self.replica_set:
+            return self.primary_bind
+
+        bind = self.info.get("replica_bind")
+        if bind is None:
+            replica = self.replica_set.choose()
+            if replica is None:
+                return self.primary_bind
+            bind = replica.async_engine.sync_engine if self.use_async_engines else replica.sync_engine
+            self.info["replica_bind"] = bind
+        return bind
+
+
+def routing_session_class(name: str, primary_bind, replica_set: ReplicaSet, use_async_engines: bool = False):
+    """生成绑定了主库引擎和副本集合的RoutingSession子类"""
+    return type(name, (RoutingSession,), {
+        "primary_bind": primary_bind,
+        "replica_set": replica_set,
+        "use_async_engines": use_async_engines,
+    })
+
+
+def use_primary(db):
+    """让会话后续的查询全部使用主库，用于必须读到最新数据的场景"""
+    session = getattr(db, "sync_session", db)
+    session.info["use_primary"] = True
+    session.info.pop("replica_bind", None)
@@ -1,7 +1,14 @@
 from sqlalchemy import create_engine  # 导入创建数据库引擎的函数
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # 导入异步引擎和会话工厂
 from sqlalchemy.ext.declarative import declarative_base  # 导入声明式基类
-from sqlalchemy.orm import sessionmaker  # 导入会话工厂类
-from app.core.config import get_settings  # 导入配置获取函数
+from sqlalchemy.orm import Session, sessionmaker  # 导入会话类和会话工厂类
+from starlette.concurrency import run_in_threadpool  # 导入线程池执行函数，未安装异步驱动时在线程池中执行同步会话
+from app.core.config import get_settings, to_async_url  # 导入配置获取函数和异步连接URL转换函数
+from app.core.cache import track_data_versions  # 导入数据版本跟踪函数
+from app.core.metrics import track_query_metrics  # 导入SQL语句指标统计函数
+from app.core.slow_queries import track_slow_queries  # 导入慢查询记录函数
+from app.services.search import track_search_index  # 导入搜索索引维护函数
+from app.db.replicas import ReplicaSet, routing_session_class  # 导入只读副本集合和读写分离会话
 
 settings = get_settings()
 
@@ -14,12 +21,167 @@ engine = create_engine(
     echo=False  # 是否打印SQL语句到控制台，开发时可设为True调试
 )
 
+track_query_metrics(engine)
+# 统计每个请求执行的SQL语句数和数据库耗时，供/metrics和Server-Timing响应头使用
+
+track_slow_queries(engine)
+# 执行时间超过SLOW_QUERY_THRESHOLD_MS的语句记入慢查询记录
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # 创建数据库会话工厂
 # autocommit=False: 不自动提交事务，需要手动commit
 # autoflush=False: 不自动刷新，需要手动flush
 # bind=engine: 绑定到上面创建的引擎
 
+track_data_versions(SessionLocal)
+# 提交事务后自动为被修改的数据表增加版本号，用于缓存失效
+
+track_search_index(SessionLocal)
+# flush时自动更新产品、客户、供应商、用户的搜索索引
+
+_async_engine = None
+_AsyncSessionLocal = None
+_AsyncReadSessionLocal = None
+_async_driver_available = None
+# 异步引擎和会话工厂在首次使用时创建
+# 异步驱动（aiomysql、aiosqlite）是可选依赖，未安装时异步接口改用在线程池中执行的同步会话
+
+
+def _create_async_engine(url: str):
+    """使用与同步引擎相同的连接池参数创建异步引擎"""
+    pool_args = {} if url.startswith("sqlite") else {"pool_size": 10, "max_overflow": 20}
+    # aiosqlite默认不使用连接池，不接受连接池大小参数
+    async_engine = create_async_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        echo=False,
+        **pool_args
+    )
+    track_query_metrics(async_engine.sync_engine)
+    track_slow_queries(async_engine.sync_engine)
+    # 异步引擎的事件注册在其内部使用的同步引擎上
+    return async_engine
+
+
+def get_async_engine():
+    """
+    获取异步数据库引擎（首次调用时创建）
+    
+    连接字符串来自配置项ASYNC_DATABASE_URL，未配置时由DATABASE_URL推导
+    MySQL使用aiomysql驱动，SQLite使用aiosqlite驱动
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = _create_async_engine(settings.get_async_database_url)
+    return _async_engine
+
+
+def async_driver_available() -> bool:
+    """异步数据库驱动能否导入（首次调用时尝试创建异步引擎）"""
+    global _async_driver_available
+    if _async_driver_available is None:
+        try:
+            get_async_engine()
+            _async_driver_available = True
+        except ImportError:
+            _async_driver_available = False
+    return _async_driver_available
+
+
+class ThreadedSession:
+    """
+    在线程池中执行的同步会话，提供异步接口使用的await方法
+
+    未安装异步驱动时代替AsyncSession，接口代码不需要区分
+    数据库I/O占用线程池中的线程，与同步接口相同，不阻塞事件循环
+    """
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+replica_set = ReplicaSet(
+    settings.DATABASE_REPLICA_URLS,
+    sync_engine_factory=lambda url: track_slow_queries(track_query_metrics(create_engine(
+        url, pool_pre_ping=True, pool_recycle=3600, pool_size=10, max_overflow=20, echo=False
+    ))),
+    async_engine_factory=lambda url: _create_async_engine(to_async_url(url)),
+    check_interval=settings.REPLICA_HEALTH_CHECK_INTERVAL
+)
+# 只读副本集合，来自配置项DATABASE_REPLICA_URLS
+# 没有配置副本时读会话直接使用主库
+
+ReadSessionLocal = sessionmaker(
+    class_=routing_session_class("ReadSession", engine, replica_set),
+    autocommit=False,
+    autoflush=False
+)
+# 创建只读接口使用的会话工厂
+# 查询轮询发往健康的副本，写操作以及写过数据之后的查询发往主库
+
+track_data_versions(ReadSessionLocal)
+track_search_index(ReadSessionLocal)
+
+
+def get_async_sessionmaker():
+    """获取异步会话工厂（首次调用时创建）"""
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        sync_session_class = type("AsyncBackedSession", (Session,), {})
+        track_data_versions(sync_session_class)
+        track_search_index(sync_session_class)
+        # 异步会话的事件注册在其内部使用的同步会话类上
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False,
+            sync_session_class=sync_session_class
+        )
+        # expire_on_commit=False: 提交后不过期对象属性，异步会话中不能隐式懒加载
+    return _AsyncSessionLocal
+
+
+def get_async_read_sessionmaker():
+    """获取异步只读会话工厂（首次调用时创建），路由规则与ReadSessionLocal相同"""
+    global _AsyncReadSessionLocal
+    if _AsyncReadSessionLocal is None:
+        sync_session_class = routing_session_class(
+            "AsyncReadSession", get_async_engine().sync_engine, replica_set, use_async_engines=True
+        )
+        track_data_versions(sync_session_class)
+        track_search_index(sync_session_class)
+        _AsyncReadSessionLocal = async_sessionmaker(
+            autoflush=False,
+            expire_on_commit=False,
+            sync_session_class=sync_session_class
+        )
+    return _AsyncReadSessionLocal
+
+
 Base = declarative_base()
 # 创建声明式基类
 # 所有数据库模型都要继承这个基类
@@ -45,6 +207,64 @@ def get_db():
         db.close()  # 无论是否发生异常，都要关闭会话，释放数据库连接
 
 
+def get_read_db():
+    """
+    获取只读数据库会话（依赖注入函数）
+    
+    用于报表、分析以及列表和详情查询接口
+    配置了只读副本时查询发往副本，减轻主库压力；副本数据可能有短暂的复制延迟
+    创建、修改、审批等写接口以及需要读到刚写入数据的接口仍然使用get_db
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """
+    获取异步数据库会话（依赖注入函数）
+    
+    用于读多写少的列表和分析接口
+    数据库I/O期间让出事件循环，单个工作进程可以同时处理大量请求
+    异步会话不支持懒加载关联对象，需要用selectinload/joinedload预先加载
+    未安装异步驱动时提供在线程池中执行的同步会话（ThreadedSession）
+    
+    使用示例:
+        @app.get("/products")
+        async def get_products(db: AsyncSession = Depends(get_async_db)):
+            return (await db.scalars(select(Product))).all()
+    """
+    if not async_driver_available():
+        db = ThreadedSession(SessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+async def get_async_read_db():
+    """
+    获取异步只读数据库会话（依赖注入函数）
+    
+    get_read_db的异步版本，查询发往只读副本
+    未安装异步驱动时提供在线程池中执行的ReadSessionLocal会话
+    """
+    if not async_driver_available():
+        db = ThreadedSession(ReadSessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+    async with get_async_read_sessionmaker()() as db:
+        yield db
+
+
 def init_db():
     """
     初始化数据库表结构
@@ -59,11 +279,13 @@ def init_db():
     from app.models import (
         User, Role, Permission, UserRole, RolePermission,
         Department, Supplier, Customer,
-        Product, ProductCategory, Warehouse, StockRecord, StockCheck, StockCheckItem,
+        Product, ProductCategory, Warehouse, StockRecord, WarehouseStock, StockReservation, StockCheck, StockCheckItem,
         PurchaseOrder, PurchaseOrderItem,
         SalesOrder, SalesOrderItem,
         Payment, Bill, Account, CostCenter,
-        WorkflowDefinition, WorkflowInstance, WorkflowLog
+        WorkflowDefinition, WorkflowInstance, WorkflowLog,
+        PurchaseDailyRollup, SalesDailyRollup, PaymentDailyRollup,
+        CodeSequence, SearchToken
     )
     # 根据所有模型类的定义，创建数据库表
     Base.metadata.create_all(bind=engine)
@@ -2,18 +2,23 @@ from app.models.user import Menu, User, Role, Permission, UserRole, RolePermissi
 from app.models.department import Department
 from app.models.supplier import Supplier
 from app.models.purchase import PurchaseOrder, PurchaseOrderItem
-from app.models.inventory import Product, ProductCategory, Warehouse, StockRecord, StockCheck, StockCheckItem
+from app.models.inventory import Product, ProductCategory, Warehouse, StockRecord, WarehouseStock, StockReservation, StockCheck, StockCheckItem
 from app.models.sales import Customer, SalesOrder, SalesOrderItem
 from app.models.finance import Payment, Bill, Account, CostCenter
 from app.models.workflow import WorkflowDefinition, WorkflowInstance, WorkflowLog
+from app.models.report import PurchaseDailyRollup, SalesDailyRollup, PaymentDailyRollup
+from app.models.sequence import CodeSequence
+from app.models.search import SearchToken
 
 __all__ = [
     "User", "Role", "Permission", "UserRole", "RolePermission",
     "Department",
     "Supplier",
     "PurchaseOrder", "PurchaseOrderItem",
-    "Product", "ProductCategory", "Warehouse", "StockRecord", "StockCheck", "StockCheckItem",
+    "Product", "ProductCategory", "Warehouse", "StockRecord", "WarehouseStock", "StockReservation", "StockCheck", "StockCheckItem",
     "Customer", "SalesOrder", "SalesOrderItem",
     "Payment", "Bill", "Account", "CostCenter",
-    "WorkflowDefinition", "WorkflowInstance", "WorkflowLog"
+    "WorkflowDefinition", "WorkflowInstance", "WorkflowLog",
+    "PurchaseDailyRollup", "SalesDailyRollup", "PaymentDailyRollup",
+    "CodeSequence", "SearchToken"
 ]
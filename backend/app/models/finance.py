@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Index, String, Integer, Float, Text, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from app.db.base import BaseModel
 
@@ -41,6 +41,9 @@ class Payment(BaseModel):
     每笔资金流动都会产生一条付款记录
     """
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_created_at_id", "created_at", "id"),  # 按创建时间倒序的游标分页
+    )
     
     code = Column(String(50), unique=True, index=True, nullable=False, comment="付款单号")
     type = Column(String(20), nullable=False, comment="类型：pay/receive")
@@ -97,6 +100,9 @@ class Bill(BaseModel):
     帮助企业跟踪和管理所有未结清的账务
     """
     __tablename__ = "bills"
+    __table_args__ = (
+        Index("ix_bills_created_at_id", "created_at", "id"),  # 按创建时间倒序的游标分页
+    )
     
     code = Column(String(50), unique=True, index=True, nullable=False, comment="单据号")
     type = Column(String(20), nullable=False, comment="类型：receivable/payable")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Index, String, Integer, Float, Text, ForeignKey, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db.base import BaseModel
 
@@ -22,6 +22,7 @@ class Product(BaseModel):
     min_stock = Column(Float, default=0.0, comment="最小库存")
     max_stock = Column(Float, default=0.0, comment="最大库存")
     current_stock = Column(Float, default=0.0, comment="当前库存")
+    reserved_stock = Column(Float, default=0.0, nullable=False, comment="已预留库存，可用库存 = 当前库存 - 已预留库存")
     status = Column(String(20), default="active", comment="状态：active/inactive")
     remark = Column(Text, comment="备注")
     
@@ -41,6 +42,7 @@ class Product(BaseModel):
             "min_stock": self.min_stock,
             "max_stock": self.max_stock,
             "current_stock": self.current_stock,
+            "reserved_stock": self.reserved_stock,
             "status": self.status,
             "remark": self.remark,
             "created_at": self.created_at.isoformat() if self.created_at else None,
@@ -126,6 +128,9 @@ class StockRecord(BaseModel):
     每次库存变动都会生成一条记录，确保库存数据的可追溯性
     """
     __tablename__ = "stock_records"
+    __table_args__ = (
+        Index("ix_stock_records_created_at_id", "created_at", "id"),  # 按创建时间倒序的游标分页
+    )
     
     code = Column(String(50), unique=True, index=True, nullable=False, comment="出入库单号")
     type = Column(String(20), nullable=False, comment="类型：in/out/transfer/check/adjust")
@@ -162,6 +167,66 @@ class StockRecord(BaseModel):
         }
 
 
+class WarehouseStock(BaseModel):
+    """
+    仓库库存余额模型类
+    
+    每个（产品, 仓库）一行，记录该产品在该仓库的当前数量
+    由库存记录和盘点完成在同一事务中增量维护，查询某产品在某仓库的库存只需按唯一索引读取一行
+    所有仓库的数量之和等于Product.current_stock
+    """
+    __tablename__ = "warehouse_stock"
+    __table_args__ = (
+        UniqueConstraint("product_id", "warehouse_id", name="uq_warehouse_stock_key"),
+    )
+    
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, comment="产品ID")
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False, index=True, comment="仓库ID")
+    quantity = Column(Float, default=0.0, nullable=False, comment="数量")
+    
+    product = relationship("Product")
+    warehouse = relationship("Warehouse")
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "product_id": self.product_id,
+            "warehouse_id": self.warehouse_id,
+            "quantity": self.quantity,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class StockReservation(BaseModel):
+    """
+    库存预留模型类
+    
+    销售订单审批通过时按产品预留库存，每个（订单, 产品）一行
+    销售发货出库时扣减对应行的数量，全部发货后标记为consumed；取消订单时剩余预留标记为released
+    预留、消耗和释放与Product.reserved_stock在同一事务中修改，所有active行的数量之和等于reserved_stock
+    """
+    __tablename__ = "stock_reservations"
+    
+    sales_order_id = Column(Integer, ForeignKey("sales_orders.id", ondelete="CASCADE"), nullable=False, index=True, comment="销售单ID")
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True, comment="产品ID")
+    quantity = Column(Float, nullable=False, comment="剩余预留数量")
+    status = Column(String(20), default="active", nullable=False, comment="状态：active/consumed/released")
+    
+    product = relationship("Product")
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "sales_order_id": self.sales_order_id,
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "status": self.status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
 class StockCheck(BaseModel):
     """
     库存盘点模型类
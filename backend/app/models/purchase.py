@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Index, String, Integer, Float, Text, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from app.db.base import BaseModel
 
@@ -11,6 +11,9 @@ class PurchaseOrder(BaseModel):
     采购订单是企业向供应商采购产品时创建的正式文件，包含了采购的所有基本信息
     """
     __tablename__ = "purchase_orders"
+    __table_args__ = (
+        Index("ix_purchase_orders_created_at_id", "created_at", "id"),  # 按创建时间倒序的游标分页
+    )
     
     code = Column(String(50), unique=True, index=True, nullable=False, comment="采购单号")
     supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=False, comment="供应商ID")
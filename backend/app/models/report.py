@@ -0,0 +1,57 @@
+from sqlalchemy import Column, String, Integer, Float, Date, UniqueConstraint
+from app.db.base import BaseModel
+
+
+class PurchaseDailyRollup(BaseModel):
+    """
+    采购日汇总模型类
+
+    按（日期, 供应商, 状态）预先汇总采购订单数量和金额
+    在订单创建、审批、修改、删除时增量维护，报表直接读取汇总行而不扫描订单表
+    """
+    __tablename__ = "purchase_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "supplier_id", "status", name="uq_purchase_rollup_key"),
+    )
+
+    day = Column(Date, nullable=False, index=True, comment="日期（按订单创建时间）")
+    supplier_id = Column(Integer, nullable=False, comment="供应商ID")
+    status = Column(String(20), nullable=False, comment="订单状态")
+    order_count = Column(Integer, default=0, nullable=False, comment="订单数量")
+    total_amount = Column(Float, default=0.0, nullable=False, comment="订单总金额")
+
+
+class SalesDailyRollup(BaseModel):
+    """
+    销售日汇总模型类
+
+    按（日期, 客户, 状态）预先汇总销售订单数量和金额
+    """
+    __tablename__ = "sales_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "customer_id", "status", name="uq_sales_rollup_key"),
+    )
+
+    day = Column(Date, nullable=False, index=True, comment="日期（按订单创建时间）")
+    customer_id = Column(Integer, nullable=False, comment="客户ID")
+    status = Column(String(20), nullable=False, comment="订单状态")
+    order_count = Column(Integer, default=0, nullable=False, comment="订单数量")
+    total_amount = Column(Float, default=0.0, nullable=False, comment="订单总金额")
+
+
+class PaymentDailyRollup(BaseModel):
+    """
+    付款日汇总模型类
+
+    按（日期, 收付类型, 状态）预先汇总付款单据数量和金额
+    """
+    __tablename__ = "payment_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "type", "status", name="uq_payment_rollup_key"),
+    )
+
+    day = Column(Date, nullable=False, index=True, comment="日期（按单据创建时间）")
+    type = Column(String(20), nullable=False, comment="类型：pay/receive")
+    status = Column(String(20), nullable=False, comment="单据状态")
+    order_count = Column(Integer, default=0, nullable=False, comment="单据数量")
+    total_amount = Column(Float, default=0.0, nullable=False, comment="单据总金额")
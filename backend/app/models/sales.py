@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Index, String, Integer, Float, Boolean, Text, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from app.db.base import BaseModel
 
@@ -59,6 +59,9 @@ class SalesOrder(BaseModel):
     销售订单是企业向客户销售产品时创建的正式文件，包含了销售的所有基本信息
     """
     __tablename__ = "sales_orders"
+    __table_args__ = (
+        Index("ix_sales_orders_created_at_id", "created_at", "id"),  # 按创建时间倒序的游标分页
+    )
     
     code = Column(String(50), unique=True, index=True, nullable=False, comment="销售单号")
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, comment="客户ID")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, Integer, Index
+from app.db.session import Base
+
+
+class SearchToken(Base):
+    """
+    搜索倒排索引模型类
+
+    每个（实体, 词元, 实体ID）一行，weight为该词元在实体中的权重，用于结果排序
+    词元由app.services.search切分：字母数字按词取前缀，中文取单字和相邻两字
+    行数很多，不继承BaseModel，不保存id和时间字段，主键即为查询使用的索引
+    """
+    __tablename__ = "search_tokens"
+    __table_args__ = (
+        Index("ix_search_tokens_entity_id", "entity", "entity_id"),
+    )
+
+    entity = Column(String(20), primary_key=True, comment="实体表名，如products/customers")
+    token = Column(String(32), primary_key=True, comment="词元")
+    entity_id = Column(Integer, primary_key=True, autoincrement=False, comment="实体ID")
+    weight = Column(Integer, nullable=False, default=1, comment="权重")
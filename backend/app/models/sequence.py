@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, Date, UniqueConstraint
+from app.db.base import BaseModel
+
+
+class CodeSequence(BaseModel):
+    """
+    业务编码序列模型类
+
+    每个（编码前缀, 日期）一行，next_value为下一个尚未分配的序号
+    各工作进程按块预留序号（把next_value加上块大小），块内的序号在进程内存中分配
+    """
+    __tablename__ = "code_sequences"
+    __table_args__ = (
+        UniqueConstraint("prefix", "day", name="uq_code_sequence_key"),
+    )
+
+    prefix = Column(String(20), nullable=False, comment="编码前缀，如PO/SO/SR/SC")
+    day = Column(Date, nullable=False, comment="日期")
+    next_value = Column(Integer, default=1, nullable=False, comment="下一个未分配的序号")
@@ -72,9 +72,11 @@ class PaymentListResponse(BaseModel):
     
     用于返回分页的付款单据列表
     包含总数和单据列表
+    total在with_total=false时为None，next_cursor为下一页游标
     """
-    total: int
+    total: Optional[int] = None
     items: list[PaymentResponse]
+    next_cursor: Optional[str] = None
 
 
 class PaymentApprove(BaseModel):
@@ -150,9 +152,11 @@ class BillListResponse(BaseModel):
     账单列表响应模型
     
     用于返回分页的账单列表
+    total在with_total=false时为None，next_cursor为下一页游标
     """
-    total: int
+    total: Optional[int] = None
     items: list[BillResponse]
+    next_cursor: Optional[str] = None
 
 
 class AccountBase(BaseModel):
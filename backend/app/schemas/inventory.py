@@ -60,6 +60,7 @@ class ProductResponse(ProductBase):
     """
     id: int
     current_stock: float
+    reserved_stock: float = 0.0
     created_at: datetime
     updated_at: datetime
     
@@ -77,6 +78,21 @@ class ProductListResponse(BaseModel):
     items: List[ProductResponse]
 
 
+class ProductCatalogItem(BaseModel):
+    """
+    产品目录条目模型
+    
+    产品基本信息，来自产品目录缓存，不包含库存数量
+    """
+    id: int
+    code: str
+    name: str
+    unit: Optional[str] = None
+    specification: Optional[str] = None
+    purchase_price: float
+    sale_price: float
+
+
 class ProductCategoryBase(BaseModel):
     """
     产品分类基础模型
@@ -236,9 +252,68 @@ class StockRecordListResponse(BaseModel):
     库存记录列表响应模型
     
     用于返回分页的库存记录列表
+    total在with_total=false时为None，next_cursor为下一页游标
     """
-    total: int
+    total: Optional[int] = None
     items: List[StockRecordResponse]
+    next_cursor: Optional[str] = None
+
+
+class StockRecordBatchCreate(BaseModel):
+    """
+    库存记录批量创建模型
+    
+    用于扫码枪等一次提交大量出入库记录
+    """
+    records: List[StockRecordCreate] = Field(..., min_length=1, max_length=20000)
+
+
+class StockRecordBatchError(BaseModel):
+    """
+    库存记录批量创建错误模型
+    
+    index为出错记录在提交列表中的下标
+    """
+    index: int
+    detail: str
+
+
+class StockRecordBatchResponse(BaseModel):
+    """
+    库存记录批量创建响应模型
+    
+    出错的记录不会写入，其余记录正常创建
+    """
+    total: int
+    created: int
+    failed: int
+    errors: List[StockRecordBatchError]
+
+
+class WarehouseStockItem(BaseModel):
+    """
+    仓库库存余额模型
+    
+    表示某产品在一个仓库中的当前数量
+    """
+    warehouse_id: int
+    warehouse_code: str
+    warehouse_name: str
+    quantity: float
+
+
+class ProductStockResponse(BaseModel):
+    """
+    产品分仓库存响应模型
+    
+    current_stock为产品总库存，reserved_stock为已审批销售订单预留的数量
+    available_stock = current_stock - reserved_stock，warehouses为各仓库的库存余额
+    """
+    product_id: int
+    current_stock: float
+    reserved_stock: float
+    available_stock: float
+    warehouses: List[WarehouseStockItem]
 
 
 class StockCheckItemBase(BaseModel):
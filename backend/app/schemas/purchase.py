@@ -117,9 +117,11 @@ class PurchaseOrderListResponse(BaseModel):
     采购订单列表响应模型
     
     用于返回分页的采购订单列表
+    total在with_total=false时为None，next_cursor为下一页游标
     """
-    total: int
+    total: Optional[int] = None
     items: List[PurchaseOrderResponse]
+    next_cursor: Optional[str] = None
 
 
 class PurchaseOrderApprove(BaseModel):
@@ -195,9 +195,11 @@ class SalesOrderListResponse(BaseModel):
     销售订单列表响应模型
     
     用于返回分页的销售订单列表
+    total在with_total=false时为None，next_cursor为下一页游标
     """
-    total: int
+    total: Optional[int] = None
     items: List[SalesOrderResponse]
+    next_cursor: Optional[str] = None
 
 
 class SalesOrderApprove(BaseModel):
@@ -0,0 +1,76 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+def date_range_criteria(column, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Any]:
+    """
+    构建日期范围筛选条件
+
+    start_date/end_date为空时不添加对应条件
+    返回可直接传给filter()的条件列表
+    """
+    criteria = []
+    if start_date:
+        criteria.append(column >= start_date)
+    if end_date:
+        criteria.append(column <= end_date)
+    return criteria
+
+
+def order_summary_statement(model, amount_column, *criteria):
+    """
+    构建单据汇总统计语句
+
+    按状态分组，一次SQL查询同时得到各状态的单据数量和金额合计
+    """
+    return select(
+        model.status,
+        func.count(model.id),
+        func.sum(amount_column)
+    ).where(*criteria).group_by(model.status)
+
+
+def _summary_from_rows(rows) -> Dict[str, Any]:
+    by_status = {}
+    count = 0
+    total = 0.0
+    for status, status_count, status_total in rows:
+        status_total = float(status_total or 0)
+        by_status[status] = {"count": status_count, "total": status_total}
+        count += status_count
+        total += status_total
+
+    return {"count": count, "total": total, "by_status": by_status}
+
+
+def summarize_orders(db: Session, model, amount_column, *criteria) -> Dict[str, Any]:
+    """
+    单据汇总统计
+
+    按状态分组，一次SQL查询同时得到单据数量、金额合计和各状态的数量/金额
+    只返回分组后的少量行，不加载任何ORM对象
+
+    参数:
+        model: 单据模型，需包含id和status字段（PurchaseOrder/SalesOrder/Payment等）
+        amount_column: 需要求和的金额字段，如PurchaseOrder.total_amount
+        criteria: 额外的筛选条件
+
+    返回:
+        {"count": 总数, "total": 金额合计, "by_status": {状态: {"count": 数量, "total": 金额}}}
+    """
+    rows = db.execute(order_summary_statement(model, amount_column, *criteria)).all()
+    return _summary_from_rows(rows)
+
+
+async def summarize_orders_async(db: AsyncSession, model, amount_column, *criteria) -> Dict[str, Any]:
+    """summarize_orders的异步会话版本，返回值相同"""
+    rows = (await db.execute(order_summary_statement(model, amount_column, *criteria))).all()
+    return _summary_from_rows(rows)
+
+
+def status_count(summary: Dict[str, Any], status: str) -> int:
+    """从summarize_orders的结果中取出指定状态的单据数量"""
+    return summary["by_status"].get(status, {}).get("count", 0)
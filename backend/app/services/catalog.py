@@ -0,0 +1,303 @@
+"""
+产品目录缓存
+
+产品的编码、名称、单位、规格和价格几乎在每个订单、库存、报表请求中都要读取，但很少修改
+这里在进程内按列保存全部产品的这些字段（ID用有序array，价格用array('d')，字符串用list），
+按ID或编码读取不访问数据库，100万产品约占用260MB（两个dict保存元组时约520MB）
+
+- 启动时在后台线程预热，预热完成前和未命中的产品从数据库读取后加入缓存
+- 创建、修改、删除产品后调用invalidate，通过失效通知通道通知所有工作进程
+- 通道为local时只通知本进程；为redis时使用REDIS_URL的发布订阅在多个工作进程之间广播
+- 只缓存很少变化的字段，库存数量等经常变化的字段仍然从数据库读取
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import select
+
+from app.core.cache import LocalChannel, RedisChannel, create_channel  # noqa: F401  失效通知通道定义在app.core.cache中，这里保留原导入路径
+
+
+class ProductInfo(NamedTuple):
+    """产品目录条目，读取时由各列临时组装"""
+    id: int
+    code: str
+    name: str
+    unit: Optional[str]
+    specification: Optional[str]
+    purchase_price: float
+    sale_price: float
+
+
+class ProductCatalog:
+    """
+    按列存储的产品目录缓存
+
+    _ids按升序保存产品ID，第i个产品的各字段保存在各列的第i个位置
+    _alive[i]为0表示该位置已失效，下次读取时从数据库重新加载
+    单位和规格的取值重复很多，相同的值共用一个字符串对象
+    _by_code把编码映射到产品ID，再用二分查找定位
+    读取接口需要传入数据库会话，用于加载未命中的产品
+    _generation在每次失效时加一，从数据库读取期间发生过失效时不写入读到的行，避免覆盖为旧数据
+    """
+    _columns = ("id", "code", "name", "unit", "specification", "purchase_price", "sale_price")
+
+    def __init__(self, channel=None):
+        self.channel = channel or LocalChannel()
+        self._lock = threading.RLock()
+        self._loading: Optional[set] = None
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.loaded_at: Optional[float] = None
+        self._reset()
+        self.channel.subscribe(self._on_message, on_reconnect=self.clear)
+
+    def _reset(self):
+        self._ids = array("q")
+        self._codes: List[str] = []
+        self._names: List[str] = []
+        self._units: List[Optional[str]] = []
+        self._specs: List[Optional[str]] = []
+        self._purchase_prices = array("d")
+        self._sale_prices = array("d")
+        self._alive = bytearray()
+        self._by_code: Dict[str, int] = {}
+        self._shared: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self._by_code)
+
+    def _position(self, product_id: int) -> int:
+        """返回产品ID的位置，不存在时返回-1"""
+        i = bisect_left(self._ids, product_id)
+        return i if i < len(self._ids) and self._ids[i] == product_id else -1
+
+    def _entry(self, i: int) -> ProductInfo:
+        return ProductInfo(
+            self._ids[i], self._codes[i], self._names[i], self._units[i], self._specs[i],
+            self._purchase_prices[i], self._sale_prices[i]
+        )
+
+    def _share(self, value: Optional[str]) -> Optional[str]:
+        return value if value is None else self._shared.setdefault(value, value)
+
+    def _store(self, row):
+        """写入或覆盖一个产品，新ID通常最大，直接追加"""
+        product_id, code = row[0], row[1]
+        i = self._position(product_id)
+        if i < 0:
+            i = bisect_left(self._ids, product_id)
+            self._ids.insert(i, product_id)
+            self._codes.insert(i, code)
+            self._names.insert(i, row[2])
+            self._units.insert(i, self._share(row[3]))
+            self._specs.insert(i, self._share(row[4]))
+            self._purchase_prices.insert(i, row[5] or 0.0)
+            self._sale_prices.insert(i, row[6] or 0.0)
+            self._alive.insert(i, 1)
+        else:
+            old_code = self._codes[i]
+            if self._by_code.get(old_code) == product_id:
+                del self._by_code[old_code]
+            self._codes[i] = code
+            self._names[i] = row[2]
+            self._units[i] = self._share(row[3])
+            self._specs[i] = self._share(row[4])
+            self._purchase_prices[i] = row[5] or 0.0
+            self._sale_prices[i] = row[6] or 0.0
+            self._alive[i] = 1
+        self._by_code[code] = product_id
+
+    def _select(self):
+        from app.models import Product
+        return select(*(getattr(Product, column) for column in self._columns)), Product
+
+    def _fetch(self, db, ids: Iterable[int] = (), codes: Iterable[str] = ()) -> List[ProductInfo]:
+        """
+        从主库加载一批产品并写入缓存，读取期间有产品失效时只返回结果不写入缓存
+
+        传入的会话读取只读副本时改用临时的主库会话，副本延迟可能读到失效之前的旧数据，
+        写入缓存后会一直保留到该产品下次修改
+        """
+        if _reads_replica(db):
+            from app.db.session import SessionLocal
+            primary = SessionLocal()
+            try:
+                return self._fetch(primary, ids, codes)
+            finally:
+                primary.close()
+        statement, Product = self._select()
+        ids, codes = list(ids), list(codes)
+        with self._lock:
+            generation = self._generation
+        rows = []
+        if ids:
+            rows += db.execute(statement.where(Product.id.in_(ids))).all()
+        if codes:
+            rows += db.execute(statement.where(Product.code.in_(codes))).all()
+        with self._lock:
+            if self._generation == generation:
+                for row in rows:
+                    if self._loading is None or row[0] not in self._loading:
+                        self._store(row)
+        return [ProductInfo(*row) for row in rows]
+
+    def get_many(self, db, ids: Iterable[int] = (), codes: Iterable[str] = ()) -> Dict:
+        """
+        按ID和编码批量读取，返回{ID或编码: ProductInfo}
+
+        未命中的ID和编码各用一次IN查询从数据库加载，不存在的产品不出现在结果中
+        """
+        result = {}
+        missing_ids, missing_codes = [], []
+        with self._lock:
+            for product_id in ids:
+                i = self._position(product_id)
+                if i >= 0 and self._alive[i]:
+                    result[product_id] = self._entry(i)
+                else:
+                    missing_ids.append(product_id)
+            for code in codes:
+                product_id = self._by_code.get(code)
+                i = self._position(product_id) if product_id is not None else -1
+                if i >= 0 and self._alive[i]:
+                    result[code] = self._entry(i)
+                else:
+                    missing_codes.append(code)
+            self.hits += len(result)
+            self.misses += len(missing_ids) + len(missing_codes)
+
+        if missing_ids or missing_codes:
+            wanted_ids, wanted_codes = set(missing_ids), set(missing_codes)
+            for info in self._fetch(db, missing_ids, missing_codes):
+                if info.id in wanted_ids:
+                    result[info.id] = info
+                if info.code in wanted_codes:
+                    result[info.code] = info
+        return result
+
+    def get(self, db, product_id: int) -> Optional[ProductInfo]:
+        """按ID读取产品，不存在时返回None"""
+        return self.get_many(db, ids=[product_id]).get(product_id)
+
+    def get_by_code(self, db, code: str) -> Optional[ProductInfo]:
+        """按编码读取产品，不存在时返回None"""
+        return self.get_many(db, codes=[code]).get(code)
+
+    def load(self, db, chunk_size: int = 50000) -> int:
+        """
+        从数据库全量加载产品目录，返回产品数
+
+        按ID分批读取到新的列中，完成后一次替换；加载期间收到的失效通知在替换后重新应用
+        """
+        statement, Product = self._select()
+        with self._lock:
+            self._loading = set()
+        fresh = ProductCatalog.__new__(ProductCatalog)
+        fresh._reset()
+        last_id = 0
+        try:
+            while True:
+                rows = db.execute(statement.where(Product.id > last_id).order_by(Product.id).limit(chunk_size)).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                for row in rows:
+                    fresh._ids.append(row[0])
+                    fresh._codes.append(row[1])
+                    fresh._names.append(row[2])
+                    fresh._units.append(fresh._share(row[3]))
+                    fresh._specs.append(fresh._share(row[4]))
+                    fresh._purchase_prices.append(row[5] or 0.0)
+                    fresh._sale_prices.append(row[6] or 0.0)
+                    fresh._by_code[row[1]] = row[0]
+            fresh._alive = bytearray(b"\x01") * len(fresh._ids)
+        finally:
+            with self._lock:
+                invalidated, self._loading = self._loading, None
+                if len(fresh._ids) or not len(self._ids):
+                    for name in ("_ids", "_codes", "_names", "_units", "_specs",
+                                 "_purchase_prices", "_sale_prices", "_alive", "_by_code", "_shared"):
+                        setattr(self, name, getattr(fresh, name))
+                    self.loaded_at = time.time()
+                self._invalidate_local(invalidated)
+        return len(self._ids)
+
+    def _invalidate_local(self, ids: Iterable[int]):
+        with self._lock:
+            self._generation += 1
+            for product_id in ids:
+                if self._loading is not None:
+                    self._loading.add(product_id)
+                i = self._position(product_id)
+                if i >= 0:
+                    self._alive[i] = 0
+                    if self._by_code.get(self._codes[i]) == product_id:
+                        del self._by_code[self._codes[i]]
+
+    def _on_message(self, message: str):
+        if message == "*":
+            self.clear()
+        else:
+            self._invalidate_local(int(value) for value in message.split(",") if value)
+
+    def invalidate(self, *product_ids: int):
+        """使指定产品失效并通知其他工作进程，在修改产品的事务提交之后调用"""
+        self._invalidate_local(product_ids)
+        self.channel.publish(",".join(str(product_id) for product_id in product_ids))
+
+    def clear(self):
+        """使全部产品失效（只影响本进程），之后按需从数据库重新加载"""
+        with self._lock:
+            self._generation += 1
+            if self._loading is not None:
+                self._loading.update(self._ids)
+            self._alive = bytearray(len(self._ids))
+            self._by_code = {}
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "name": "product_catalog",
+            "size": len(self._by_code),
+            "ttl": None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "channel": self.channel.name,
+            "channel_error": self.channel.last_error,
+        }
+
+
+def _reads_replica(db) -> bool:
+    """会话的查询是否发往只读副本（读写分离会话且未切换到主库）"""
+    session = getattr(db, "sync_session", db)
+    primary = getattr(session, "primary_bind", None)
+    return primary is not None and session.get_bind() is not primary
+
+
+def warm_product_catalog():
+    """在后台线程中预热产品目录缓存，预热期间的读取照常从数据库加载"""
+    def run():
+        from app.db.session import SessionLocal
+        db = SessionLocal()
+        try:
+            product_catalog.load(db)
+        finally:
+            db.close()
+
+    threading.Thread(target=run, name="product-catalog-warm", daemon=True).start()
+
+
+def _create_catalog() -> ProductCatalog:
+    from app.core.config import get_settings
+    settings = get_settings()
+    return ProductCatalog(create_channel(settings.PRODUCT_CATALOG_CHANNEL, settings.REDIS_URL, "scm:product_catalog"))
+
+
+product_catalog = _create_catalog()
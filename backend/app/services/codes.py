@@ -0,0 +1,90 @@
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from app.core.config import get_settings
+from app.db.session import engine
+from app.models import CodeSequence
+
+settings = get_settings()
+
+
+class CodeAllocator:
+    """
+    业务编码分配器
+
+    按（前缀, 日期）从code_sequences表预留一块连续序号，块内序号在进程内存中分配
+    - 预留通过UPDATE next_value = next_value + 块大小完成，行锁保证多个工作进程拿到的块互不重叠
+    - 每block_size个编码才访问一次数据库，且使用独立连接立即提交，不受业务事务回滚影响
+    - 同一进程内编码单调递增；多个进程交替使用各自的块，编码唯一但不保证全局有序
+    - 进程退出时未用完的序号会被跳过，编码可能不连续
+    - 应在业务事务写入数据之前取号，避免持有业务行锁时再等待序列行锁（SQLite整库只有一个写锁）
+    """
+    def __init__(self, bind: Engine, block_size: int = 100, width: int = 6):
+        self.bind = bind
+        self.block_size = block_size
+        self.width = width
+        self.reservations = 0
+        self._blocks: Dict[Tuple[str, date], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def next_value(self, prefix: str, day: date) -> int:
+        """返回（前缀, 日期）的下一个序号"""
+        key = (prefix, day)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None or block[0] >= block[1]:
+                block = self._blocks[key] = list(self._reserve_block(prefix, day, self.block_size))
+                self._drop_stale_blocks(day)
+            value = block[0]
+            block[0] += 1
+            return value
+
+    def next_code(self, prefix: str, day: Optional[date] = None) -> str:
+        """生成编码：前缀 + 日期(YYYYMMDD) + 定宽序号"""
+        day = day or datetime.now().date()
+        return f"{prefix}{day:%Y%m%d}{self.next_value(prefix, day):0{self.width}d}"
+
+    def next_codes(self, prefix: str, count: int, day: Optional[date] = None) -> List[str]:
+        """
+        一次生成count个连续编码
+
+        用于批量导入，单独预留一段长度为count的序号，只访问一次数据库，不占用进程内缓存的块
+        """
+        day = day or datetime.now().date()
+        if count <= 0:
+            return []
+        start, end = self._reserve_block(prefix, day, count)
+        return [f"{prefix}{day:%Y%m%d}{value:0{self.width}d}" for value in range(start, end)]
+
+    def _reserve_block(self, prefix: str, day: date, size: int) -> Tuple[int, int]:
+        """从数据库预留size个序号，返回[起始, 结束)"""
+        table = CodeSequence.__table__
+        criteria = (table.c.prefix == prefix, table.c.day == day)
+        while True:
+            with self.bind.begin() as conn:
+                result = conn.execute(
+                    update(table).where(*criteria).values(next_value=table.c.next_value + size)
+                )
+                if result.rowcount:
+                    end = conn.execute(select(table.c.next_value).where(*criteria)).scalar_one()
+                    self.reservations += 1
+                    return end - size, end
+
+            try:
+                with self.bind.begin() as conn:
+                    conn.execute(insert(table).values(prefix=prefix, day=day, next_value=1 + size))
+                self.reservations += 1
+                return 1, 1 + size
+            except IntegrityError:
+                # 其他进程已经插入了当天的序列行，回到UPDATE
+                continue
+
+    def _drop_stale_blocks(self, today: date):
+        for key in [key for key in self._blocks if key[1] < today]:
+            del self._blocks[key]
+
+
+code_allocator = CodeAllocator(engine, block_size=settings.CODE_BLOCK_SIZE)
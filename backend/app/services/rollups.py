@@ -0,0 +1,105 @@
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import (
+    PurchaseOrder, SalesOrder, Payment,
+    PurchaseDailyRollup, SalesDailyRollup, PaymentDailyRollup
+)
+
+# 单据模型 -> (汇总模型, 维度字段名, 金额字段名)
+# 汇总表中的维度字段与单据表中的字段同名
+ROLLUP_SPECS = {
+    PurchaseOrder: (PurchaseDailyRollup, "supplier_id", "total_amount"),
+    SalesOrder: (SalesDailyRollup, "customer_id", "total_amount"),
+    Payment: (PaymentDailyRollup, "type", "amount"),
+}
+
+
+def _apply_delta(db: Session, rollup_model, key_field: str, day, key, status, count_delta: int, amount_delta: float):
+    """
+    对一行汇总数据做增量更新
+
+    先尝试UPDATE，没有命中再INSERT
+    并发插入同一行导致唯一约束冲突时回滚保存点并重新UPDATE
+    """
+    key_column = getattr(rollup_model, key_field)
+    criteria = (
+        rollup_model.day == day,
+        key_column == key,
+        rollup_model.status == status,
+    )
+    values = {
+        "order_count": rollup_model.order_count + count_delta,
+        "total_amount": rollup_model.total_amount + amount_delta,
+    }
+
+    result = db.execute(update(rollup_model).where(*criteria).values(**values))
+    if result.rowcount:
+        return
+
+    try:
+        with db.begin_nested():
+            db.execute(insert(rollup_model).values(
+                day=day,
+                status=status,
+                order_count=count_delta,
+                total_amount=amount_delta,
+                **{key_field: key}
+            ))
+    except IntegrityError:
+        db.execute(update(rollup_model).where(*criteria).values(**values))
+
+
+def track_rollup(db: Session, obj, sign: int = 1):
+    """
+    把单据当前状态计入（sign=1）或移出（sign=-1）日汇总
+
+    使用方式:
+        创建单据: flush后调用track_rollup(db, obj)
+        删除单据: 删除前调用track_rollup(db, obj, -1)
+        修改状态/金额: 修改前调用track_rollup(db, obj, -1)，修改后调用track_rollup(db, obj)
+
+    与业务修改在同一事务中提交
+    """
+    rollup_model, key_field, amount_field = ROLLUP_SPECS[type(obj)]
+    _apply_delta(
+        db, rollup_model, key_field,
+        day=obj.created_at.date(),
+        key=getattr(obj, key_field),
+        status=obj.status,
+        count_delta=sign,
+        amount_delta=sign * (getattr(obj, amount_field) or 0)
+    )
+
+
+def rebuild_rollups(db: Session) -> dict:
+    """
+    根据单据表全量重建所有日汇总表
+
+    每张汇总表用一条INSERT ... SELECT ... GROUP BY完成
+    用于首次上线、数据修复或直接改库之后
+    返回每张汇总表重建后的行数
+    """
+    result = {}
+    for model, (rollup_model, key_field, amount_field) in ROLLUP_SPECS.items():
+        day = func.date(model.created_at)
+        key_column = getattr(model, key_field)
+        source = select(
+            day,
+            key_column,
+            model.status,
+            func.count(model.id),
+            func.coalesce(func.sum(getattr(model, amount_field)), 0),
+            func.min(model.created_at),
+            func.max(model.created_at),
+        ).group_by(day, key_column, model.status)
+
+        db.query(rollup_model).delete(synchronize_session=False)
+        db.execute(insert(rollup_model).from_select(
+            ["day", key_field, "status", "order_count", "total_amount", "created_at", "updated_at"],
+            source
+        ))
+        result[rollup_model.__tablename__] = db.query(func.count(rollup_model.id)).scalar()
+
+    db.commit()
+    return result
@@ -0,0 +1,200 @@
+"""
+关键词搜索索引
+
+LIKE '%关键词%' 无法使用索引，每次搜索都要全表扫描。这里维护一张倒排索引表search_tokens:
+    - 连续的字母数字作为一个词，索引每个词的全部前缀，支持前缀匹配
+    - 编码字段另外索引词内每段字母或数字开头的前缀和词的全部后缀，"0001"能找到"PRD0001"
+    - 中文索引单字和相邻两字，查询一个字用单字，多个字用相邻两字组合
+查询时关键词切成同样的词元，每个词元按主键查找一次并求交集，按命中字段的权重之和排序
+关键词只有单个字符时，词元命中的记录太多，求交集和排序比全表扫描更慢，仍使用LIKE匹配
+
+会话flush时自动更新被新增、修改、删除对象的索引（track_search_index）
+批量INSERT、直接修改数据库之后需要运行rebuild_search_index.py重建
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, delete, event, inspect, insert, or_, select
+from sqlalchemy.orm import aliased
+
+SEARCH_FIELDS: Dict[str, Dict[str, int]] = {
+    "products": {"code": 3, "name": 2, "specification": 1},
+    "customers": {"code": 3, "name": 2, "contact_person": 1},
+    "suppliers": {"code": 3, "name": 2, "contact_person": 1},
+    "users": {"username": 3, "real_name": 2},
+}
+# 参与搜索的表和字段，数字为字段权重；完整匹配一个词的权重再乘以2
+
+CODE_FIELDS = {"code"}
+# 编码字段，除前缀外还按段和后缀索引，支持按编码中间的数字段或末尾几位查找
+
+MAX_PREFIX = 20
+# 字母数字词最多索引的前缀长度，更长的关键词按前20个字符匹配
+
+MIN_TOKEN_LENGTH = 2
+# 关键词的词元都短于该长度时使用LIKE匹配，单个字符命中的记录过多，使用索引反而更慢
+
+_WORD = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff]+")
+_SEGMENT_START = re.compile(r"(?<=[a-z])(?=[0-9])|(?<=[0-9])(?=[a-z])")
+
+
+def _is_cjk(word: str) -> bool:
+    return not word.isascii()
+
+
+def document_tokens(values: Dict[str, Optional[str]], weights: Dict[str, int]) -> Dict[str, int]:
+    """把一条记录的各字段切分成词元，返回{词元: 权重}，同一词元取最大权重"""
+    tokens: Dict[str, int] = {}
+
+    def add(token: str, weight: int):
+        if tokens.get(token, 0) < weight:
+            tokens[token] = weight
+
+    for field, weight in weights.items():
+        text = values.get(field)
+        if not text:
+            continue
+        for word in _WORD.findall(str(text).lower()):
+            if _is_cjk(word):
+                for i, char in enumerate(word):
+                    add(char, weight)
+                    if i + 1 < len(word):
+                        add(word[i:i + 2], weight)
+                continue
+            for length in range(1, min(len(word), MAX_PREFIX) + 1):
+                add(word[:length], weight * 2 if length == len(word) else weight)
+            if field in CODE_FIELDS:
+                for match in _SEGMENT_START.finditer(word):
+                    segment = word[match.start():]
+                    for length in range(1, min(len(segment), MAX_PREFIX) + 1):
+                        add(segment[:length], weight)
+                for start in range(max(1, len(word) - MAX_PREFIX), len(word)):
+                    add(word[start:], weight)
+    return tokens
+
+
+def query_tokens(keyword: str) -> List[str]:
+    """把搜索关键词切分成需要全部命中的词元，较长（通常更少见）的词元在前"""
+    tokens = []
+    for word in _WORD.findall(keyword.lower()):
+        if not _is_cjk(word):
+            tokens.append(word[:MAX_PREFIX])
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return sorted(dict.fromkeys(tokens), key=len, reverse=True)
+
+
+def search(query, model, keyword: str):
+    """
+    给查询加上关键词搜索条件，按相关度排序
+
+    query可以是select()语句或db.query()对象，model为被搜索的模型
+    命中全部词元的记录按权重之和倒序、ID倒序排列
+    第一个词元的倒排列表逐行按主键(entity, token, entity_id)探查其余词元，不需要GROUP BY
+    关键词切不出词元（只有标点等）或词元都短于MIN_TOKEN_LENGTH时退回LIKE匹配
+    """
+    from app.models import SearchToken
+
+    entity = model.__tablename__
+    tokens = query_tokens(keyword)
+    if not tokens or len(tokens[0]) < MIN_TOKEN_LENGTH:
+        return query.where(or_(*(getattr(model, field).contains(keyword) for field in SEARCH_FIELDS[entity])))
+
+    postings = [aliased(SearchToken) for _ in tokens]
+    first = postings[0]
+    matches = select(
+        first.entity_id,
+        sum((p.weight for p in postings[1:]), first.weight).label("score")
+    ).where(first.entity == entity, first.token == tokens[0])
+    for posting, token in zip(postings[1:], tokens[1:]):
+        matches = matches.join(posting, and_(
+            posting.entity == entity,
+            posting.token == token,
+            posting.entity_id == first.entity_id
+        ))
+    matches = matches.subquery()
+    return query.join(matches, matches.c.entity_id == model.id).order_by(
+        matches.c.score.desc(), model.id.desc()
+    )
+
+
+def _index_rows(entity: str, documents: Iterable) -> List[dict]:
+    weights = SEARCH_FIELDS[entity]
+    return [
+        {"entity": entity, "token": token, "entity_id": entity_id, "weight": weight}
+        for entity_id, values in documents
+        for token, weight in document_tokens(values, weights).items()
+    ]
+
+
+def track_search_index(session_factory):
+    """
+    在会话工厂上注册事件，flush时同步更新搜索索引
+
+    新增对象、修改了搜索字段的对象重新生成词元，删除的对象删除词元
+    在flush使用的同一连接上执行，与业务修改一起提交或回滚
+    """
+    @event.listens_for(session_factory, "after_flush")
+    def _after_flush(session, flush_context):
+        from app.models import SearchToken
+
+        changed: Dict[str, list] = {}
+        removed: Dict[str, list] = {}
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            entity = getattr(obj, "__tablename__", None)
+            fields = SEARCH_FIELDS.get(entity)
+            if not fields:
+                continue
+            state = inspect(obj)
+            if obj in session.deleted:
+                removed.setdefault(entity, []).append(obj.id)
+            elif obj in session.new or any(state.attrs[f].history.has_changes() for f in fields):
+                removed.setdefault(entity, []).append(obj.id)
+                changed.setdefault(entity, []).append((obj.id, {f: getattr(obj, f) for f in fields}))
+
+        if not removed:
+            return
+        connection = session.connection()
+        table = SearchToken.__table__
+        for entity, ids in removed.items():
+            connection.execute(delete(table).where(table.c.entity == entity, table.c.entity_id.in_(ids)))
+        for entity, documents in changed.items():
+            rows = _index_rows(entity, documents)
+            if rows:
+                connection.execute(insert(table), rows)
+
+
+def rebuild_search_index(db, entities: Optional[Iterable[str]] = None, chunk_size: int = 5000) -> Dict[str, int]:
+    """
+    全量重建搜索索引，返回各实体写入的词元行数
+
+    按ID分批读取搜索字段，每批一条executemany INSERT，内存占用与批大小有关
+    用于首次上线、批量导入或直接修改数据库之后
+    """
+    from app.models import SearchToken, Product, Customer, Supplier, User
+
+    models = {model.__tablename__: model for model in (Product, Customer, Supplier, User)}
+    table = SearchToken.__table__
+    counts = {}
+    for entity in entities or SEARCH_FIELDS:
+        model = models[entity]
+        fields = list(SEARCH_FIELDS[entity])
+        columns = [getattr(model, field) for field in fields]
+        db.execute(delete(table).where(table.c.entity == entity))
+        counts[entity] = 0
+        last_id = 0
+        while True:
+            batch = db.execute(
+                select(model.id, *columns).where(model.id > last_id).order_by(model.id).limit(chunk_size)
+            ).all()
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            rows = _index_rows(entity, ((row[0], dict(zip(fields, row[1:]))) for row in batch))
+            if rows:
+                db.execute(insert(table), rows)
+                counts[entity] += len(rows)
+        db.commit()
+    return counts
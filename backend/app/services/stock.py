@@ -0,0 +1,656 @@
+import csv
+import io
+from collections import defaultdict
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from sqlalchemy import and_, bindparam, case, exists, func, insert, literal, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models import Product, Warehouse, WarehouseStock, StockRecord, StockReservation, StockCheck, StockCheckItem, SalesOrder, SalesOrderItem
+
+
+class StockAdjustmentError(Exception):
+    """库存调整失败"""
+    def __init__(self, product_id: int, delta: float, available: Optional[float] = None):
+        super().__init__(product_id, delta, available)
+        self.product_id = product_id
+        self.delta = delta
+        self.available = available
+
+
+class ProductNotFound(StockAdjustmentError):
+    """产品不存在"""
+
+
+class InsufficientStock(StockAdjustmentError):
+    """库存不足，available为调整时的库存"""
+
+
+def adjust_stock(db: Session, product_id: int, delta: float, warehouse_id: Optional[int] = None,
+                 reserved: float = 0) -> float:
+    """
+    原子调整产品库存，返回调整后的产品总库存
+
+    用一条带条件的UPDATE完成检查和修改:
+        UPDATE products SET current_stock = current_stock + :delta, reserved_stock = reserved_stock - :reserved
+        WHERE id = :id [AND current_stock - reserved_stock >= -:delta - :reserved]
+    delta为负（出库）时要求可用库存（总库存 - 已预留）充足，不会发出已为其他订单预留的库存，
+    并发出库不会出现超卖或丢失更新
+    reserved为本次出库消耗的本订单预留数量（见consume_reservation），这部分不占用可用库存，同时从已预留中扣除
+    支持RETURNING的数据库直接返回新库存，否则在同一事务中再读取一次（行已被本事务锁定）
+
+    指定warehouse_id时同时调整该仓库的库存余额，出库要求该仓库库存充足
+
+    与业务修改在同一事务中提交，调用方负责commit
+    产品不存在时抛出ProductNotFound，可用库存不足时抛出InsufficientStock（available为可用库存）
+    仓库库存不足时产品总库存已经修改，调用方需要回滚事务
+    """
+    statement = update(Product).where(Product.id == product_id)
+    if delta < 0:
+        statement = statement.where(Product.current_stock - Product.reserved_stock >= -delta - reserved)
+    values = {"current_stock": Product.current_stock + delta}
+    if reserved:
+        values["reserved_stock"] = Product.reserved_stock - reserved
+    statement = statement.values(**values)
+    options = {"synchronize_session": False}
+
+    if db.get_bind().dialect.update_returning:
+        row = db.execute(
+            statement.returning(Product.current_stock, Product.reserved_stock), execution_options=options
+        ).first()
+    else:
+        updated = db.execute(statement, execution_options=options).rowcount > 0
+        row = db.execute(
+            select(Product.current_stock, Product.reserved_stock).where(Product.id == product_id)
+        ).first() if updated else None
+
+    if row is None:
+        available = db.scalar(select(available_stock()).where(Product.id == product_id))
+        if available is None:
+            raise ProductNotFound(product_id, delta)
+        raise InsufficientStock(product_id, delta, available)
+    new_level, new_reserved = row
+
+    product = db.identity_map.get(db.identity_key(Product, product_id))
+    if product is not None:
+        set_committed_value(product, "current_stock", new_level)
+        set_committed_value(product, "reserved_stock", new_reserved)
+        # 会话中已加载的产品对象同步为新库存，避免后续读取到旧值
+
+    if warehouse_id is not None:
+        adjust_warehouse_stock(db, product_id, warehouse_id, delta)
+
+    return new_level
+
+
+def adjust_warehouse_stock(db: Session, product_id: int, warehouse_id: int, delta: float):
+    """
+    原子调整仓库库存余额
+
+    先尝试带条件的UPDATE，没有命中时:
+        - 出库: 该仓库库存不足（或没有余额行），抛出InsufficientStock
+        - 入库: 插入余额行，并发插入同一行导致唯一约束冲突时回滚保存点并重新UPDATE
+    一般通过adjust_stock(..., warehouse_id=...)调用，与产品总库存一起修改
+    """
+    criteria = (
+        WarehouseStock.product_id == product_id,
+        WarehouseStock.warehouse_id == warehouse_id,
+    )
+    statement = update(WarehouseStock).where(*criteria)
+    if delta < 0:
+        statement = statement.where(WarehouseStock.quantity >= -delta)
+    statement = statement.values(quantity=WarehouseStock.quantity + delta)
+    options = {"synchronize_session": False}
+
+    if db.execute(statement, execution_options=options).rowcount:
+        return
+
+    if delta < 0:
+        available = db.scalar(select(WarehouseStock.quantity).where(*criteria))
+        raise InsufficientStock(product_id, delta, available or 0)
+
+    try:
+        with db.begin_nested():
+            db.execute(insert(WarehouseStock).values(
+                product_id=product_id,
+                warehouse_id=warehouse_id,
+                quantity=delta
+            ))
+    except IntegrityError:
+        if not db.execute(statement, execution_options=options).rowcount:
+            raise
+
+
+def get_warehouse_stock(db: Session, product_id: int, warehouse_id: int) -> float:
+    """按唯一索引读取产品在指定仓库的库存，没有余额行时为0"""
+    quantity = db.scalar(select(WarehouseStock.quantity).where(
+        WarehouseStock.product_id == product_id,
+        WarehouseStock.warehouse_id == warehouse_id
+    ))
+    return quantity or 0
+
+
+def available_stock():
+    """可用库存的SQL表达式: current_stock - reserved_stock"""
+    return (Product.current_stock - Product.reserved_stock).label("available_stock")
+
+
+def reserve_sales_order(db: Session, sales_order_id: int) -> int:
+    """
+    为销售订单预留库存，返回预留的产品数
+
+    一条查询按产品汇总订单明细数量（明细通过产品编码关联产品），再按产品ID顺序逐个执行带条件的UPDATE:
+        UPDATE products SET reserved_stock = reserved_stock + :q
+        WHERE id = :id AND current_stock - reserved_stock >= :q
+    可用库存不足时抛出InsufficientStock（available为当时的可用库存），调用方回滚事务，已预留的产品一并撤销
+    固定的加锁顺序避免并发审批之间死锁；没有产品编码或编码不存在的明细不预留，与创建订单时的库存检查一致
+    预留行批量写入stock_reservations，调用方负责commit
+    """
+    lines = db.execute(
+        select(Product.id, func.sum(SalesOrderItem.quantity))
+        .join(Product, Product.code == SalesOrderItem.product_code)
+        .where(SalesOrderItem.sales_order_id == sales_order_id)
+        .group_by(Product.id)
+        .order_by(Product.id)
+    ).all()
+    options = {"synchronize_session": False}
+    for product_id, quantity in lines:
+        updated = db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.current_stock - Product.reserved_stock >= quantity)
+            .values(reserved_stock=Product.reserved_stock + quantity),
+            execution_options=options
+        ).rowcount
+        if not updated:
+            available = db.scalar(select(available_stock()).where(Product.id == product_id))
+            raise InsufficientStock(product_id, -quantity, available)
+
+    if lines:
+        db.execute(insert(StockReservation), [
+            {"sales_order_id": sales_order_id, "product_id": product_id, "quantity": quantity, "status": "active"}
+            for product_id, quantity in lines
+        ])
+    return len(lines)
+
+
+_EXECUTEMANY_OPTIONS = {"synchronize_session": False, "dml_strategy": "core_only"}
+# ORM update配合参数列表执行executemany：按语句中的WHERE条件逐行更新（不按主键批量更新），
+# 保留映射类，提交后products表的版本号照常更新，依赖产品数据的缓存随之失效
+
+
+def release_sales_order(db: Session, sales_order_id: int) -> int:
+    """
+    释放销售订单的全部有效预留，返回释放的产品数
+
+    一条executemany UPDATE扣减各产品的reserved_stock，预留行标记为released，调用方负责commit
+    """
+    reservations = db.execute(
+        select(StockReservation.product_id, StockReservation.quantity).where(
+            StockReservation.sales_order_id == sales_order_id,
+            StockReservation.status == "active"
+        ).order_by(StockReservation.product_id)
+    ).all()
+    if not reservations:
+        return 0
+
+    db.execute(
+        update(Product).where(Product.id == bindparam("pid"))
+        .values(reserved_stock=Product.reserved_stock - bindparam("quantity")),
+        [{"pid": product_id, "quantity": quantity} for product_id, quantity in reservations],
+        execution_options=_EXECUTEMANY_OPTIONS
+    )
+    db.execute(
+        update(StockReservation).where(
+            StockReservation.sales_order_id == sales_order_id,
+            StockReservation.status == "active"
+        ).values(status="released"),
+        execution_options={"synchronize_session": False}
+    )
+    return len(reservations)
+
+
+RESERVATION_EPSILON = 1e-9
+# 分批发货时浮点数累减的误差，剩余预留不超过该值视为已全部消耗
+
+
+def consume_reservation(db: Session, sales_order_code: Optional[str], product_id: int, quantity: float) -> float:
+    """
+    按销售订单发货出库时消耗该订单对该产品的有效预留，返回消耗的数量（没有预留时为0）
+
+    消耗数量为min(剩余预留, 出库数量)，预留行扣减数量，全部消耗后标记为consumed
+    带条件的UPDATE防止同一订单的并发发货重复消耗同一预留，被并发消耗时返回0（出库按可用库存检查）
+    返回值传给adjust_stock的reserved，与产品的reserved_stock在同一事务中扣减，调用方负责commit
+    """
+    if not sales_order_code:
+        return 0
+    reservation = db.execute(
+        select(StockReservation.id, StockReservation.quantity)
+        .join(SalesOrder, SalesOrder.id == StockReservation.sales_order_id)
+        .where(
+            SalesOrder.code == sales_order_code,
+            StockReservation.product_id == product_id,
+            StockReservation.status == "active"
+        )
+    ).first()
+    if reservation is None:
+        return 0
+    consumed = min(reservation.quantity, quantity)
+    if not _consume_reservations(db, [{"rid": reservation.id, "consumed": consumed}]):
+        return 0
+    return consumed
+
+
+def _consume_reservations(db: Session, params: List[dict]) -> bool:
+    """
+    一条executemany UPDATE扣减预留行的数量，剩余为0的标记为consumed
+
+    params为[{"rid": 预留行ID, "consumed": 消耗数量}]，全部命中时返回True
+    """
+    table = StockReservation.__table__
+    remaining = table.c.quantity - bindparam("consumed")
+    result = db.execute(
+        update(table).where(
+            table.c.id == bindparam("rid"),
+            table.c.status == "active",
+            table.c.quantity >= bindparam("consumed") - RESERVATION_EPSILON
+        ).ordered_values(
+            (table.c.status, case((remaining <= RESERVATION_EPSILON, "consumed"), else_=table.c.status)),
+            (table.c.quantity, remaining),
+        ),
+        params
+    )
+    # MySQL按顺序执行SET，status须在quantity之前用原数量计算
+    if len(params) > 1 and not db.get_bind().dialect.supports_sane_multi_rowcount:
+        return True
+    return result.rowcount == len(params)
+
+
+class BatchResult(NamedTuple):
+    """批量库存记录的处理结果，errors为[{"index": 行号, "detail": 原因}]"""
+    total: int
+    created: int
+    errors: List[dict]
+
+
+# IN列表分块大小，避免超过数据库的绑定参数数量上限
+_IN_CHUNK = 900
+
+
+def _chunks(values, size: int = _IN_CHUNK):
+    """把任意可迭代对象切成长度不超过size的列表，不需要一次读入全部数据"""
+    iterator = iter(values)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _load_balances(db: Session, product_ids: list, pairs: set) -> Tuple[Dict[int, float], Dict[tuple, float]]:
+    """按IN列表一次读取产品可用库存（总库存 - 已预留）和相关（产品, 仓库）的库存余额"""
+    stocks: Dict[int, float] = {}
+    balances: Dict[tuple, float] = {}
+    for chunk in _chunks(product_ids):
+        stocks.update(db.execute(
+            select(Product.id, available_stock()).where(Product.id.in_(chunk))
+        ).all())
+        rows = db.execute(select(
+            WarehouseStock.product_id, WarehouseStock.warehouse_id, WarehouseStock.quantity
+        ).where(WarehouseStock.product_id.in_(chunk))).all()
+        balances.update(((pid, wid), qty) for pid, wid, qty in rows if (pid, wid) in pairs)
+    return stocks, balances
+
+
+def _apply_product_deltas(db: Session, deltas: Dict[int, float], consumed: Dict[int, float]):
+    """
+    一条executemany UPDATE按产品应用净变化量并扣减消耗的预留，条件与adjust_stock相同
+
+    净出库的产品要求可用库存充足；命中行数少于产品数说明加载之后库存被并发扣减或预留，抛出InsufficientStock
+    驱动不能返回executemany的准确行数时逐个调用adjust_stock
+    """
+    params = [
+        {"pid": pid, "delta": deltas.get(pid, 0), "reserved": consumed.get(pid, 0)}
+        for pid in sorted(set(deltas) | set(consumed)) if deltas.get(pid) or consumed.get(pid)
+    ]
+    if not params:
+        return
+    if not db.get_bind().dialect.supports_sane_multi_rowcount:
+        for p in params:
+            adjust_stock(db, p["pid"], p["delta"], reserved=p["reserved"])
+        return
+    statement = update(Product).where(
+        Product.id == bindparam("pid"),
+        or_(
+            bindparam("delta") >= 0,
+            Product.current_stock - Product.reserved_stock >= -bindparam("delta") - bindparam("reserved")
+        )
+    ).values(
+        current_stock=Product.current_stock + bindparam("delta"),
+        reserved_stock=Product.reserved_stock - bindparam("reserved")
+    )
+    if db.execute(statement, params, execution_options=_EXECUTEMANY_OPTIONS).rowcount != len(params):
+        raise InsufficientStock(params[0]["pid"], params[0]["delta"])
+
+
+def _apply_warehouse_deltas(db: Session, deltas: Dict[tuple, float], existing: set):
+    """
+    按（产品, 仓库）应用净变化量
+
+    加载时已有余额行的用一条executemany UPDATE，没有余额行的（净入库）批量INSERT
+    并发插入了同一行导致唯一约束冲突时，回滚保存点后逐行调用adjust_warehouse_stock
+    """
+    updates = [
+        {"pid": pid, "wid": wid, "delta": delta}
+        for (pid, wid), delta in deltas.items() if delta and (pid, wid) in existing
+    ]
+    inserts = [
+        {"product_id": pid, "warehouse_id": wid, "quantity": delta}
+        for (pid, wid), delta in deltas.items() if delta and (pid, wid) not in existing
+    ]
+    if updates:
+        if db.get_bind().dialect.supports_sane_multi_rowcount:
+            table = WarehouseStock.__table__
+            statement = update(table).where(
+                table.c.product_id == bindparam("pid"),
+                table.c.warehouse_id == bindparam("wid"),
+                table.c.quantity + bindparam("delta") >= 0
+            ).values(quantity=table.c.quantity + bindparam("delta"))
+            if db.execute(statement, updates).rowcount != len(updates):
+                raise InsufficientStock(updates[0]["pid"], updates[0]["delta"])
+        else:
+            for p in updates:
+                adjust_warehouse_stock(db, p["pid"], p["wid"], p["delta"])
+    if inserts:
+        try:
+            with db.begin_nested():
+                db.execute(insert(WarehouseStock), inserts)
+        except IntegrityError:
+            for row in inserts:
+                adjust_warehouse_stock(db, row["product_id"], row["warehouse_id"], row["quantity"])
+
+
+def _load_sale_reservations(db: Session, records: list) -> Dict[tuple, list]:
+    """读取批次中销售发货出库涉及的有效预留，返回{(销售单号, 产品ID): [预留行ID, 剩余数量]}"""
+    keys = {
+        (r.reference_code, r.product_id) for r in records
+        if r.type == "out" and r.reference_type == "sale" and r.reference_code
+    }
+    reservations: Dict[tuple, list] = {}
+    for chunk in _chunks(sorted({code for code, _ in keys})):
+        rows = db.execute(
+            select(SalesOrder.code, StockReservation.product_id, StockReservation.id, StockReservation.quantity)
+            .join(SalesOrder, SalesOrder.id == StockReservation.sales_order_id)
+            .where(SalesOrder.code.in_(chunk), StockReservation.status == "active")
+        ).all()
+        reservations.update(((code, pid), [rid, qty]) for code, pid, rid, qty in rows if (code, pid) in keys)
+    return reservations
+
+
+def create_stock_records_batch(db: Session, records: list, operator_id: Optional[int] = None) -> BatchResult:
+    """
+    批量创建库存记录
+
+    1. 用IN查询一次加载涉及的产品可用库存、仓库、仓库库存余额和销售发货对应的预留
+    2. 按提交顺序逐行校验并在内存中模拟库存变化，记录每行的错误，出错的行不影响其他行；
+       出库要求可用库存充足，销售发货（reference_type为sale）先消耗本订单的预留，规则与单条接口相同
+    3. 按产品和（产品, 仓库）汇总净变化量，用executemany的带条件UPDATE一次应用，新的余额行批量INSERT，
+       消耗的预留同样一次UPDATE
+    4. 一次预留全部编码，批量INSERT库存记录
+
+    records为StockRecordCreate列表，调用方负责commit
+    加载之后库存或预留被并发修改导致不足时抛出InsufficientStock，调用方需要回滚整个批次
+    """
+    product_ids = sorted({r.product_id for r in records})
+    warehouse_ids = sorted({r.warehouse_id for r in records})
+    pairs = {(r.product_id, r.warehouse_id) for r in records}
+
+    stocks, balances = _load_balances(db, product_ids, pairs)
+    existing = set(balances)
+    warehouses = set()
+    for chunk in _chunks(warehouse_ids):
+        warehouses.update(db.scalars(select(Warehouse.id).where(Warehouse.id.in_(chunk))))
+    reservations = _load_sale_reservations(db, records)
+
+    errors = []
+    accepted = []
+    product_deltas: Dict[int, float] = defaultdict(float)
+    warehouse_deltas: Dict[tuple, float] = defaultdict(float)
+    consumed: Dict[int, float] = defaultdict(float)
+    consumed_rows: Dict[int, float] = defaultdict(float)
+    for index, record in enumerate(records):
+        if record.product_id not in stocks:
+            errors.append({"index": index, "detail": "Product not found"})
+            continue
+        if record.warehouse_id not in warehouses:
+            errors.append({"index": index, "detail": "Warehouse not found"})
+            continue
+        delta = {"in": record.quantity, "out": -record.quantity}.get(record.type)
+        if delta is not None:
+            key = (record.product_id, record.warehouse_id)
+            reservation = reservations.get((record.reference_code, record.product_id)) \
+                if record.type == "out" and record.reference_type == "sale" else None
+            reserved = min(reservation[1], record.quantity) if reservation else 0
+            if delta < 0 and (
+                stocks[record.product_id] + reserved < -delta or balances.get(key, 0) < -delta
+            ):
+                errors.append({"index": index, "detail": "Insufficient stock"})
+                continue
+            stocks[record.product_id] += delta + reserved
+            balances[key] = balances.get(key, 0) + delta
+            product_deltas[record.product_id] += delta
+            warehouse_deltas[key] += delta
+            if reserved:
+                reservation[1] -= reserved
+                consumed[record.product_id] += reserved
+                consumed_rows[reservation[0]] += reserved
+        accepted.append(record)
+
+    if not accepted:
+        return BatchResult(len(records), 0, errors)
+
+    from app.services.codes import code_allocator
+    codes = code_allocator.next_codes("SR", len(accepted))
+    # 先预留编码再修改库存，与单条接口一致
+
+    if consumed_rows and not _consume_reservations(
+        db, [{"rid": rid, "consumed": quantity} for rid, quantity in sorted(consumed_rows.items())]
+    ):
+        raise InsufficientStock(None, None)
+    _apply_product_deltas(db, product_deltas, consumed)
+    _apply_warehouse_deltas(db, warehouse_deltas, existing)
+
+    rows = [
+        dict(record.model_dump(), code=code, operator_id=operator_id, amount=record.quantity * record.unit_price)
+        for code, record in zip(codes, accepted)
+    ]
+    db.execute(insert(StockRecord), rows)
+    return BatchResult(len(records), len(accepted), errors)
+
+
+def insert_stock_check_items(db: Session, stock_check_id: int, warehouse_id: int, items: Iterable[dict]) -> int:
+    """
+    批量写入盘点明细，返回写入的行数
+
+    items为字典的可迭代对象，包含product_id或product_code、book_quantity、actual_quantity、remark
+    按块处理，每块用一次IN查询解析产品、一次查询读取该仓库的库存余额，再一条executemany INSERT写入
+    items可以是逐行解析上传文件的生成器，内存占用与块大小有关，与明细总数无关
+    账面数量为空时使用产品在该仓库的库存余额，差异 = 实际数量 - 账面数量；产品不存在的明细跳过
+    """
+    count = 0
+    for chunk in _chunks(items):
+        ids = {item["product_id"] for item in chunk if item.get("product_id") is not None}
+        codes = {item["product_code"] for item in chunk if item.get("product_id") is None and item.get("product_code")}
+        conditions = []
+        if ids:
+            conditions.append(Product.id.in_(ids))
+        if codes:
+            conditions.append(Product.code.in_(codes))
+        if not conditions:
+            continue
+        products = db.execute(select(Product.id, Product.code).where(or_(*conditions))).all()
+        known_ids = {product_id for product_id, _ in products}
+        by_code = {code: product_id for product_id, code in products}
+        balances = dict(db.execute(
+            select(WarehouseStock.product_id, WarehouseStock.quantity).where(
+                WarehouseStock.warehouse_id == warehouse_id,
+                WarehouseStock.product_id.in_(known_ids)
+            )
+        ).all()) if known_ids else {}
+
+        rows = []
+        for item in chunk:
+            product_id = item.get("product_id")
+            product_id = product_id if product_id in known_ids else by_code.get(item.get("product_code"))
+            if product_id is None:
+                continue
+            book_quantity = item.get("book_quantity")
+            if book_quantity is None:
+                book_quantity = balances.get(product_id, 0)
+            actual_quantity = item.get("actual_quantity")
+            rows.append({
+                "stock_check_id": stock_check_id,
+                "product_id": product_id,
+                "book_quantity": book_quantity,
+                "actual_quantity": actual_quantity,
+                "diff_quantity": (actual_quantity or 0) - (book_quantity or 0),
+                "remark": item.get("remark"),
+            })
+        if rows:
+            db.execute(insert(StockCheckItem), rows)
+            count += len(rows)
+    return count
+
+
+def read_count_sheet(file: BinaryIO) -> Iterator[dict]:
+    """
+    逐行解析CSV盘点表，生成insert_stock_check_items使用的字典
+
+    表头需要包含product_id或product_code之一，以及actual_quantity；book_quantity、remark可选
+    支持带BOM的UTF-8（Excel导出）；格式错误时抛出ValueError，消息中包含行号
+    """
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    columns = set(reader.fieldnames or ())
+    if "actual_quantity" not in columns or not columns & {"product_id", "product_code"}:
+        raise ValueError("Count sheet requires product_id or product_code and actual_quantity columns")
+
+    def number(value, cast):
+        value = (value or "").strip()
+        return cast(value) if value else None
+
+    for row in reader:
+        try:
+            yield {
+                "product_id": number(row.get("product_id"), int),
+                "product_code": (row.get("product_code") or "").strip() or None,
+                "book_quantity": number(row.get("book_quantity"), float),
+                "actual_quantity": number(row.get("actual_quantity"), float),
+                "remark": row.get("remark") or None,
+            }
+        except ValueError:
+            raise ValueError(f"Invalid number on line {reader.line_num}")
+
+
+def apply_stock_check(db: Session, stock_check_id: int, warehouse_id: int) -> int:
+    """
+    按盘点差异调整产品库存和盘点仓库的库存余额，返回调整的产品数
+
+    差异按产品汇总成子查询，产品库存和已有的仓库余额各用一条UPDATE ... FROM（MySQL为多表UPDATE）完成，
+    没有余额行的盘盈用一条INSERT ... SELECT补齐；明细数量不影响语句条数
+    先检查盘亏是否超过产品库存或仓库余额，不足时抛出InsufficientStock，不做任何修改
+    更新带有同样的条件，命中行数不符（检查之后库存被并发修改）时同样抛出，调用方需要回滚事务
+    产品不存在的明细跳过，调用方负责commit
+    """
+    diffs = select(
+        StockCheckItem.product_id,
+        func.sum(StockCheckItem.diff_quantity).label("diff")
+    ).where(
+        StockCheckItem.stock_check_id == stock_check_id,
+        StockCheckItem.diff_quantity != 0
+    ).group_by(StockCheckItem.product_id).subquery()
+    balance = and_(WarehouseStock.product_id == diffs.c.product_id, WarehouseStock.warehouse_id == warehouse_id)
+    options = {"synchronize_session": False}
+
+    shortage = db.execute(
+        select(diffs.c.product_id, diffs.c.diff, func.coalesce(WarehouseStock.quantity, 0))
+        .join(Product, Product.id == diffs.c.product_id)
+        .outerjoin(WarehouseStock, balance)
+        .where(diffs.c.diff < 0, or_(
+            Product.current_stock + diffs.c.diff < 0,
+            func.coalesce(WarehouseStock.quantity, 0) + diffs.c.diff < 0
+        )).limit(1)
+    ).first()
+    if shortage:
+        raise InsufficientStock(*shortage)
+
+    expected = db.scalar(select(func.count()).select_from(diffs).join(Product, Product.id == diffs.c.product_id))
+    updated = db.execute(
+        update(Product)
+        .where(Product.id == diffs.c.product_id, Product.current_stock + diffs.c.diff >= 0)
+        .values(current_stock=Product.current_stock + diffs.c.diff),
+        execution_options=options
+    ).rowcount
+    if updated != expected:
+        raise InsufficientStock(None, None)
+
+    expected_balances = db.scalar(select(func.count()).select_from(diffs).join(WarehouseStock, balance))
+    updated = db.execute(
+        update(WarehouseStock)
+        .where(balance, WarehouseStock.quantity + diffs.c.diff >= 0)
+        .values(quantity=WarehouseStock.quantity + diffs.c.diff),
+        execution_options=options
+    ).rowcount
+    if updated != expected_balances:
+        raise InsufficientStock(None, None)
+
+    db.execute(insert(WarehouseStock).from_select(
+        ["product_id", "warehouse_id", "quantity", "created_at", "updated_at"],
+        select(
+            diffs.c.product_id,
+            literal(warehouse_id),
+            diffs.c.diff,
+            func.current_timestamp(),
+            func.current_timestamp(),
+        ).join(Product, Product.id == diffs.c.product_id).where(
+            diffs.c.diff > 0,
+            ~exists().where(balance)
+        )
+    ))
+    return expected
+
+
+def rebuild_warehouse_stock(db: Session) -> int:
+    """
+    根据库存台账全量重建仓库库存余额表
+
+    余额 = 入库记录数量 - 出库记录数量 + 已完成盘点的差异数量，按（产品, 仓库）汇总
+    用一条INSERT ... SELECT ... GROUP BY完成，返回重建后的行数
+    用于首次上线、数据修复或直接改库之后
+    """
+    records = select(
+        StockRecord.product_id,
+        StockRecord.warehouse_id,
+        case((StockRecord.type == "out", -StockRecord.quantity), else_=StockRecord.quantity).label("quantity"),
+    ).where(StockRecord.type.in_(("in", "out")))
+    checks = select(
+        StockCheckItem.product_id,
+        StockCheck.warehouse_id,
+        StockCheckItem.diff_quantity.label("quantity"),
+    ).join(StockCheck, StockCheck.id == StockCheckItem.stock_check_id).where(
+        StockCheck.status == "completed",
+        StockCheckItem.diff_quantity.isnot(None)
+    )
+    movements = union_all(records, checks).subquery()
+    source = select(
+        movements.c.product_id,
+        movements.c.warehouse_id,
+        func.sum(movements.c.quantity),
+        func.current_timestamp(),
+        func.current_timestamp(),
+    ).group_by(movements.c.product_id, movements.c.warehouse_id)
+
+    db.query(WarehouseStock).delete(synchronize_session=False)
+    db.execute(insert(WarehouseStock).from_select(
+        ["product_id", "warehouse_id", "quantity", "created_at", "updated_at"],
+        source
+    ))
+    count = db.query(func.count(WarehouseStock.id)).scalar()
+    db.commit()
+    return count
@@ -1,18 +1,20 @@
-import random
-import string
+import base64
 from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import func, or_, select
 
 
 def generate_code(prefix: str) -> str:
     """
     生成业务编码
     
-    编码格式：前缀 + 日期(YYYYMMDD) + 4位随机数字
-    例如：PO202602140123
+    编码格式：前缀 + 日期(YYYYMMDD) + 6位当日序号
+    例如：PO20260214000123
+    序号由数据库序列按块分配，多个工作进程之间不会重复，同一进程内单调递增
     """
-    timestamp = datetime.now().strftime("%Y%m%d")
-    random_str = ''.join(random.choices(string.digits, k=4))
-    return f"{prefix}{timestamp}{random_str}"
+    from app.services.codes import code_allocator
+    return code_allocator.next_code(prefix)
 
 
 def generate_code_with_date(prefix: str) -> str:
@@ -25,13 +27,102 @@ def generate_code_with_date(prefix: str) -> str:
     return generate_code(prefix)
 
 
-def paginate(query, skip: int = 0, limit: int = 100):
+class Page(NamedTuple):
+    """
+    分页结果
+
+    total: 符合条件的总数，with_total=False时为None
+    items: 当前页数据
+    next_cursor: 下一页游标，没有更多数据或查询不支持游标分页时为None
+    """
+    total: Optional[int]
+    items: list
+    next_cursor: Optional[str]
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """把(created_at, id)编码为不透明的游标字符串"""
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析encode_cursor生成的游标，格式错误时返回400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _page_statement(query, skip: int, limit: int, cursor_model=None, cursor: Optional[str] = None):
+    """
+    构建分页语句
+
+    指定cursor_model时按(created_at, id)倒序排列，并多取一行用于判断是否还有下一页
+    传入cursor时从游标位置继续读取，忽略skip
+    """
+    if cursor_model is None:
+        return query.offset(skip).limit(limit)
+
+    statement = query.order_by(None).order_by(
+        cursor_model.created_at.desc(), cursor_model.id.desc()
+    )
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        statement = statement.where(
+            cursor_model.created_at <= created_at,
+            or_(cursor_model.created_at < created_at, cursor_model.id < id)
+        )
+        # created_at <= 游标值 作为索引范围条件，数据库可以直接从游标位置开始扫描索引
+    else:
+        statement = statement.offset(skip)
+    return statement.limit(limit + 1)
+
+
+def _count_statement(query):
+    return select(func.count()).select_from(query.order_by(None).subquery())
+
+
+def _to_page(total, items, limit: int, cursor_model=None) -> Page:
+    next_cursor = None
+    if cursor_model is not None and len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return Page(total, items, next_cursor)
+
+
+def paginate(db, query, skip: int = 0, limit: int = 100, cursor_model=None, cursor: Optional[str] = None, with_total: bool = True, columns=None) -> Page:
     """
     分页查询
-    
-    对SQLAlchemy查询进行分页处理
-    返回总数和分页后的数据列表
+
+    支持两种模式:
+        - 偏移分页: skip/limit，适合跳页浏览
+        - 游标分页: 指定cursor_model后按(created_at, id)倒序，传入上一页返回的next_cursor读取下一页
+          使用(created_at, id)索引定位，翻到多深都只读取一页数据
+    with_total=False时不执行COUNT查询，total返回None
+
+    参数:
+        query: select()语句，包含筛选条件
+        cursor_model: 含created_at和id字段的模型，为None时只支持偏移分页
+        columns: 只查询这些列，items为查询行而不是ORM对象；游标分页时须包含created_at和id
     """
-    total = query.count()
-    items = query.offset(skip).limit(limit).all()
-    return total, items
+    total = db.scalar(_count_statement(query)) if with_total else None
+    statement = _page_statement(query, skip, limit, cursor_model, cursor)
+    if columns is not None:
+        items = db.execute(statement.with_only_columns(*columns)).all()
+    else:
+        items = db.scalars(statement).all()
+    return _to_page(total, items, limit, cursor_model)
+
+
+async def paginate_async(db, query, skip: int = 0, limit: int = 100, cursor_model=None, cursor: Optional[str] = None, with_total: bool = True, columns=None) -> Page:
+    """paginate的异步会话版本，参数和返回值相同"""
+    total = await db.scalar(_count_statement(query)) if with_total else None
+    statement = _page_statement(query, skip, limit, cursor_model, cursor)
+    if columns is not None:
+        items = (await db.execute(statement.with_only_columns(*columns))).all()
+    else:
+        items = (await db.scalars(statement)).all()
+    return _to_page(total, items, limit, cursor_model)
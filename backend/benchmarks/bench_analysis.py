@@ -0,0 +1,85 @@
+"""
+/analysis 汇总统计基准测试
+
+对比旧实现（query.all()后在Python中求和，再执行两次count）
+与summarize_orders（一次分组SQL）的语句数、取回行数和耗时
+
+运行: python -m benchmarks.bench_analysis --rows 200000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import SessionLocal, QueryCounter, reset_database, timer, print_table
+from sqlalchemy import insert
+from app.models import Supplier, PurchaseOrder
+from app.services.aggregates import date_range_criteria, summarize_orders, status_count
+
+
+def seed(rows: int):
+    reset_database()
+    db = SessionLocal()
+    db.execute(insert(Supplier), [{"code": f"S{i:04d}", "name": f"供应商{i}"} for i in range(50)])
+    now = datetime.utcnow()
+    statuses = ["pending", "approved", "completed", "cancelled"]
+    batch = []
+    for i in range(rows):
+        created = now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        batch.append({
+            "code": f"PO{i:010d}",
+            "supplier_id": random.randint(1, 50),
+            "total_amount": round(random.uniform(100, 100000), 2),
+            "status": random.choice(statuses),
+            "created_at": created,
+            "updated_at": created,
+        })
+        if len(batch) >= 10000:
+            db.execute(insert(PurchaseOrder), batch)
+            batch = []
+    if batch:
+        db.execute(insert(PurchaseOrder), batch)
+    db.commit()
+    db.close()
+
+
+def legacy(db, criteria):
+    query = db.query(PurchaseOrder).filter(*criteria)
+    orders = query.all()
+    month_orders = query.count()
+    month_total = sum([po.total_amount or 0 for po in orders])
+    pending = query.filter(PurchaseOrder.status == "pending").count()
+    return len(orders) + 2, (month_orders, month_total, pending)
+
+
+def aggregated(db, criteria):
+    summary = summarize_orders(db, PurchaseOrder, PurchaseOrder.total_amount, *criteria)
+    return len(summary["by_status"]), (summary["count"], summary["total"], status_count(summary, "pending"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=30, help="统计最近N天")
+    args = parser.parse_args()
+
+    random.seed(42)
+    seed(args.rows)
+    criteria = date_range_criteria(PurchaseOrder.created_at, datetime.utcnow() - timedelta(days=args.days))
+
+    results = []
+    for name, fn in (("legacy", legacy), ("summarize_orders", aggregated)):
+        db = SessionLocal()
+        result = {"impl": name}
+        with QueryCounter() as counter, timer(result):
+            fetched, values = fn(db, criteria)
+        result.update(statements=counter.statements, rows_fetched=fetched,
+                      count=values[0], total=round(values[1], 2), pending=values[2])
+        results.append(result)
+        db.close()
+
+    print(f"purchase_orders={args.rows}, window={args.days}d")
+    print_table(results, ["impl", "statements", "rows_fetched", "ms", "count", "total", "pending"])
+
+
+if __name__ == "__main__":
+    main()
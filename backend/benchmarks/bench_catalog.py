@@ -0,0 +1,130 @@
+"""
+产品目录缓存基准测试
+
+生成大量产品后比较
+- 内存: 列式目录（array + list）与按ID、编码两个dict保存ProductInfo元组的占用（tracemalloc）
+- 预热: 全量加载耗时
+- 查询: 随机读取一批产品，按ID查询数据库与读取目录（含按编码读取）
+
+检查项: 目录读取结果与数据库一致；失效后读取到修改后的数据
+
+运行: python -m benchmarks.bench_catalog --rows 1000000
+"""
+import argparse
+import random
+import tracemalloc
+
+from benchmarks.common import SessionLocal, reset_database, QueryCounter, timer, print_table
+from sqlalchemy import insert, select, update
+from app.models import Product
+from app.services.catalog import ProductCatalog, ProductInfo, LocalChannel
+
+COLUMNS = (Product.id, Product.code, Product.name, Product.unit, Product.specification,
+           Product.purchase_price, Product.sale_price)
+
+
+def seed(rows: int):
+    reset_database()
+    db = SessionLocal()
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "code": f"P{i:07d}",
+            "name": f"热轧钢板{i}",
+            "unit": "吨",
+            "specification": f"Q235 {i % 30 + 1}*1500",
+            "purchase_price": float(i % 5000),
+            "sale_price": float(i % 5000) * 1.2,
+        })
+        if len(batch) >= 20000:
+            db.execute(insert(Product), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Product), batch)
+    db.commit()
+    db.close()
+
+
+def measure(build) -> tuple:
+    """返回(构建结果, 占用内存MB)"""
+    tracemalloc.start()
+    value = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, round(current / 1024 / 1024, 1)
+
+
+def dict_catalog(db) -> tuple:
+    by_id, by_code = {}, {}
+    for row in db.execute(select(*COLUMNS).execution_options(yield_per=50000)):
+        info = ProductInfo(*row)
+        by_id[info.id] = info
+        by_code[info.code] = info
+    return by_id, by_code
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    seed(args.rows)
+    db = SessionLocal()
+    ids = random.sample(range(1, args.rows + 1), args.lookups)
+    codes = [f"P{i - 1:07d}" for i in ids]
+
+    load = {"impl": "dict"}
+    with timer(load, "load_ms"):
+        (by_id, by_code), load["memory_mb"] = measure(lambda: dict_catalog(db))
+    del by_id, by_code
+
+    catalog = ProductCatalog(LocalChannel())
+    columnar = {"impl": "catalog"}
+    with timer(columnar, "load_ms"):
+        _, columnar["memory_mb"] = measure(lambda: catalog.load(db))
+    print(f"products={args.rows}")
+    print_table([load, columnar], ["impl", "load_ms", "memory_mb"])
+
+    results = []
+    expected = {}
+    result = {"impl": "database"}
+    with QueryCounter() as counter, timer(result, "ms"):
+        for product_id in ids:
+            expected[product_id] = ProductInfo(*db.execute(select(*COLUMNS).where(Product.id == product_id)).one())
+    result["statements"] = counter.statements
+    results.append(result)
+
+    result = {"impl": "catalog.get"}
+    with QueryCounter() as counter, timer(result, "ms"):
+        found = {product_id: catalog.get(db, product_id) for product_id in ids}
+    result["statements"] = counter.statements
+    results.append(result)
+    assert found == expected, "catalog differs from database"
+
+    result = {"impl": "catalog.get_by_code"}
+    with QueryCounter() as counter, timer(result, "ms"):
+        for code in codes:
+            catalog.get_by_code(db, code)
+    result["statements"] = counter.statements
+    results.append(result)
+
+    changed = ids[: args.lookups // 10]
+    db.execute(update(Product).where(Product.id.in_(changed)).values(name="已修改"))
+    db.commit()
+    catalog.invalidate(*changed)
+    result = {"impl": "catalog.get_many(10% invalidated)"}
+    with QueryCounter() as counter, timer(result, "ms"):
+        found = catalog.get_many(db, ids=ids)
+    result["statements"] = counter.statements
+    results.append(result)
+    assert all(found[product_id].name == "已修改" for product_id in changed), "stale entry after invalidate"
+    db.close()
+
+    print(f"lookups={args.lookups}")
+    print_table(results, ["impl", "statements", "ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+库存分析基准测试
+
+生成大量产品后，对比库存状态报表（分类计数、库存总价值、前10个低库存产品）的耗时
+- legacy: 加载全部Product对象，列表推导式分类，逐个访问p.category（旧实现）
+- snapshot(cold): 一次列查询读入NumPy数组后向量化计算（缓存未命中）
+- snapshot(cached): 复用按数据版本缓存的快照，只做向量化计算和低库存明细查询
+
+检查项: 三种方式的计数、总价值和低库存产品一致
+
+运行: python -m benchmarks.bench_inventory_snapshot --rows 1000000
+"""
+import argparse
+import random
+
+from benchmarks.common import SessionLocal, reset_database, QueryCounter, timer, print_table
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+from app.models import Product, ProductCategory
+from app.services.inventory_snapshot import (
+    get_inventory_snapshot, load_inventory_snapshot, summarize_inventory, low_stock_products
+)
+
+
+def seed(rows: int):
+    reset_database()
+    db = SessionLocal()
+    db.execute(insert(ProductCategory), [{"code": f"C{i}", "name": f"分类{i}"} for i in range(20)])
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "code": f"P{i:07d}",
+            "name": f"产品{i}",
+            "category_id": random.choice((None, *range(1, 21))),
+            "current_stock": float(random.randint(0, 300)),
+            "min_stock": float(random.choice((0, 20, 50))),
+            "max_stock": float(random.choice((200, 250, 1000))),
+            "purchase_price": round(random.uniform(1, 100), 2),
+        })
+        if len(batch) >= 20000:
+            db.execute(insert(Product), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Product), batch)
+    db.commit()
+    db.close()
+
+
+def legacy(db) -> tuple:
+    products = db.query(Product).options(joinedload(Product.category)).all()
+    total_value = sum([(p.current_stock or 0) * (p.purchase_price or 0) for p in products])
+    low = [p for p in products if (p.current_stock or 0) < (p.min_stock or 0)]
+    over = [p for p in products if (p.current_stock or 0) > (p.max_stock or 0)]
+    details = [(p.code, p.category.name if p.category else "") for p in low[:10]]
+    return len(products), round(total_value, 2), len(low), len(over), details
+
+
+def vectorized(db, snapshot) -> tuple:
+    summary = summarize_inventory(snapshot)
+    details = [(p["code"], p["category"]) for p in low_stock_products(db, snapshot, summary.low_stock_index)]
+    return summary.total, round(summary.total_value, 2), summary.low_stock, summary.overstock, details
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    seed(args.rows)
+    results = []
+    outputs = []
+
+    for name, run in (
+        ("legacy", legacy),
+        ("snapshot(cold)", lambda db: vectorized(db, load_inventory_snapshot(db))),
+        ("snapshot(cached)", None),
+    ):
+        db = SessionLocal()
+        if run is None:
+            get_inventory_snapshot(db)
+            run = lambda db: vectorized(db, get_inventory_snapshot(db))  # noqa: E731
+        result = {"impl": name}
+        with QueryCounter() as counter, timer(result, "ms"):
+            outputs.append(run(db))
+        result["statements"] = counter.statements
+        results.append(result)
+        db.close()
+
+    assert outputs[0][2:] == outputs[1][2:] == outputs[2][2:], "classification differs"
+    assert all(abs(o[1] - outputs[0][1]) < 1e-6 * max(1, outputs[0][1]) for o in outputs), "total value differs"
+
+    print(f"products={args.rows}")
+    print_table(results, ["impl", "statements", "ms"])
+
+
+if __name__ == "__main__":
+    main()
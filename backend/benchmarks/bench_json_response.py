@@ -0,0 +1,145 @@
+"""
+列表接口JSON序列化基准测试
+
+对比每页数据从查询到输出JSON字节的CPU时间（time.process_time，SQLite在进程内执行，也计入查询本身，不含COUNT查询）:
+- orm+pydantic: 加载ORM对象，构建XxxListResponse，按响应模型序列化后用JSONResponse（标准库json）输出（原实现）
+- orm+pydantic+orjson: 同上，只把输出换成FastJSONResponse（只开启默认响应类的效果）
+- rows+orjson: fast_list_response的做法，只查询响应模型的列，用查询行构建字典后用orjson输出
+另外通过测试客户端调用接口，对比FAST_JSON_RESPONSES开关前后每个请求的CPU时间（包含认证、COUNT查询、路由等）
+
+检查项: 三种方式输出的JSON字节相同
+
+运行: python -m benchmarks.bench_json_response --rows 200000 --pages 100
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import SessionLocal, print_table
+from benchmarks.load_test import seed, ADMIN_PASSWORD
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from app.core.responses import FastJSONResponse, schema_columns, rows_to_dicts, orjson
+from app.models import Product, Customer, Supplier, SalesOrder, PurchaseOrder, StockRecord, Payment, Bill
+from app.schemas.inventory import ProductResponse, ProductListResponse, StockRecordResponse, StockRecordListResponse
+from app.schemas.sales import CustomerResponse, CustomerListResponse, SalesOrderResponse, SalesOrderListResponse
+from app.schemas.purchase import PurchaseOrderResponse, PurchaseOrderListResponse
+from app.schemas.supplier import SupplierResponse, SupplierListResponse
+from app.schemas.finance import PaymentResponse, PaymentListResponse, BillResponse, BillListResponse
+from app.utils.helpers import paginate
+
+ENDPOINTS = (
+    # (名称, 模型, 列表响应模型, 列表项响应模型, 是否游标分页, 接口路径)
+    ("products", Product, ProductListResponse, ProductResponse, False, "/api/v1/inventory/products/"),
+    ("customers", Customer, CustomerListResponse, CustomerResponse, False, "/api/v1/sales/customers/"),
+    ("suppliers", Supplier, SupplierListResponse, SupplierResponse, False, "/api/v1/suppliers/"),
+    ("sales_orders", SalesOrder, SalesOrderListResponse, SalesOrderResponse, True, "/api/v1/sales/sales-orders/"),
+    ("purchase_orders", PurchaseOrder, PurchaseOrderListResponse, PurchaseOrderResponse, True, "/api/v1/purchase/"),
+    ("stock_records", StockRecord, StockRecordListResponse, StockRecordResponse, True, "/api/v1/inventory/stock-records/"),
+    ("payments", Payment, PaymentListResponse, PaymentResponse, True, "/api/v1/finance/payments/"),
+    ("bills", Bill, BillListResponse, BillResponse, True, "/api/v1/finance/bills/"),
+)
+
+
+def orm_page(db, model, list_schema, cursor_model, total, skip, limit, response_class) -> bytes:
+    page = paginate(db, select(model), skip, limit, cursor_model=cursor_model, with_total=False)
+    fields = {"total": total, "items": page.items}
+    if cursor_model is not None:
+        fields["next_cursor"] = page.next_cursor
+    # 与FastAPI处理response_model的方式相同：校验后按JSON模式导出，再由响应类序列化
+    content = list_schema(**fields).model_dump(mode="json")
+    return response_class(content).body
+
+
+def rows_page(db, model, item_schema, cursor_model, total, skip, limit) -> bytes:
+    page = paginate(db, select(model), skip, limit, cursor_model=cursor_model, with_total=False,
+                    columns=schema_columns(model, item_schema))
+    content = {"total": total, "items": rows_to_dicts(page.items, tuple(item_schema.model_fields))}
+    if cursor_model is not None:
+        content["next_cursor"] = page.next_cursor
+    return FastJSONResponse(content).body
+
+
+def cpu_per_call(run, offsets) -> float:
+    """返回每次调用的平均CPU时间（毫秒）"""
+    start = time.process_time()
+    for skip in offsets:
+        run(skip)
+    return (time.process_time() - start) * 1000 / len(offsets)
+
+
+def bench_pages(limit: int, pages: int, total_rows: dict) -> list:
+    results = []
+    db = SessionLocal()
+    for name, model, list_schema, item_schema, cursor, _ in ENDPOINTS:
+        cursor_model = model if cursor else None
+        rng = random.Random(name)
+        total = total_rows[name]
+        offsets = [rng.randrange(max(1, total - limit)) for _ in range(pages)]
+        impls = {
+            "orm+pydantic": lambda skip: orm_page(db, model, list_schema, cursor_model, total, skip, limit, JSONResponse),
+            "orm+pydantic+orjson": lambda skip: orm_page(
+                db, model, list_schema, cursor_model, total, skip, limit, FastJSONResponse
+            ),
+            "rows+orjson": lambda skip: rows_page(db, model, item_schema, cursor_model, total, skip, limit),
+        }
+        outputs = {impl: run(offsets[0]) for impl, run in impls.items()}
+        assert len(set(outputs.values())) == 1, f"{name}: outputs differ"
+        result = {"endpoint": name}
+        for impl, run in impls.items():
+            db.expunge_all()
+            result[impl] = round(cpu_per_call(run, offsets), 3)
+        result["speedup"] = round(result["orm+pydantic"] / result["rows+orjson"], 2)
+        results.append(result)
+    db.close()
+    return results
+
+
+def bench_requests(limit: int, requests: int) -> list:
+    from fastapi.testclient import TestClient
+    from app.core.config import get_settings
+    from main import app
+
+    settings = get_settings()
+    enabled = settings.FAST_JSON_RESPONSES
+    results = []
+    with TestClient(app) as client:
+        response = client.post("/api/v1/auth/login", data={"username": "admin", "password": ADMIN_PASSWORD})
+        headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+        for name, _, _, _, _, path in ENDPOINTS:
+            url = f"{path}?limit={limit}"
+            result = {"endpoint": name}
+            for key, fast in (("default", False), ("fast_json", True)):
+                settings.FAST_JSON_RESPONSES = fast
+                client.get(url, headers=headers)
+                start = time.process_time()
+                for _ in range(requests):
+                    assert client.get(url, headers=headers).status_code == 200
+                result[key] = round((time.process_time() - start) * 1000 / requests, 3)
+            result["speedup"] = round(result["default"] / result["fast_json"], 2)
+            results.append(result)
+    settings.FAST_JSON_RESPONSES = enabled
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=100, help="每页行数")
+    parser.add_argument("--pages", type=int, default=100, help="每种方式读取的页数")
+    parser.add_argument("--requests", type=int, default=50, help="每个接口每种设置的请求数")
+    args = parser.parse_args()
+
+    counts = seed(args.rows)
+    total_rows = {name: counts.get(name, 20) for name, *_ in ENDPOINTS}
+
+    print(f"rows={args.rows} limit={args.limit} orjson={'yes' if orjson else 'no'}")
+    print("\n每页CPU时间（毫秒），查询+构建响应+序列化")
+    print_table(bench_pages(args.limit, args.pages, total_rows),
+                ["endpoint", "orm+pydantic", "orm+pydantic+orjson", "rows+orjson", "speedup"])
+    print("\n每个请求CPU时间（毫秒），通过测试客户端调用接口")
+    print_table(bench_requests(args.limit, args.requests), ["endpoint", "default", "fast_json", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
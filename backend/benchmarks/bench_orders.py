@@ -0,0 +1,113 @@
+"""
+订单创建基准测试
+
+对比销售订单、采购订单在不同明细行数下的创建耗时和SQL语句数量
+- legacy: 每行明细查询一次产品库存，逐个add明细对象（旧实现）
+- current: 一次IN查询加载明细产品，明细批量插入（接口当前实现）
+
+运行: python -m benchmarks.bench_orders --repeat 5
+"""
+import argparse
+
+from benchmarks.common import SessionLocal, reset_database, QueryCounter, timer, print_table
+from fastapi import HTTPException
+from sqlalchemy import insert
+from app.models import Customer, Supplier, Product, SalesOrder, SalesOrderItem, PurchaseOrder, PurchaseOrderItem
+from app.schemas.sales import SalesOrderCreate
+from app.schemas.purchase import PurchaseOrderCreate
+from app.api.v1.supply.sales import create_sales_order
+from app.api.v1.supply.purchase import create_purchase_order
+from app.services.rollups import track_rollup
+from app.utils.helpers import generate_code
+
+
+def legacy_sales_order(order, current_user, db):
+    code = generate_code("SO")
+    total_amount = sum(item.quantity * item.unit_price for item in order.items)
+    for item in order.items:
+        product = db.query(Product).filter(Product.code == item.product_code).first()
+        if product and product.current_stock < item.quantity:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock for {item.product_name}")
+    db_order = SalesOrder(code=code, customer_id=order.customer_id, total_amount=total_amount)
+    db.add(db_order)
+    db.flush()
+    for item in order.items:
+        db.add(SalesOrderItem(sales_order_id=db_order.id, **item.model_dump(), amount=item.quantity * item.unit_price))
+    track_rollup(db, db_order)
+    db.commit()
+    db.refresh(db_order)
+    return db_order
+
+
+def legacy_purchase_order(order, current_user, db):
+    code = generate_code("PO")
+    total_amount = sum(item.quantity * item.unit_price for item in order.items)
+    db_order = PurchaseOrder(code=code, supplier_id=order.supplier_id, total_amount=total_amount)
+    db.add(db_order)
+    db.flush()
+    for item in order.items:
+        db.add(PurchaseOrderItem(purchase_order_id=db_order.id, **item.model_dump(), amount=item.quantity * item.unit_price))
+    track_rollup(db, db_order)
+    db.commit()
+    db.refresh(db_order)
+    return db_order
+
+
+def seed(products: int):
+    reset_database()
+    db = SessionLocal()
+    db.execute(insert(Customer), [{"code": "C0001", "name": "客户1"}])
+    db.execute(insert(Supplier), [{"code": "S0001", "name": "供应商1"}])
+    db.execute(insert(Product), [
+        {"code": f"P{i:06d}", "name": f"产品{i}", "current_stock": 1000000} for i in range(products)
+    ])
+    db.commit()
+    db.close()
+
+
+def make_items(lines: int) -> list:
+    return [
+        {"product_code": f"P{i:06d}", "product_name": f"产品{i}", "quantity": 1, "unit_price": 10.0}
+        for i in range(lines)
+    ]
+
+
+def measure(fn, order, repeat: int) -> dict:
+    result = {}
+    statements = 0
+    with timer(result, "ms"):
+        for _ in range(repeat):
+            db = SessionLocal()
+            with QueryCounter() as counter:
+                fn(order, None, db)
+            statements = counter.statements
+            db.close()
+    result["ms"] = round(result["ms"] / repeat, 2)
+    result["statements"] = statements
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="每种情况重复次数，耗时取平均")
+    args = parser.parse_args()
+
+    seed(1000)
+    results = []
+    for lines in (1, 100, 1000):
+        items = make_items(lines)
+        cases = (
+            ("sales", SalesOrderCreate(customer_id=1, items=items), legacy_sales_order, create_sales_order),
+            ("purchase", PurchaseOrderCreate(supplier_id=1, items=items), legacy_purchase_order, create_purchase_order),
+        )
+        for name, order, legacy, current in cases:
+            for impl, fn in (("legacy", legacy), ("current", current)):
+                result = measure(fn, order, args.repeat)
+                result.update(order=name, lines=lines, impl=impl)
+                results.append(result)
+
+    print_table(results, ["order", "lines", "impl", "statements", "ms"])
+
+
+if __name__ == "__main__":
+    main()
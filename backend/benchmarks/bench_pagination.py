@@ -0,0 +1,81 @@
+"""
+列表分页基准测试
+
+对比偏移分页（offset + COUNT）与游标分页（(created_at, id)索引定位，不统计总数）
+在不同翻页深度下读取一页数据的耗时
+
+运行: python -m benchmarks.bench_pagination --rows 200000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import SessionLocal, reset_database, timer, print_table
+from sqlalchemy import insert, select
+from app.models import Supplier, PurchaseOrder
+from app.utils.helpers import paginate, encode_cursor
+
+
+def seed(rows: int):
+    reset_database()
+    db = SessionLocal()
+    db.execute(insert(Supplier), [{"code": "S0001", "name": "供应商1"}])
+    now = datetime.utcnow()
+    batch = []
+    for i in range(rows):
+        created = now - timedelta(seconds=random.randint(0, 3600 * 24 * 365))
+        batch.append({
+            "code": f"PO{i:010d}",
+            "supplier_id": 1,
+            "total_amount": round(random.uniform(100, 100000), 2),
+            "status": "pending",
+            "created_at": created,
+            "updated_at": created,
+        })
+        if len(batch) >= 10000:
+            db.execute(insert(PurchaseOrder), batch)
+            batch = []
+    if batch:
+        db.execute(insert(PurchaseOrder), batch)
+    db.commit()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    seed(args.rows)
+    query = select(PurchaseOrder)
+
+    results = []
+    for depth in (0.0, 0.25, 0.5, 0.9):
+        skip = int(args.rows * depth)
+        db = SessionLocal()
+        # 游标分页从上一页最后一行继续，这里直接取偏移位置的前一行作为游标
+        anchor = db.execute(
+            select(PurchaseOrder.created_at, PurchaseOrder.id).order_by(
+                PurchaseOrder.created_at.desc(), PurchaseOrder.id.desc()
+            ).offset(skip - 1).limit(1)
+        ).first() if skip else None
+        cursor = encode_cursor(*anchor) if anchor else None
+
+        result = {"skip": skip}
+        with timer(result, "offset_ms"):
+            offset_page = paginate(db, query, skip, args.limit, cursor_model=PurchaseOrder)
+        with timer(result, "cursor_ms"):
+            cursor_page = paginate(db, query, skip, args.limit, cursor_model=PurchaseOrder,
+                                   cursor=cursor, with_total=False)
+        result["same_rows"] = [o.id for o in offset_page.items] == [o.id for o in cursor_page.items]
+        results.append(result)
+        db.close()
+
+    print(f"purchase_orders={args.rows}, limit={args.limit}")
+    print_table(results, ["skip", "offset_ms", "cursor_ms", "same_rows"])
+
+
+if __name__ == "__main__":
+    main()
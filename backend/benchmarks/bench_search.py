@@ -0,0 +1,87 @@
+"""
+关键词搜索基准测试
+
+生成大量产品后，对比两种搜索方式读取第一页（含总数）的耗时
+- like: code/name/specification LIKE '%关键词%'（全表扫描）
+- index: search_tokens倒排索引，按相关度排序（接口当前实现）
+
+同时报告索引重建耗时和词元行数
+注意两者匹配规则不同：索引对字母数字按词前缀匹配（编码另外按字母或数字段开头和后缀匹配），
+LIKE为任意子串匹配，命中数可能不同；只有一个字符的关键词两者都使用LIKE
+
+运行: python -m benchmarks.bench_search --rows 1000000
+"""
+import argparse
+import random
+
+from benchmarks.common import SessionLocal, reset_database, timer, print_table
+from sqlalchemy import insert, or_, select
+from app.models import Product
+from app.services.search import rebuild_search_index, search
+from app.utils.helpers import paginate
+
+MATERIALS = ["热轧", "冷轧", "镀锌", "不锈钢", "铝合金", "彩涂", "酸洗", "硅钢", "电解铜", "碳素"]
+SHAPES = ["钢板", "卷板", "圆管", "方管", "角钢", "槽钢", "线材", "带钢", "型材", "圆钢"]
+GRADES = ["Q235", "Q345", "SPCC", "DX51D", "SUS304", "SUS316", "6061", "45#", "HRB400", "T2"]
+
+KEYWORDS = ["P0050000", "P005", "0050000", "050000", "钢", "板", "钢板", "热轧", "热轧钢板", "不锈钢圆管", "SUS304", "q345", "钢板 Q235", "不存在"]
+
+
+def seed(rows: int):
+    reset_database()
+    db = SessionLocal()
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "code": f"P{i:07d}",
+            "name": f"{random.choice(MATERIALS)}{random.choice(SHAPES)}{random.randint(1, 999)}",
+            "specification": f"{random.choice(GRADES)} {random.randint(1, 30)}*{random.choice((1000, 1250, 1500))}",
+        })
+        if len(batch) >= 20000:
+            db.execute(insert(Product), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Product), batch)
+    db.commit()
+    db.close()
+
+
+def like_query(keyword: str):
+    return select(Product).where(or_(
+        Product.code.contains(keyword), Product.name.contains(keyword), Product.specification.contains(keyword)
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    build = {}
+    with timer(build, "seed_ms"):
+        seed(args.rows)
+    db = SessionLocal()
+    with timer(build, "index_ms"):
+        build["tokens"] = rebuild_search_index(db, ["products"])["products"]
+    print(f"products={args.rows}, search_tokens={build['tokens']}, "
+          f"seed={build['seed_ms'] / 1000:.1f}s, index build={build['index_ms'] / 1000:.1f}s")
+
+    results = []
+    for keyword in KEYWORDS:
+        result = {"keyword": keyword}
+        with timer(result, "like_ms"):
+            result["like_hits"] = paginate(db, like_query(keyword), 0, args.limit).total
+        with timer(result, "index_ms"):
+            page = paginate(db, search(select(Product), Product, keyword), 0, args.limit)
+        result["index_hits"] = page.total
+        result["top"] = page.items[0].code if page.items else ""
+        results.append(result)
+    db.close()
+
+    print_table(results, ["keyword", "like_hits", "like_ms", "index_hits", "index_ms", "top"])
+
+
+if __name__ == "__main__":
+    main()
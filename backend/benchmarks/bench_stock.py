@@ -0,0 +1,107 @@
+"""
+库存并发扣减压力测试
+
+多个线程各自使用独立会话，对同一个产品并发执行出库（每次1个单位），尝试次数多于初始库存
+- legacy: 先读取current_stock，在Python中检查并写回（旧实现）
+- adjust_stock: 一条带条件的UPDATE完成检查和扣减
+
+检查项: 成功出库次数 == 初始库存 - 最终库存（没有丢失更新），最终库存不小于0（没有超卖）
+
+运行: python -m benchmarks.bench_stock --threads 16 --attempts 200 --stock 1000
+MySQL: BENCH_DATABASE_URL=mysql+pymysql://... python -m benchmarks.bench_stock
+"""
+import argparse
+import threading
+
+from benchmarks.common import SessionLocal, reset_database, timer, print_table
+from sqlalchemy.exc import OperationalError
+from app.models import Product
+from app.services.stock import adjust_stock, InsufficientStock
+
+
+def legacy_out(db, product_id: int, quantity: float) -> bool:
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if product.current_stock < quantity:
+        return False
+    product.current_stock -= quantity
+    db.commit()
+    return True
+
+
+def atomic_out(db, product_id: int, quantity: float) -> bool:
+    try:
+        adjust_stock(db, product_id, -quantity)
+    except InsufficientStock:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+def run(fn, threads: int, attempts: int, stock: int) -> dict:
+    reset_database()
+    db = SessionLocal()
+    product = Product(code="P0001", name="压力测试产品", current_stock=stock)
+    db.add(product)
+    db.commit()
+    product_id = product.id
+    db.close()
+
+    counts = {"ok": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        for _ in range(attempts):
+            db = SessionLocal()
+            try:
+                outcome = "ok" if fn(db, product_id, 1) else "rejected"
+            except OperationalError:
+                db.rollback()
+                outcome = "errors"
+            finally:
+                db.close()
+            with lock:
+                counts[outcome] += 1
+
+    result = {}
+    with timer(result, "ms"):
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+
+    db = SessionLocal()
+    final_stock = db.query(Product.current_stock).filter(Product.id == product_id).scalar()
+    db.close()
+    result.update(counts)
+    result["final_stock"] = final_stock
+    result["lost_updates"] = int(counts["ok"] - (stock - final_stock))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=100, help="每个线程的出库次数")
+    parser.add_argument("--stock", type=int, default=1000, help="初始库存，应小于threads*attempts以覆盖库存不足的情况")
+    args = parser.parse_args()
+
+    results = []
+    for name, fn in (("legacy", legacy_out), ("adjust_stock", atomic_out)):
+        result = run(fn, args.threads, args.attempts, args.stock)
+        result["impl"] = name
+        results.append(result)
+
+    print(f"threads={args.threads}, attempts={args.threads * args.attempts}, initial_stock={args.stock}")
+    print_table(results, ["impl", "ok", "rejected", "errors", "final_stock", "lost_updates", "ms"])
+
+    atomic = results[-1]
+    assert atomic["lost_updates"] == 0, "adjust_stock lost updates"
+    assert atomic["final_stock"] >= 0, "adjust_stock oversold"
+
+
+if __name__ == "__main__":
+    main()
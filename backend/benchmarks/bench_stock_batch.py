@@ -0,0 +1,142 @@
+"""
+批量库存记录基准测试
+
+通过HTTP接口写入同样的出入库记录，对比:
+- single: 每条记录调用一次POST /inventory/stock-records/（各自查询产品、提交事务）
+- batch: 每批调用一次POST /inventory/stock-records/batch（一次加载、汇总净变化量、批量插入、提交一次）
+
+检查项: 两种方式最终的产品总库存一致，batch吞吐量（rows/sec）；
+batch提交后仪表板和库存分析快照的缓存键变化，库存状态接口返回的是提交后的库存
+
+运行: python -m benchmarks.bench_stock_batch --rows 10000 --batch-size 5000
+"""
+import argparse
+import random
+
+from benchmarks.common import SessionLocal, reset_database, timer, print_table
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select
+from app.api.v1.finance.reports import DASHBOARD_TABLES
+from app.core.cache import data_versions, get_cache
+from app.core.security import create_access_token
+from app.services.inventory_snapshot import SNAPSHOT_TABLES
+from app.models import User, Product, Warehouse, StockRecord
+
+
+def seed(products: int, warehouses: int) -> dict:
+    reset_database()
+    db = SessionLocal()
+    db.execute(insert(User), [{"username": "bench", "password": "-", "is_superuser": True, "status": True}])
+    db.execute(insert(Warehouse), [{"code": f"W{i:03d}", "name": f"仓库{i}"} for i in range(warehouses)])
+    db.execute(insert(Product), [
+        {"code": f"P{i:06d}", "name": f"产品{i}", "current_stock": 0} for i in range(products)
+    ])
+    db.commit()
+    user_id = db.scalar(select(User.id))
+    db.close()
+    return {"Authorization": "Bearer " + create_access_token({"sub": str(user_id)})}
+
+
+def make_records(rows: int, products: int, warehouses: int) -> list:
+    # 入库为主，夹杂出库；出库可能因库存不足失败，两种方式按同样的顺序处理，结果应一致
+    records = []
+    for _ in range(rows):
+        records.append({
+            "type": "in" if random.random() < 0.7 else "out",
+            "product_id": random.randint(1, products),
+            "warehouse_id": random.randint(1, warehouses),
+            "quantity": random.randint(1, 20),
+            "unit_price": 10.0,
+        })
+    return records
+
+
+def stock_snapshot() -> tuple:
+    db = SessionLocal()
+    stock = tuple(db.scalars(select(Product.current_stock).order_by(Product.id)))
+    count = db.scalar(select(func.count(StockRecord.id)))
+    db.close()
+    return stock, count
+
+
+def run_single(client, headers, records) -> dict:
+    result = {"impl": "single", "requests": len(records)}
+    created = 0
+    with timer(result, "ms"):
+        for record in records:
+            created += client.post("/api/v1/inventory/stock-records/", json=record, headers=headers).status_code == 200
+    result["created"] = created
+    return result
+
+
+def run_batch(client, headers, records, batch_size: int) -> dict:
+    result = {"impl": f"batch size={batch_size}", "requests": 0}
+    created = 0
+    with timer(result, "ms"):
+        for start in range(0, len(records), batch_size):
+            response = client.post(
+                "/api/v1/inventory/stock-records/batch",
+                json={"records": records[start:start + batch_size]},
+                headers=headers
+            )
+            assert response.status_code == 200, response.text
+            created += response.json()["created"]
+            result["requests"] += 1
+    result["created"] = created
+    return result
+
+
+def check_cache_invalidation(client, headers, records, batch_size: int) -> dict:
+    """先读取库存状态使仪表板和快照缓存生效，批量写入后检查缓存键变化、接口返回新数据"""
+    url = "/api/v1/reports/inventory-status"
+    client.get("/api/v1/reports/dashboard", headers=headers)
+    cached = client.get(url, headers=headers).json()
+    keys = (data_versions.get(*DASHBOARD_TABLES), data_versions.get(*SNAPSHOT_TABLES))
+    result = run_batch(client, headers, records, batch_size)
+    assert data_versions.get(*DASHBOARD_TABLES) != keys[0], "batch did not change the dashboard cache key"
+    assert data_versions.get(*SNAPSHOT_TABLES) != keys[1], "batch did not change the inventory snapshot cache key"
+    served = client.get(url, headers=headers).json()
+    get_cache("inventory_snapshot", 0).invalidate()
+    assert served == client.get(url, headers=headers).json(), "inventory status served stale data after batch"
+    assert served != cached, "batch did not change the inventory status"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--warehouses", type=int, default=5)
+    parser.add_argument("--single-rows", type=int, default=2000, help="逐条接口只写入前N条，避免耗时过长")
+    args = parser.parse_args()
+
+    from main import app
+    client = TestClient(app)
+    random.seed(42)
+    records = make_records(args.rows, args.products, args.warehouses)
+    single_rows = records[:args.single_rows]
+
+    results = []
+    headers = seed(args.products, args.warehouses)
+    results.append(run_single(client, headers, single_rows))
+    single_state = stock_snapshot()
+
+    headers = seed(args.products, args.warehouses)
+    results.append(check_cache_invalidation(client, headers, single_rows, args.batch_size))
+    batch_state = stock_snapshot()
+    assert single_state == batch_state, "batch and single produced different stock levels"
+
+    headers = seed(args.products, args.warehouses)
+    results.append(run_batch(client, headers, records, args.batch_size))
+
+    for r in results:
+        r["rows"] = len(single_rows) if r is not results[-1] else len(records)
+        r["rows_per_sec"] = int(r["rows"] / (r["ms"] / 1000)) if r["ms"] else 0
+
+    print(f"products={args.products}, warehouses={args.warehouses}")
+    print_table(results, ["impl", "rows", "requests", "created", "ms", "rows_per_sec"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+库存盘点基准测试
+
+整仓盘点（默认2万行明细），对比创建盘点和完成盘点的耗时与SQL语句数量
+- legacy: 每行明细查询一次产品和库存余额、逐个add；完成时每行调用一次adjust_stock（旧实现）
+- current: 按块IN查询加载、批量插入明细；完成时差异汇总后UPDATE ... FROM一次调整（接口当前实现）
+- upload: 同样的明细以CSV盘点表上传，逐行解析后按块写入
+
+检查项: 两种实现完成盘点后的产品库存和仓库库存余额一致
+
+运行: python -m benchmarks.bench_stock_check --items 20000
+"""
+import argparse
+import io
+import random
+
+from benchmarks.common import SessionLocal, reset_database, QueryCounter, timer, print_table
+from sqlalchemy import insert, select
+from app.models import Product, Warehouse, WarehouseStock, StockCheck, StockCheckItem
+from app.services.stock import (
+    adjust_stock, get_warehouse_stock, insert_stock_check_items, apply_stock_check, read_count_sheet
+)
+
+
+def seed(products: int):
+    reset_database()
+    db = SessionLocal()
+    db.execute(insert(Warehouse), [{"code": "W001", "name": "仓库1"}])
+    db.execute(insert(Product), [
+        {"code": f"P{i:06d}", "name": f"产品{i}", "current_stock": 100} for i in range(products)
+    ])
+    db.execute(insert(WarehouseStock), [
+        {"product_id": i + 1, "warehouse_id": 1, "quantity": 100} for i in range(products)
+    ])
+    db.commit()
+    db.close()
+
+
+def new_check(db) -> int:
+    check = StockCheck(code=f"SC{random.getrandbits(48):014d}", warehouse_id=1)
+    db.add(check)
+    db.flush()
+    return check.id
+
+
+def legacy_create(db, check_id: int, items: list):
+    for item in items:
+        product = db.query(Product).filter(Product.id == item["product_id"]).first()
+        if product:
+            book_quantity = get_warehouse_stock(db, product.id, 1)
+            db.add(StockCheckItem(
+                stock_check_id=check_id,
+                product_id=product.id,
+                actual_quantity=item["actual_quantity"],
+                book_quantity=book_quantity,
+                diff_quantity=item["actual_quantity"] - book_quantity
+            ))
+    db.commit()
+
+
+def legacy_complete(db, check_id: int):
+    check = db.get(StockCheck, check_id)
+    check.status = "completed"
+    for item in check.items:
+        if item.diff_quantity:
+            adjust_stock(db, item.product_id, item.diff_quantity, warehouse_id=1)
+    db.commit()
+
+
+def current_create(db, check_id: int, items: list):
+    insert_stock_check_items(db, check_id, 1, items)
+    db.commit()
+
+
+def upload_create(db, check_id: int, items: list):
+    lines = ["product_code,actual_quantity"] + [f"P{i['product_id'] - 1:06d},{i['actual_quantity']}" for i in items]
+    sheet = io.BytesIO("\n".join(lines).encode("utf-8"))
+    insert_stock_check_items(db, check_id, 1, read_count_sheet(sheet))
+    db.commit()
+
+
+def current_complete(db, check_id: int):
+    db.get(StockCheck, check_id).status = "completed"
+    apply_stock_check(db, check_id, 1)
+    db.commit()
+
+
+def snapshot() -> tuple:
+    db = SessionLocal()
+    stock = tuple(db.scalars(select(Product.current_stock).order_by(Product.id)))
+    balances = tuple(db.scalars(select(WarehouseStock.quantity).order_by(WarehouseStock.product_id)))
+    db.close()
+    return stock, balances
+
+
+def run(name: str, create, complete, items: list, products: int) -> tuple:
+    seed(products)
+    result = {"impl": name}
+    db = SessionLocal()
+    check_id = new_check(db)
+    with QueryCounter() as counter, timer(result, "create_ms"):
+        create(db, check_id, items)
+    result["create_statements"] = counter.statements
+    with QueryCounter() as counter, timer(result, "complete_ms"):
+        complete(db, check_id)
+    result["complete_statements"] = counter.statements
+    db.close()
+    return result, snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    items = [
+        {"product_id": i + 1, "actual_quantity": float(random.choice((100, 100, 100, 95, 103, 0)))}
+        for i in range(args.items)
+    ]
+
+    results = []
+    states = []
+    for name, create, complete in (
+        ("legacy", legacy_create, legacy_complete),
+        ("current", current_create, current_complete),
+        ("upload", upload_create, current_complete),
+    ):
+        result, state = run(name, create, complete, items, args.items)
+        results.append(result)
+        states.append(state)
+    assert states[0] == states[1] == states[2], "stock levels differ between implementations"
+
+    print(f"items={args.items}")
+    print_table(results, ["impl", "create_statements", "create_ms", "complete_statements", "complete_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+基准测试公共工具
+
+所有基准脚本都在backend目录下以模块方式运行，例如:
+    python -m benchmarks.bench_analysis --rows 200000
+
+默认使用临时SQLite数据库，可通过环境变量BENCH_DATABASE_URL指定MySQL等其他数据库
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+BENCH_DATABASE_URL = os.environ.get(
+    "BENCH_DATABASE_URL",
+    "sqlite:///" + os.path.join(tempfile.gettempdir(), "scm_bench.db")
+)
+# 必须在导入app模块之前设置，使应用引擎指向基准数据库
+os.environ["DATABASE_URL"] = BENCH_DATABASE_URL
+
+from sqlalchemy import event  # noqa: E402
+from app.db.session import Base, engine, SessionLocal  # noqa: E402
+
+
+def reset_database():
+    """删除并重新创建全部数据表"""
+    import app.models  # noqa: F401  确保所有模型已注册到元数据
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+class QueryCounter:
+    """
+    SQL语句计数器
+
+    在with块内统计引擎执行的SQL语句数量
+    """
+    def __init__(self):
+        self.statements = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+
+@contextmanager
+def timer(result: dict, key: str = "ms"):
+    """把with块的耗时（毫秒）写入result[key]"""
+    start = time.perf_counter()
+    yield
+    result[key] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def print_table(rows, columns):
+    """以对齐的文本表格打印结果"""
+    widths = [max(len(str(c)), *(len(str(r.get(c, ""))) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
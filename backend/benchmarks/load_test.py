@@ -0,0 +1,293 @@
+"""
+核心接口负载测试
+
+按指定规模生成数据后，在进程内通过ASGI客户端（httpx.ASGITransport）并发调用接口，
+报告每个接口的p50/p95/p99延迟、吞吐量、平均SQL语句数和数据库耗时（来自Server-Timing响应头）
+结果可保存为JSON，并与之前保存的结果对比，用于发现性能回退
+
+场景: login、product_list、product_search、order_create、dashboard、inventory_analysis、sales_analysis
+
+运行:
+    python -m benchmarks.load_test --rows 100000 --requests 200 --concurrency 8 --output result.json
+    python -m benchmarks.load_test --skip-seed --compare result.json    # 复用已有数据，与上次结果对比
+    BENCH_DATABASE_URL=mysql+pymysql://... python -m benchmarks.load_test --rows 1000000
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import sqlalchemy
+from benchmarks.common import SessionLocal, reset_database, BENCH_DATABASE_URL, print_table
+from sqlalchemy import insert, select, func
+from app.core.security import get_password_hash
+from app.models import (
+    User, Supplier, Customer, Product, Warehouse, WarehouseStock, StockRecord,
+    PurchaseOrder, PurchaseOrderItem, SalesOrder, SalesOrderItem, Payment, Bill
+)
+from app.services.rollups import rebuild_rollups
+from app.services.search import rebuild_search_index
+
+BATCH_SIZE = 20000
+ADMIN_PASSWORD = "admin123"
+
+SHARES = {
+    "products": 0.05,
+    "purchase_orders": 0.10,
+    "purchase_order_items": 0.20,
+    "sales_orders": 0.10,
+    "sales_order_items": 0.20,
+    "stock_records": 0.20,
+    "bills": 0.10,
+    "payments": 0.05,
+}
+# --rows按比例分配到各表，供应商和客户各为--rows的0.1%（至少20个）
+
+_SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def _bulk(db, model, rows):
+    """按批执行executemany INSERT"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.execute(insert(model), batch)
+            batch = []
+    if batch:
+        db.execute(insert(model), batch)
+
+
+def seed(rows: int, seed_value: int = 42) -> dict:
+    """生成测试数据，返回各表行数"""
+    rng = random.Random(seed_value)
+    counts = {table: max(1, int(rows * share)) for table, share in SHARES.items()}
+    counts["suppliers"] = counts["customers"] = max(20, rows // 1000)
+    now = datetime.now()
+
+    def past():
+        return now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+
+    reset_database()
+    db = SessionLocal()
+    db.add(User(username="admin", password=get_password_hash(ADMIN_PASSWORD), is_superuser=True, status=True))
+    db.execute(insert(Warehouse), [{"code": f"W{i:02d}", "name": f"仓库{i}"} for i in range(1, 6)])
+    _bulk(db, Supplier, ({"code": f"S{i:07d}", "name": f"供应商{i}"} for i in range(counts["suppliers"])))
+    _bulk(db, Customer, ({"code": f"C{i:07d}", "name": f"客户{i}"} for i in range(counts["customers"])))
+    _bulk(db, Product, ({
+        "code": f"P{i:08d}", "name": f"热轧钢板{i}", "unit": "吨", "specification": f"Q235 {i % 30 + 1}*1500",
+        "purchase_price": 100.0 + i % 900, "sale_price": 120.0 + i % 900,
+        "current_stock": 1e9, "min_stock": float(rng.choice((0, 0, 0, 2e9))), "max_stock": 2e9,
+    } for i in range(counts["products"])))
+    _bulk(db, WarehouseStock, ({"product_id": i + 1, "warehouse_id": 1, "quantity": 1e9} for i in range(counts["products"])))
+
+    for order_model, item_model, prefix, party, parties, order_key, date_key in (
+        (PurchaseOrder, PurchaseOrderItem, "PO", "supplier_id", "suppliers", "purchase_order_id", "purchase_date"),
+        (SalesOrder, SalesOrderItem, "SO", "customer_id", "customers", "sales_order_id", "sale_date"),
+    ):
+        orders = counts[order_model.__tablename__]
+        items_per_order = max(1, counts[item_model.__tablename__] // orders)
+        _bulk(db, order_model, ({
+            "code": f"{prefix}{i:010d}", party: rng.randint(1, counts[parties]),
+            date_key: past(), "total_amount": 1000.0 * items_per_order,
+            "status": rng.choice(("pending", "approved", "completed", "cancelled")),
+        } for i in range(orders)))
+        _bulk(db, item_model, ({
+            order_key: order_id, "product_code": f"P{(order_id * 7 + n) % counts['products']:08d}",
+            "product_name": "热轧钢板", "quantity": 10.0, "unit_price": 100.0, "amount": 1000.0,
+        } for order_id in range(1, orders + 1) for n in range(items_per_order)))
+
+    _bulk(db, StockRecord, ({
+        "code": f"SR{i:010d}", "type": rng.choice(("in", "out")), "warehouse_id": 1,
+        "product_id": rng.randint(1, counts["products"]), "quantity": 1.0,
+    } for i in range(counts["stock_records"])))
+    _bulk(db, Bill, ({
+        "code": f"BL{i:010d}", "type": "receivable" if i % 2 else "payable", "amount": 1000.0, "remaining_amount": 1000.0,
+        "bill_date": past(), "status": rng.choice(("unpaid", "partial", "paid")),
+        "customer_id" if i % 2 else "supplier_id": rng.randint(1, counts["customers"]),
+    } for i in range(counts["bills"])))
+    _bulk(db, Payment, ({
+        "code": f"PM{i:010d}", "type": "receive" if i % 2 else "pay", "amount": 1000.0,
+        "payment_date": past(), "status": "completed",
+        "customer_id" if i % 2 else "supplier_id": rng.randint(1, counts["customers"]),
+    } for i in range(counts["payments"])))
+    db.commit()
+
+    rebuild_rollups(db)
+    rebuild_search_index(db, ["products"])
+    db.close()
+    return counts
+
+
+def percentile(sorted_values, p: float) -> float:
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def scenarios(products: int, customers: int):
+    """返回{场景名: 生成请求参数的函数}，函数接收随机数生成器，返回(method, url, kwargs)"""
+    def order_create(rng):
+        codes = {f"P{rng.randrange(products):08d}" for _ in range(3)}
+        return "POST", "/api/v1/sales/sales-orders/", {"json": {
+            "customer_id": rng.randint(1, customers),
+            "items": [{"product_code": code, "product_name": "热轧钢板", "quantity": 1, "unit_price": 120} for code in codes],
+        }}
+
+    return {
+        "login": lambda rng: ("POST", "/api/v1/auth/login", {"data": {"username": "admin", "password": ADMIN_PASSWORD}}),
+        "product_list": lambda rng: ("GET", "/api/v1/inventory/products/", {"params": {
+            "skip": rng.randrange(max(1, products - 20)), "limit": 20}}),
+        "product_search": lambda rng: ("GET", "/api/v1/inventory/products/", {"params": {
+            "keyword": rng.choice(("热轧", "钢板", "Q235", f"P{rng.randrange(products):08d}")), "limit": 20}}),
+        "order_create": order_create,
+        "dashboard": lambda rng: ("GET", "/api/v1/reports/dashboard", {}),
+        "inventory_analysis": lambda rng: ("GET", "/api/v1/analysis/inventory", {}),
+        "sales_analysis": lambda rng: ("GET", "/api/v1/analysis/sales", {}),
+    }
+
+
+async def run_scenario(client, headers, name, make_request, requests: int, concurrency: int, warmup: int, seed_value: int) -> dict:
+    """并发执行一个场景，预热请求不计入结果"""
+    rng = random.Random(f"{seed_value}:{name}")
+    for _ in range(warmup):
+        method, url, kwargs = make_request(rng)
+        await client.request(method, url, headers=headers, **kwargs)
+
+    plans = iter([make_request(rng) for _ in range(requests)])
+    latencies, statements, db_ms = [], [], []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for method, url, kwargs in plans:
+            start = time.perf_counter()
+            response = await client.request(method, url, headers=headers, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+            timing = _SERVER_TIMING.search(response.headers.get("server-timing", ""))
+            if timing:
+                db_ms.append(float(timing.group(1)))
+                statements.append(int(timing.group(2)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "statements": round(sum(statements) / len(statements), 1) if statements else None,
+        "db_ms": round(sum(db_ms) / len(db_ms), 2) if db_ms else None,
+    }
+
+
+async def run(args, products: int, customers: int) -> list:
+    from main import app
+    from app.services.catalog import product_catalog
+
+    db = SessionLocal()
+    product_catalog.load(db)
+    db.close()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/api/v1/auth/login", data={"username": "admin", "password": ADMIN_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+        results = []
+        for name, make_request in scenarios(products, customers).items():
+            if args.endpoints and name not in args.endpoints:
+                continue
+            requests = min(args.requests, args.login_requests) if name == "login" else args.requests
+            results.append(await run_scenario(
+                client, headers, name, make_request, requests, args.concurrency, args.warmup, args.seed
+            ))
+    return results
+
+
+def compare(results: list, baseline_path: str):
+    """与之前保存的结果对比，打印各指标的变化百分比（延迟为正表示变慢，吞吐量为负表示变慢）"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["endpoint"]: r for r in json.load(f)["results"]}
+    rows = []
+    for result in results:
+        before = baseline.get(result["endpoint"])
+        if not before:
+            continue
+        row = {"endpoint": result["endpoint"]}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            row[key] = f"{(result[key] - before[key]) / before[key] * 100:+.1f}%" if before[key] else "n/a"
+        rows.append(row)
+    print(f"\ncompared with {baseline_path}")
+    print_table(rows, ["endpoint", "p50_ms", "p95_ms", "p99_ms", "rps"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000, help="生成的总行数（按比例分配到各表）")
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--login-requests", type=int, default=50, help="login场景的请求数（bcrypt计算较慢）")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5, help="每个场景的预热请求数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子，相同种子生成相同的数据和请求序列")
+    parser.add_argument("--endpoints", nargs="*", help="只运行指定场景")
+    parser.add_argument("--skip-seed", action="store_true", help="复用已有数据库，不重新生成数据")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    parser.add_argument("--compare", help="与之前保存的结果JSON对比")
+    args = parser.parse_args()
+
+    seed_seconds = None
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed(args.rows, args.seed)
+        seed_seconds = round(time.perf_counter() - started, 1)
+
+    db = SessionLocal()
+    products = db.scalar(select(func.count(Product.id)))
+    customers = db.scalar(select(func.count(Customer.id)))
+    db.close()
+
+    results = asyncio.run(run(args, products, customers))
+    print(f"rows={args.rows if not args.skip_seed else 'existing'}, products={products}, "
+          f"concurrency={args.concurrency}, seed={'skipped' if seed_seconds is None else f'{seed_seconds}s'}")
+    print_table(results, ["endpoint", "requests", "errors", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "rps", "statements", "db_ms"])
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "database": sqlalchemy.engine.make_url(BENCH_DATABASE_URL).render_as_string(hide_password=True),
+            "rows": None if args.skip_seed else args.rows,
+            "products": products,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "seed_seconds": seed_seconds,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
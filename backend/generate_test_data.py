@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+批量测试数据生成
+
+由 init_test_data.py --generate 调用，在基础数据（部门、用户、产品等）之上生成大批量业务单据:
+    - 采购单、销售单及明细，明细金额之和等于单据总额
+    - 库存台账: 采购收货入库、销售发货出库，台账不足的部分补期初入库；
+      仓库库存余额和产品当前库存按台账重建，products.reserved_stock等于有效预留之和
+    - 可以在同一数据库上多次生成，每次的期初入库单号带有本次第一张销售单的ID，不与之前生成的重复
+    - 账单和收付款: 审批后的单据生成应付/应收账单，账单已付金额等于对应收付款之和，单据已付金额与账单一致
+
+单据按块生成，每块使用由种子和块序号确定的随机数，同一种子在任意进程数下生成完全相同的数据
+各块在进程池中并行生成，主进程按块顺序用executemany批量写入
+"""
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Supplier, Customer, Product, ProductCategory, Warehouse, WarehouseStock,
+    PurchaseOrder, SalesOrder, StockReservation
+)
+from app.services.stock import rebuild_warehouse_stock
+
+CHUNK_SIZE = 20000
+# 每块生成的单据数量
+
+DATE_RANGE_DAYS = 365
+# 单据日期分布在当天零点之前的一年内，同一天内用相同种子生成的日期也相同
+
+TABLE_COLUMNS = {
+    "purchase_orders": (
+        "id", "code", "supplier_id", "purchase_date", "expected_date", "total_amount", "paid_amount",
+        "status", "approval_status", "approved_at", "created_at", "updated_at",
+    ),
+    "purchase_order_items": (
+        "purchase_order_id", "product_code", "product_name", "specification", "unit",
+        "quantity", "unit_price", "amount", "received_quantity", "created_at", "updated_at",
+    ),
+    "sales_orders": (
+        "id", "code", "customer_id", "sale_date", "delivery_date", "total_amount", "paid_amount",
+        "status", "approval_status", "approved_at", "created_at", "updated_at",
+    ),
+    "sales_order_items": (
+        "sales_order_id", "product_code", "product_name", "specification", "unit",
+        "quantity", "unit_price", "amount", "shipped_quantity", "created_at", "updated_at",
+    ),
+    "stock_reservations": ("sales_order_id", "product_id", "quantity", "status", "created_at", "updated_at"),
+    "stock_records": (
+        "code", "type", "warehouse_id", "product_id", "quantity", "unit_price", "amount",
+        "reference_code", "reference_type", "remark", "created_at", "updated_at",
+    ),
+    "bills": (
+        "code", "type", "amount", "bill_date", "due_date", "reference_code", "reference_type",
+        "supplier_id", "customer_id", "paid_amount", "remaining_amount", "status", "created_at", "updated_at",
+    ),
+    "payments": (
+        "code", "type", "amount", "payment_method", "payment_date", "reference_code", "reference_type",
+        "supplier_id", "customer_id", "status", "approval_status", "created_at", "updated_at",
+    ),
+}
+# 各表写入的列，生成的元组按这里的顺序排列，写入顺序即字典顺序（先单据后明细，满足外键）
+
+PURCHASE_STATUSES = ("pending", "approved", "shipped", "completed", "completed", "completed")
+SALES_STATUSES = ("pending", "approved", "shipped", "delivered", "completed", "completed")
+# 与init_test_data.py中的状态分布一致
+
+MATERIALS = ("热轧", "冷轧", "镀锌", "不锈钢", "铝合金", "彩涂", "酸洗", "硅钢", "电解铜", "碳素")
+SHAPES = ("钢板", "卷板", "圆管", "方管", "角钢", "槽钢", "线材", "带钢", "型材", "圆钢")
+GRADES = ("Q235", "Q345", "SPCC", "DX51D", "SUS304", "SUS316", "6061", "45#", "HRB400", "T2")
+
+_context: Optional[dict] = None
+# 生成单据所需的基础数据，每个工作进程初始化一次
+
+
+def _init_worker(context: dict):
+    global _context
+    _context = context
+
+
+def _fmt(moment: datetime) -> str:
+    # 生成的时间都不带微秒，isoformat比strftime快一倍多
+    return moment.isoformat(" ")
+
+
+def _settle(rng: random.Random, rows: Dict[str, list], kind: str, order_id: int, order_code: str,
+            party_id: int, total: float, paid: float, order_date: datetime, now: datetime):
+    """为审批后的单据生成账单，已付金额拆成一到两笔收付款，账单状态由已付金额和到期日决定"""
+    purchase = kind == "purchase"
+    bill_date = order_date + timedelta(days=rng.randint(1, 5))
+    due_date = bill_date + timedelta(days=rng.randint(30, 90) if purchase else rng.randint(15, 60))
+    remaining = round(total - paid, 2)
+    if remaining <= 0:
+        status = "paid"
+    elif paid > 0:
+        status = "partial"
+    else:
+        status = "overdue" if due_date < now else "unpaid"
+    supplier_id, customer_id = (party_id, None) if purchase else (None, party_id)
+    bill_stamp = _fmt(bill_date)
+    rows["bills"].append((
+        f"{'AP' if purchase else 'AR'}{order_id:010d}", "payable" if purchase else "receivable", total,
+        bill_stamp, _fmt(due_date), order_code, "purchase" if purchase else "sale",
+        supplier_id, customer_id, paid, remaining, status, bill_stamp, bill_stamp,
+    ))
+    if paid <= 0:
+        return
+    first = round(paid * rng.uniform(0.3, 0.7), 2) if rng.random() < 0.5 else paid
+    for n, amount in enumerate((first, round(paid - first, 2))):
+        if amount <= 0:
+            continue
+        paid_at = _fmt(bill_date + timedelta(days=rng.randint(1, 30), seconds=n))
+        rows["payments"].append((
+            f"{'PAY' if purchase else 'REC'}{order_id:010d}{n}", "pay" if purchase else "receive", amount,
+            rng.choice(("transfer", "transfer", "check" if purchase else "online")), paid_at,
+            order_code, "purchase" if purchase else "sale", supplier_id, customer_id,
+            "completed", "approved", paid_at, paid_at,
+        ))
+
+
+def generate_chunk(task: tuple) -> tuple:
+    """
+    生成一块单据，task为(kind, 块序号, 起始单据ID, 单据数量, 种子, 时间窗口起点距今秒数, 时间窗口秒数)
+
+    单据日期在时间窗口内随机并按ID递增，与真实数据一致，也使created_at索引接近顺序写入
+
+    返回(各表的元组列表, {(产品ID, 仓库ID): 台账净数量}, {产品ID: 预留数量})
+    """
+    kind, chunk_index, first_id, count, seed, window_start, window_seconds = task
+    rng = random.Random(f"{seed}:{kind}:{chunk_index}")
+    products = _context["products"]
+    warehouses = _context["warehouses"]
+    now = _context["now"]
+    purchase = kind == "purchase"
+    parties = _context["suppliers" if purchase else "customers"]
+    statuses = PURCHASE_STATUSES if purchase else SALES_STATUSES
+    done_statuses = ("completed",) if purchase else ("delivered", "completed")
+
+    rows: Dict[str, list] = defaultdict(list)
+    order_rows = rows["purchase_orders" if purchase else "sales_orders"]
+    item_rows = rows["purchase_order_items" if purchase else "sales_order_items"]
+    movements: Dict[tuple, float] = defaultdict(float)
+    reserved: Dict[int, float] = defaultdict(float)
+
+    offsets = sorted(rng.randrange(max(window_seconds, 1)) for _ in range(count))
+    for order_id, offset in zip(range(first_id, first_id + count), offsets):
+        code = f"{'PO' if purchase else 'SO'}{order_id:010d}"
+        order_date = now - timedelta(seconds=window_start - offset)
+        stamp = _fmt(order_date)
+        status = rng.choice(statuses)
+        approved = status != "pending"
+        party_id = rng.choice(parties)
+        total = 0.0
+        for n in range(rng.randint(1, 4)):
+            product_id, product_code, name, spec, unit, purchase_price, sale_price = rng.choice(products)
+            if purchase:
+                quantity = round(rng.uniform(10, 100), 2)
+                unit_price = round((purchase_price or 100.0) * rng.uniform(0.98, 1.02), 2)
+            else:
+                quantity = round(rng.uniform(5, 50), 2)
+                unit_price = round((sale_price or 120.0) * rng.uniform(0.95, 1.05), 2)
+            amount = round(quantity * unit_price, 2)
+            total += amount
+            if status in done_statuses:
+                moved = quantity
+            elif status == "shipped":
+                moved = round(quantity * rng.uniform(0.5, 1.0) if purchase else quantity * rng.uniform(0.3, 0.8), 2)
+            else:
+                moved = 0.0
+            item_rows.append((
+                order_id, product_code, name, spec, unit, quantity, unit_price, amount, moved, stamp, stamp,
+            ))
+            if moved:
+                warehouse_id = rng.choice(warehouses)
+                movements[(product_id, warehouse_id)] += moved if purchase else -moved
+                rows["stock_records"].append((
+                    f"SR{code}{n}", "in" if purchase else "out", warehouse_id, product_id, moved, unit_price,
+                    round(moved * unit_price, 2), code, "purchase" if purchase else "sale",
+                    None, stamp, stamp,
+                ))
+            if not purchase and status == "approved":
+                reserved[product_id] += quantity
+                rows["stock_reservations"].append((order_id, product_id, quantity, "active", stamp, stamp))
+
+        total = round(total, 2)
+        paid = 0.0
+        if status == "completed":
+            # 已完成的单据多数已结清，其余部分付款
+            paid = total if rng.random() < 0.6 else round(total * rng.uniform(0.3 if purchase else 0.5, 0.95), 2)
+        approved_at = _fmt(order_date + timedelta(hours=rng.randint(1, 24))) if approved else None
+        order_rows.append((
+            order_id, code, party_id, stamp, _fmt(order_date + timedelta(days=rng.randint(3, 30))),
+            total, paid, status, "approved" if approved else "pending", approved_at, stamp, stamp,
+        ))
+        if approved:
+            _settle(rng, rows, kind, order_id, code, party_id, total, paid, order_date, now)
+
+    return dict(rows), dict(movements), dict(reserved)
+
+
+def _insert_rows(db: Session, table: str, rows: list):
+    """用驱动的executemany写入元组，不经过ORM和逐行参数处理"""
+    if not rows:
+        return
+    connection = db.connection()
+    placeholder = "?" if connection.dialect.paramstyle == "qmark" else "%s"
+    columns = TABLE_COLUMNS[table]
+    connection.exec_driver_sql(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join([placeholder] * len(columns))})",
+        rows
+    )
+
+
+def _product_row(rng: random.Random, category_ids: list, i: int) -> dict:
+    purchase_price = round(rng.uniform(1000, 9000), 2)
+    return {
+        "name": f"{rng.choice(MATERIALS)}{rng.choice(SHAPES)}{i}",
+        "specification": f"{rng.choice(GRADES)} {rng.randint(1, 30)}*{rng.choice((1000, 1250, 1500))}",
+        "unit": "吨", "category_id": rng.choice(category_ids),
+        "purchase_price": purchase_price, "sale_price": round(purchase_price * 1.15, 2),
+        "min_stock": float(rng.choice((0, 10, 50))), "max_stock": 5000.0, "status": "active",
+    }
+
+
+def _bulk_master_data(db: Session, rng: random.Random, products: int, suppliers: int, customers: int):
+    """批量追加产品、供应商、客户，编码由ID生成"""
+    category_ids = db.scalars(select(ProductCategory.id)).all() or [None]
+    for model, prefix, count, make in (
+        (Supplier, "GS", suppliers, lambda i: {"name": f"供应商{i}", "status": True, "balance": 0.0}),
+        (Customer, "GC", customers, lambda i: {"name": f"客户{i}", "status": True, "balance": 0.0}),
+        (Product, "GP", products, lambda i: _product_row(rng, category_ids, i)),
+    ):
+        start = (db.scalar(select(func.max(model.id))) or 0) + 1
+        for offset in range(0, count, CHUNK_SIZE):
+            stop = start + min(count, offset + CHUNK_SIZE)
+            db.execute(insert(model), [{**make(i), "code": f"{prefix}{i:08d}"} for i in range(start + offset, stop)])
+        db.commit()
+
+
+def _opening_stock(db: Session, rng: random.Random, movements: Dict[tuple, float], reserved: Dict[int, float],
+                   warehouses: list, now: datetime, run_id: int) -> int:
+    """
+    补期初入库，使本次生成的台账在每个仓库的余额不为负、每个产品的库存不低于本次新增的预留数量
+
+    期初入库记录日期早于全部单据，单号包含run_id（本次第一张销售单的ID），多次生成不会重复
+    返回写入的记录数
+    """
+    stamp = _fmt(now - timedelta(days=DATE_RANGE_DAYS + 1))
+    totals: Dict[int, float] = defaultdict(float)
+    openings: Dict[tuple, float] = {}
+    for (product_id, warehouse_id), quantity in movements.items():
+        if quantity < 0:
+            openings[(product_id, warehouse_id)] = round(-quantity + rng.uniform(10, 100), 2)
+            quantity += openings[(product_id, warehouse_id)]
+        totals[product_id] += quantity
+    for product_id, quantity in reserved.items():
+        if totals[product_id] < quantity:
+            key = (product_id, warehouses[0])
+            openings[key] = round(openings.get(key, 0.0) + quantity - totals[product_id] + rng.uniform(10, 100), 2)
+
+    rows = [
+        (f"SRINIT{run_id:010d}{product_id:09d}{warehouse_id:04d}", "in", warehouse_id, product_id, quantity, 0.0, 0.0,
+         None, "initial", "期初库存", stamp, stamp)
+        for (product_id, warehouse_id), quantity in sorted(openings.items())
+    ]
+    for offset in range(0, len(rows), CHUNK_SIZE):
+        _insert_rows(db, "stock_records", rows[offset:offset + CHUNK_SIZE])
+    db.commit()
+    return len(rows)
+
+
+def _apply_stock(db: Session):
+    """按台账重建仓库库存余额，再用余额汇总更新产品当前库存，用有效预留之和更新已预留数量"""
+    rebuild_warehouse_stock(db)
+    balance = select(func.coalesce(func.sum(WarehouseStock.quantity), 0.0)).where(
+        WarehouseStock.product_id == Product.id
+    ).scalar_subquery()
+    reserved = select(func.coalesce(func.sum(StockReservation.quantity), 0.0)).where(
+        StockReservation.product_id == Product.id, StockReservation.status == "active"
+    ).scalar_subquery()
+    db.execute(update(Product).values(current_stock=balance, reserved_stock=reserved))
+    db.commit()
+
+
+def generate(db: Session, orders: int, products: int = 0, suppliers: int = 0, customers: int = 0,
+             workers: Optional[int] = None, seed: int = 42) -> dict:
+    """
+    生成批量业务单据，返回各表写入的行数
+
+    orders为采购单和销售单的总数（各占一半），products/suppliers/customers为追加的基础数据数量
+    workers为生成单据的进程数，默认为CPU核数，为1时在当前进程内生成
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    if db.get_bind().dialect.name == "sqlite":
+        # 生成的数据可以重新生成，关闭同步写盘；加大页缓存减少索引维护时的页面换入换出
+        db.connection().exec_driver_sql("PRAGMA synchronous=OFF")
+        db.connection().exec_driver_sql("PRAGMA cache_size=-262144")
+        db.commit()
+    _bulk_master_data(db, rng, products, suppliers, customers)
+
+    context = {
+        "products": [tuple(row) for row in db.execute(select(
+            Product.id, Product.code, Product.name, Product.specification, Product.unit,
+            Product.purchase_price, Product.sale_price
+        ).order_by(Product.id))],
+        "suppliers": db.scalars(select(Supplier.id).order_by(Supplier.id)).all(),
+        "customers": db.scalars(select(Customer.id).order_by(Customer.id)).all(),
+        "warehouses": db.scalars(select(Warehouse.id).order_by(Warehouse.id)).all(),
+        "now": datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0),
+    }
+    if not (context["products"] and context["suppliers"] and context["customers"] and context["warehouses"]):
+        raise ValueError("需要先创建产品、供应商、客户和仓库")
+
+    tasks = []
+    for kind, model, count in (("purchase", PurchaseOrder, orders // 2), ("sales", SalesOrder, orders - orders // 2)):
+        first_id = (db.scalar(select(func.max(model.id))) or 0) + 1
+        for index, offset in enumerate(range(0, count, CHUNK_SIZE)):
+            size = min(CHUNK_SIZE, count - offset)
+            window_start = DATE_RANGE_DAYS * 86400 * (count - offset) // count
+            tasks.append((kind, index, first_id + offset, size, seed, window_start, DATE_RANGE_DAYS * 86400 * size // count))
+    run_id = first_id
+    # 本次第一张销售单的ID，用于区分各次生成的期初入库单号
+    db.commit()
+
+    counts: Dict[str, int] = defaultdict(int)
+    movements: Dict[tuple, float] = defaultdict(float)
+    reserved: Dict[int, float] = defaultdict(float)
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(context,)) if workers > 1 else None
+    if executor is None:
+        _init_worker(context)
+    try:
+        results = executor.map(generate_chunk, tasks) if executor else map(generate_chunk, tasks)
+        for done, (rows, chunk_movements, chunk_reserved) in enumerate(results, 1):
+            for table in TABLE_COLUMNS:
+                _insert_rows(db, table, rows.get(table, ()))
+                counts[table] += len(rows.get(table, ()))
+            db.commit()
+            for key, quantity in chunk_movements.items():
+                movements[key] += quantity
+            for product_id, quantity in chunk_reserved.items():
+                reserved[product_id] += quantity
+            print(f"  已生成 {done}/{len(tasks)} 块，{time.perf_counter() - started:.1f}秒")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    counts["stock_records"] += _opening_stock(
+        db, rng, movements, reserved, context["warehouses"], context["now"], run_id
+    )
+    _apply_stock(db)
+    counts["seconds"] = round(time.perf_counter() - started, 1)
+    return dict(counts)
@@ -7,10 +7,12 @@ from app.models import (
     Department,
     Supplier,
     PurchaseOrder, PurchaseOrderItem,
-    Product, ProductCategory, Warehouse, StockRecord, StockCheck, StockCheckItem,
+    Product, ProductCategory, Warehouse, StockRecord, WarehouseStock, StockReservation, StockCheck, StockCheckItem,
     Customer, SalesOrder, SalesOrderItem,
     Payment, Bill, Account, CostCenter,
-    WorkflowDefinition, WorkflowInstance, WorkflowLog
+    WorkflowDefinition, WorkflowInstance, WorkflowLog,
+    PurchaseDailyRollup, SalesDailyRollup, PaymentDailyRollup,
+    CodeSequence, SearchToken
 )
 
 settings = get_settings()
@@ -2,12 +2,18 @@
 """
 厦门建发集团供应链管理系统测试数据初始化脚本
 基于真实业务场景创建测试数据
+
+python init_test_data.py --generate --orders 1000000 在基础数据之上批量生成大量一致的业务单据（见generate_test_data.py）
 """
+import argparse
 import random
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.core.security import get_password_hash
+from app.services.rollups import rebuild_rollups
+from app.services.stock import rebuild_warehouse_stock
+from app.services.search import rebuild_search_index
 from app.models import (
     Menu, User, Role, Permission, UserRole, RolePermission,
     Department, Supplier, Customer,
@@ -760,11 +766,14 @@ def create_workflow_instances(db: Session, wf_map: dict, user_map: dict):
     instance_count = 0
     log_count = 0
     for i in range(20):
+        code = generate_code("WF", i + 1)
+        if db.query(WorkflowInstance).filter(WorkflowInstance.code == code).first():
+            continue
         wf_code = random.choice(list(wf_map.keys()))
         initiator = random.choice(list(user_map.keys()))
         status = random.choice(["pending", "approved", "approved", "approved", "rejected"])
         instance = WorkflowInstance(
-            code=generate_code("WF", i + 1),
+            code=code,
             definition_id=wf_map[wf_code],
             business_type="purchase" if wf_code == "WF_PURCHASE" else ("sale" if wf_code == "WF_SALES" else "payment"),
             business_id=random.randint(1, 50),
@@ -866,7 +875,20 @@ def create_menus(db: Session):
     print(f"成功创建 {created_count} 个菜单（已存在 {len(menus) - created_count} 个）")
     return menu_map
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="初始化测试数据")
+    parser.add_argument("--generate", action="store_true", help="批量生成业务单据，代替逐条创建的少量单据")
+    parser.add_argument("--orders", type=int, default=100000, help="生成的采购单和销售单总数")
+    parser.add_argument("--products", type=int, default=0, help="追加生成的产品数")
+    parser.add_argument("--suppliers", type=int, default=0, help="追加生成的供应商数")
+    parser.add_argument("--customers", type=int, default=0, help="追加生成的客户数")
+    parser.add_argument("--workers", type=int, default=None, help="生成单据的进程数，默认为CPU核数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子，相同种子生成相同数据")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    random.seed(args.seed)
     print("=" * 60)
     print("厦门建发集团供应链管理系统 - 测试数据初始化")
     print("=" * 60)
@@ -886,10 +908,23 @@ def main():
         account_map = create_accounts(db)
         cc_map = create_cost_centers(db)
         wf_map = create_workflow_definitions(db)
-        create_purchase_orders(db, supplier_map, product_map, user_map, warehouse_map)
-        create_sales_orders(db, customer_map, product_map, user_map, warehouse_map)
-        create_payments_and_bills(db, supplier_map, customer_map, user_map, account_map)
+        if args.generate:
+            from generate_test_data import generate
+            print(f"批量生成 {args.orders} 个业务单据...")
+            counts = generate(
+                db, args.orders, products=args.products, suppliers=args.suppliers, customers=args.customers,
+                workers=args.workers, seed=args.seed
+            )
+            print("成功生成：" + "，".join(f"{table} {count}" for table, count in counts.items()))
+        else:
+            create_purchase_orders(db, supplier_map, product_map, user_map, warehouse_map)
+            create_sales_orders(db, customer_map, product_map, user_map, warehouse_map)
+            create_payments_and_bills(db, supplier_map, customer_map, user_map, account_map)
         create_workflow_instances(db, wf_map, user_map)
+        rebuild_rollups(db)
+        if not args.generate:
+            rebuild_warehouse_stock(db)
+        rebuild_search_index(db)
         print("\n" + "=" * 60)
         print("测试数据初始化完成！")
         print("=" * 60)
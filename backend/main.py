@@ -1,17 +1,33 @@
+from contextlib import asynccontextmanager  # 导入异步上下文管理器装饰器，用于定义应用生命周期
 from fastapi import FastAPI  # 导入FastAPI主应用类
 from fastapi.middleware.cors import CORSMiddleware  # 导入CORS中间件，用于处理跨域请求
+from fastapi.responses import JSONResponse, PlainTextResponse  # 导入JSON响应类和纯文本响应类（用于导出指标）
 from app.core.config import get_settings  # 导入配置获取函数
 from app.db.session import engine  # 导入数据库引擎
 from app.api.v1 import api_router  # 导入API路由器
+from app.core.metrics import MetricsMiddleware, metrics_registry  # 导入请求指标中间件和指标登记表
+from app.core.responses import FastJSONResponse  # 导入orjson序列化的JSON响应类
 
 # 获取应用配置
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时预热产品目录缓存"""
+    if settings.PRODUCT_CATALOG_WARM:
+        from app.services.catalog import warm_product_catalog  # 导入产品目录预热函数
+        warm_product_catalog()  # 在后台线程中加载，不阻塞启动，加载完成前的读取直接查询数据库
+    yield
+
+
 # 创建FastAPI应用实例
 app = FastAPI(
     title=settings.PROJECT_NAME,  # 项目名称
     version=settings.VERSION,  # API版本号
-    description="供应链管理系统API"  # API描述信息
+    description="供应链管理系统API",  # API描述信息
+    lifespan=lifespan,  # 应用生命周期（启动和关闭时执行的操作）
+    default_response_class=FastJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse  # 开启后所有接口用orjson序列化
 )
 
 # 配置CORS中间件，允许跨域请求
@@ -21,8 +37,13 @@ app.add_middleware(
     allow_credentials=True,  # 允许携带凭证
     allow_methods=["*"],  # 允许所有HTTP方法
     allow_headers=["*"],  # 允许所有请求头
+    expose_headers=["Server-Timing"],  # 允许前端读取Server-Timing响应头
 )
 
+# 配置请求指标中间件，最后添加的中间件在最外层，统计的耗时包含其他中间件
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+
 # 包含API v1路由，设置前缀
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -43,6 +64,13 @@ def health_check():
     return {"status": "healthy"}
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)  # 定义指标导出路由，不显示在接口文档中
+    def metrics():
+        """以Prometheus文本格式导出本进程的请求和SQL指标"""
+        return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":  # 当脚本直接运行时
     import uvicorn  # 导入uvicorn服务器
     # 启动ASGI服务器，监听所有网络接口，端口8000
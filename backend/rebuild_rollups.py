@@ -0,0 +1,32 @@
+from app.db.session import SessionLocal
+from app.services.rollups import rebuild_rollups as rebuild
+
+
+def rebuild_rollups():
+    """
+    重建报表日汇总表
+
+    功能说明:
+        1. 清空采购、销售、付款日汇总表
+        2. 根据订单和付款单据表按（日期, 维度, 状态）重新汇总
+        3. 每张汇总表使用一条INSERT ... SELECT语句完成
+
+    使用场景:
+        - 首次上线日汇总表时初始化历史数据
+        - 直接修改数据库或导入数据之后修复汇总数据
+    """
+    db = SessionLocal()
+    try:
+        result = rebuild(db)
+        for table, count in result.items():
+            print(f"{table}: {count} rows")
+        print("Rollup tables rebuilt successfully!")
+    except Exception as e:
+        print(f"Error rebuilding rollup tables: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rebuild_rollups()
@@ -0,0 +1,32 @@
+from app.db.session import SessionLocal
+from app.services.search import rebuild_search_index as rebuild
+
+
+def rebuild_search_index():
+    """
+    重建搜索索引
+
+    功能说明:
+        1. 清空search_tokens表
+        2. 按ID分批读取产品、客户、供应商、用户的搜索字段
+        3. 切分词元后批量写入
+
+    使用场景:
+        - 首次上线搜索索引时初始化历史数据
+        - 批量导入数据或直接修改数据库之后修复索引
+    """
+    db = SessionLocal()
+    try:
+        counts = rebuild(db)
+        for entity, count in counts.items():
+            print(f"{entity}: {count} tokens")
+        print("Search index rebuilt successfully!")
+    except Exception as e:
+        print(f"Error rebuilding search index: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rebuild_search_index()
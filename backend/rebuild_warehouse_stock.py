@@ -0,0 +1,31 @@
+from app.db.session import SessionLocal
+from app.services.stock import rebuild_warehouse_stock as rebuild
+
+
+def rebuild_warehouse_stock():
+    """
+    重建仓库库存余额表
+
+    功能说明:
+        1. 清空warehouse_stock表
+        2. 按（产品, 仓库）汇总入库、出库记录和已完成盘点的差异数量
+        3. 使用一条INSERT ... SELECT语句完成
+
+    使用场景:
+        - 首次上线仓库库存余额表时初始化历史数据
+        - 直接修改数据库或导入库存记录之后修复余额
+    """
+    db = SessionLocal()
+    try:
+        count = rebuild(db)
+        print(f"warehouse_stock: {count} rows")
+        print("Warehouse stock rebuilt successfully!")
+    except Exception as e:
+        print(f"Error rebuilding warehouse stock: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rebuild_warehouse_stock()